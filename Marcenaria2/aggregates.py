@@ -0,0 +1,140 @@
+# aggregates.py
+"""Totais de vendas pré-calculados para o painel.
+
+sales_daily guarda, por dia e status, quantas encomendas e quanto faturaram;
+sales_product_daily guarda, por dia e produto, as unidades e o valor vendidos
+(sem as encomendas canceladas); valores em centavos. Triggers em orders e
+order_items mantêm as duas tabelas a cada create_order/update_order_status,
+então o painel lê O(dias) em vez de varrer todas as encomendas. Encomendas removidas (arquivadas)
+continuam contando no histórico; `rebuild` recalcula tudo a partir das tabelas
+e, se estiver anexado, do banco de arquivo (maintenance.py).
+
+    python aggregates.py --rebuild
+"""
+import argparse
+import datetime
+
+CANCELLED = 'Cancelado'
+TRIGGERS = ['sales_order_insert', 'sales_order_status', 'sales_item_insert', 'sales_order_cancelled',
+            'sales_order_reopened']
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS sales_daily (
+           day TEXT NOT NULL, status TEXT NOT NULL,
+           orders INTEGER NOT NULL, revenue INTEGER NOT NULL,
+           PRIMARY KEY (day, status)) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS sales_product_daily (
+           day TEXT NOT NULL, product_id INTEGER NOT NULL,
+           quantity INTEGER NOT NULL, revenue INTEGER NOT NULL,
+           PRIMARY KEY (day, product_id)) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS sales_order_insert AFTER INSERT ON orders BEGIN
+           INSERT INTO sales_daily (day, status, orders, revenue) VALUES (new.order_date, new.status, 1, new.total_cents)
+           ON CONFLICT (day, status) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS sales_order_status AFTER UPDATE OF status ON orders
+       WHEN old.status IS NOT new.status BEGIN
+           UPDATE sales_daily SET orders = orders - 1, revenue = revenue - old.total_cents
+           WHERE day = old.order_date AND status = old.status;
+           INSERT INTO sales_daily (day, status, orders, revenue) VALUES (new.order_date, new.status, 1, new.total_cents)
+           ON CONFLICT (day, status) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+       END''',
+    f'''CREATE TRIGGER IF NOT EXISTS sales_item_insert AFTER INSERT ON order_items
+        WHEN (SELECT status FROM orders WHERE id = new.order_id) IS NOT '{CANCELLED}' BEGIN
+            INSERT INTO sales_product_daily (day, product_id, quantity, revenue)
+            VALUES ((SELECT order_date FROM orders WHERE id = new.order_id), new.product_id,
+                    new.quantity, new.quantity * COALESCE(new.unit_price_cents, 0))
+            ON CONFLICT (day, product_id) DO UPDATE SET quantity = quantity + excluded.quantity,
+                                                        revenue = revenue + excluded.revenue;
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS sales_order_cancelled AFTER UPDATE OF status ON orders
+        WHEN new.status = '{CANCELLED}' AND old.status IS NOT '{CANCELLED}' BEGIN
+            UPDATE sales_product_daily SET
+                quantity = quantity - (SELECT SUM(quantity) FROM order_items
+                                       WHERE order_id = new.id AND product_id = sales_product_daily.product_id),
+                revenue = revenue - (SELECT SUM(quantity * COALESCE(unit_price_cents, 0)) FROM order_items
+                                     WHERE order_id = new.id AND product_id = sales_product_daily.product_id)
+            WHERE day = new.order_date AND product_id IN (SELECT product_id FROM order_items WHERE order_id = new.id);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS sales_order_reopened AFTER UPDATE OF status ON orders
+        WHEN old.status = '{CANCELLED}' AND new.status IS NOT '{CANCELLED}' BEGIN
+            INSERT INTO sales_product_daily (day, product_id, quantity, revenue)
+            SELECT new.order_date, product_id, SUM(quantity), SUM(quantity * COALESCE(unit_price_cents, 0))
+            FROM order_items WHERE order_id = new.id GROUP BY product_id
+            ON CONFLICT (day, product_id) DO UPDATE SET quantity = quantity + excluded.quantity,
+                                                        revenue = revenue + excluded.revenue;
+        END''',
+]
+
+
+def rebuild(conn):
+    """Recalcula as tabelas de totais a partir de orders/order_items, numa transação."""
+    with conn:
+        refill(conn)
+
+
+def refill(conn):
+    """Como rebuild, mas dentro da transação de quem chama (ex.: uma migração)."""
+    orders, items = 'orders', 'order_items'
+    if conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'").fetchone():
+        orders = '''(SELECT id, order_date, status, total_cents FROM orders
+                     UNION ALL SELECT id, order_date, status, total_cents FROM archive.orders)'''
+        items = '''(SELECT order_id, product_id, quantity, unit_price_cents FROM order_items
+                    UNION ALL SELECT order_id, product_id, quantity, unit_price_cents FROM archive.order_items)'''
+    conn.execute('DELETE FROM sales_daily')
+    conn.execute('DELETE FROM sales_product_daily')
+    conn.execute(f'''INSERT INTO sales_daily (day, status, orders, revenue)
+                     SELECT order_date, status, COUNT(*), SUM(total_cents) FROM {orders} GROUP BY order_date, status''')
+    conn.execute(f'''INSERT INTO sales_product_daily (day, product_id, quantity, revenue)
+                     SELECT o.order_date, oi.product_id, SUM(oi.quantity), SUM(oi.quantity * COALESCE(oi.unit_price_cents, 0))
+                     FROM {items} oi JOIN {orders} o ON o.id = oi.order_id
+                     WHERE o.status IS NOT '{CANCELLED}'
+                     GROUP BY o.order_date, oi.product_id''')
+
+
+def dashboard_metrics(conn, days=30, months=12, top=10):
+    """Faturamento por dia e por mês, encomendas por status e produtos mais vendidos.
+
+    Faturamento e produtos desconsideram encomendas canceladas; dias e meses
+    sem vendas não aparecem.
+    """
+    today = datetime.date.today()
+    since_day = (today - datetime.timedelta(days=days - 1)).isoformat()
+    year, month = divmod(today.year * 12 + today.month - 1 - (months - 1), 12)
+    since_month = f"{year:04d}-{month + 1:02d}"
+    by_day = conn.execute(f'''SELECT day, SUM(orders), SUM(revenue) FROM sales_daily
+                              WHERE day >= ? AND status IS NOT '{CANCELLED}' GROUP BY day ORDER BY day''',
+                          (since_day,)).fetchall()
+    by_month = conn.execute(f'''SELECT substr(day, 1, 7) AS month, SUM(orders), SUM(revenue) FROM sales_daily
+                                WHERE day >= ? AND status IS NOT '{CANCELLED}' GROUP BY month ORDER BY month''',
+                            (since_month + '-01',)).fetchall()
+    by_status = conn.execute('''SELECT status, SUM(orders), SUM(revenue) FROM sales_daily
+                                GROUP BY status HAVING SUM(orders) > 0 ORDER BY SUM(orders) DESC''').fetchall()
+    top_products = conn.execute('''SELECT s.product_id, COALESCE(p.name, '(removido)'), SUM(s.quantity), SUM(s.revenue)
+                                   FROM sales_product_daily s LEFT JOIN products p ON p.id = s.product_id
+                                   WHERE s.day >= ? GROUP BY s.product_id HAVING SUM(s.quantity) > 0
+                                   ORDER BY SUM(s.revenue) DESC LIMIT ?''', (since_day, top)).fetchall()
+    return {'by_day': by_day, 'by_month': by_month, 'by_status': by_status, 'top_products': top_products}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Totais de vendas do painel.")
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--rebuild', action='store_true', help="recalcula os totais a partir das encomendas")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager(args.db)
+    try:
+        if args.rebuild:
+            db.rebuild_sales_aggregates()
+            print("Totais recalculados.")
+        for key, rows in db.get_dashboard_metrics().items():
+            print(key)
+            for row in rows:
+                print("   ", *row)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
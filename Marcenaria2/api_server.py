@@ -0,0 +1,316 @@
+# api_server.py
+"""API HTTP/JSON local para a loja virtual e o tablet da oficina.
+
+    python api_server.py --port 8080 --db marcenaria.db
+
+Rotas:
+  GET  /products                 catálogo; responde ETag e aceita If-None-Match (304)
+  POST /orders                   {"client_name", "items": [{"id", "quantity"}], "total"? (em reais, conferido)}
+  GET  /orders/<id>              {"id", "status"}
+  PUT  /orders/<id>/status       {"status"}
+  GET  /report?before_id=&limit= página do relatório, mais recentes primeiro
+  POST /batch                    {"requests": [{"method", "path", "body"?}, ...]}
+
+O servidor é asyncio numa thread só; as chamadas ao banco rodam num
+ThreadPoolExecutor, e cada thread dele usa a sua conexão do pool do
+DatabaseManager. Encomendas que chegam juntas são gravadas numa única
+transação (DatabaseManager.create_orders), o que evita um commit por pedido.
+Escuta só em 127.0.0.1, a menos que --host diga outra coisa. Preços e totais
+saem como inteiros de centavos (price_cents, total_cents).
+"""
+import argparse
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from catalog import ProductCatalog
+from database import ORDER_STATUSES, DatabaseManager
+from money import OrderLines, format_money, to_cents
+
+MAX_BODY = 1024 * 1024
+MAX_BATCH_REQUESTS = 100
+REPORT_PAGE_LIMIT = 200
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def json_body(body):
+    try:
+        return json.loads(body or b'null')
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "JSON inválido.")
+
+
+def product_json(product):
+    prod_id, name, description, price_cents = product
+    return {'id': prod_id, 'name': name, 'description': description, 'price_cents': price_cents}
+
+
+def report_json(entry):
+    order_id, client_name, order_date, status, total_cents = entry['order']
+    return {'id': order_id, 'client_name': client_name, 'order_date': order_date, 'status': status,
+            'total_cents': total_cents, 'items': [{'name': name, 'quantity': quantity} for name, quantity in entry['items']]}
+
+
+class ApiServer:
+    def __init__(self, db_name='marcenaria.db', workers=4, order_batch_size=200):
+        self.db = ProductCatalog(DatabaseManager(db_name, max_idle_connections=workers))
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='api-db')
+        self.order_batch_size = order_batch_size
+        self._catalog = (None, None, None)  # (versão, etag, corpo JSON)
+        self._pending_orders = []            # (encomenda, future)
+        self._order_writer = None
+        self.routes = [
+            ('GET', re.compile(r'/products'), self.get_products),
+            ('POST', re.compile(r'/orders'), self.post_order),
+            ('GET', re.compile(r'/orders/(\d+)'), self.get_order),
+            ('PUT', re.compile(r'/orders/(\d+)/status'), self.put_order_status),
+            ('GET', re.compile(r'/report'), self.get_report),
+            ('POST', re.compile(r'/batch'), self.post_batch),
+        ]
+
+    async def call(self, func, *args):
+        """Roda `func(*args)` numa thread do executor."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    # --- ROTAS ---
+    async def get_products(self, request):
+        version = await self.call(self.db.get_products_version)
+        cached_version, etag, body = self._catalog
+        if version != cached_version:
+            products = await self.call(self.db.get_all_products)
+            etag = f'"products-{version}"'
+            body = json.dumps([product_json(p) for p in products], ensure_ascii=False).encode('utf-8')
+            self._catalog = (version, etag, body)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if_none_match = request['headers'].get('if-none-match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return HTTPStatus.NOT_MODIFIED, None, headers
+        return HTTPStatus.OK, body, headers
+
+    async def post_order(self, request):
+        order = await self.call(self._prepare_order, json_body(request['body']))
+        order_id = await self._create_order(order)
+        if order_id is None:
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, "Não foi possível salvar a encomenda.")
+        return HTTPStatus.CREATED, {'id': order_id, 'status': 'Pendente', 'total_cents': order['total']}, {}
+
+    def _prepare_order(self, data):
+        """Valida a encomenda e calcula o total pelos preços do catálogo.
+
+        Um "total" enviado só confere a conta: se não bater com os preços
+        atuais (que ficam gravados nos itens), a encomenda é recusada.
+        """
+        if not isinstance(data, dict) or not data.get('client_name') or not data.get('items'):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "client_name e items são obrigatórios.")
+        lines = OrderLines()
+        for item in data['items']:
+            try:
+                prod_id, quantity = int(item['id']), int(item['quantity'])
+            except (KeyError, TypeError, ValueError):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Cada item precisa de id e quantity inteiros.")
+            product = self.db.get_product(prod_id)
+            if product is None:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Produto {prod_id} não existe.")
+            if quantity <= 0:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "A quantidade deve ser maior que zero.")
+            lines.add(prod_id, product[0], product[2], quantity)
+        total = lines.totals()['total']
+        if data.get('total') is not None:
+            try:
+                sent = to_cents(data['total'])
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "total inválido.")
+            if sent != total:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"total não confere com os preços do catálogo ({format_money(total)}).")
+        return {'client_name': str(data['client_name']), 'total': total, 'items': lines.as_items()}
+
+    async def _create_order(self, order):
+        """Enfileira a encomenda; as que chegam enquanto um lote grava vão no próximo."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending_orders.append((order, future))
+        if self._order_writer is None or self._order_writer.done():
+            self._order_writer = asyncio.ensure_future(self._write_orders())
+        return await future
+
+    async def _write_orders(self):
+        while self._pending_orders:
+            batch = self._pending_orders[:self.order_batch_size]
+            del self._pending_orders[:self.order_batch_size]
+            try:
+                order_ids = await self.call(self.db.create_orders, [order for order, _ in batch])
+            except Exception as e:
+                order_ids = [e] * len(batch)
+            for (_, future), result in zip(batch, order_ids):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def get_order(self, request, order_id):
+        status = await self.call(self.db.get_order_status, int(order_id))
+        if status is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "Encomenda não encontrada.")
+        return HTTPStatus.OK, {'id': int(order_id), 'status': status}, {}
+
+    async def put_order_status(self, request, order_id):
+        data = json_body(request['body'])
+        status = data.get('status') if isinstance(data, dict) else None
+        if status not in ORDER_STATUSES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"status deve ser um de: {', '.join(ORDER_STATUSES)}.")
+        if not await self.call(self.db.update_order_status, int(order_id), status):
+            raise ApiError(HTTPStatus.NOT_FOUND, "Encomenda não encontrada.")
+        return HTTPStatus.OK, {'id': int(order_id), 'status': status}, {}
+
+    async def get_report(self, request):
+        query = request['query']
+        try:
+            before_id = int(query['before_id'][0]) if 'before_id' in query else None
+            limit = min(int(query.get('limit', ['50'])[0]), REPORT_PAGE_LIMIT)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "before_id e limit devem ser inteiros.")
+        if limit < 1:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit deve ser pelo menos 1.")
+        page = await self.call(self.db.get_report_page, before_id, limit)
+        next_before_id = page[-1]['order'][0] if len(page) == limit else None
+        return HTTPStatus.OK, {'orders': [report_json(entry) for entry in page], 'next_before_id': next_before_id}, {}
+
+    async def post_batch(self, request):
+        """Várias chamadas num só pedido HTTP; rodam juntas e respondem na mesma ordem."""
+        data = json_body(request['body'])
+        calls = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(calls, list) or len(calls) > MAX_BATCH_REQUESTS:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"requests deve ser uma lista de até {MAX_BATCH_REQUESTS} chamadas.")
+        async def run(call):
+            if (not isinstance(call, dict) or not isinstance(call.get('path'), str) or call['path'].startswith('/batch')
+                    or not isinstance(call.get('method', 'GET'), str) or not isinstance(call.get('headers', {}), dict)):
+                return {'status': HTTPStatus.BAD_REQUEST, 'body': {'error': "Chamada inválida."}}
+            body = json.dumps(call['body']).encode('utf-8') if 'body' in call else b''
+            status, payload, _ = await self.dispatch(call.get('method', 'GET').upper(), call['path'],
+                                                     {k.lower(): v for k, v in call.get('headers', {}).items()}, body)
+            if isinstance(payload, bytes):
+                payload = json.loads(payload)
+            return {'status': int(status), 'body': payload}
+        responses = await asyncio.gather(*(run(call) for call in calls))
+        return HTTPStatus.OK, {'responses': responses}, {}
+
+    # --- HTTP ---
+    async def dispatch(self, method, target, headers, body):
+        """Resolve a rota e devolve (status, corpo, cabeçalhos); o corpo é um objeto JSON ou bytes."""
+        url = urlsplit(target)
+        request = {'headers': headers, 'body': body, 'query': parse_qs(url.query)}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path.rstrip('/') or '/')
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            try:
+                return await handler(request, *match.groups())
+            except ApiError as e:
+                return e.status, {'error': e.message}, {}
+            except Exception as e:
+                print(f"API Error on {method} {url.path}: {e}")
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Erro interno."}, {}
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Método não permitido."}, {}
+        return HTTPStatus.NOT_FOUND, {'error': "Rota não encontrada."}, {}
+
+    async def handle_connection(self, reader, writer):
+        """Atende pedidos HTTP/1.1 na mesma conexão (keep-alive) até o cliente fechar."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = request_line.split(' ')
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length') or '0'
+                if not length.isdecimal():
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': "Content-Length inválido."}, {}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "Corpo grande demais."}, {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+                status, payload, extra_headers = await self.dispatch(method, target, headers, body)
+                await self._respond(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, extra_headers, keep_alive):
+        if payload is None:
+            body = b''
+        elif isinstance(payload, bytes):
+            body = payload
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if body:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Servindo em http://{host}:{port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP local da Marcenaria Pica Pau.")
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help="0 escolhe uma porta livre")
+    parser.add_argument('--workers', type=int, default=4, help="threads com conexão ao banco")
+    args = parser.parse_args()
+
+    api = ApiServer(args.db, args.workers)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,61 @@
 import customtkinter as ctk
-from tkinter import messagebox, Text, END
-from PIL import Image
+from tkinter import messagebox, filedialog, Text, END, Label, PhotoImage
 import os
+import tempfile
 import datetime # Import datetime here
-from database import DatabaseManager # Import the DatabaseManager
+from database import ORDER_STATUSES
+from db_worker import DatabaseWorker
+from export import export_report
+import maintenance
+from money import OrderLines, format_money, to_cents
+from formatting import (PRODUCT_HEADER, format_dashboard, format_diagnostics, format_materials, format_product_line,
+                        format_production_plan, format_report_entry)
+from widgets import PagedListView, SearchPicker, SortableTable
+
+PRODUCT_PICKER_LIMIT = 10
+EXPORT_FILE_TYPES = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Colunar", "*.col"),
+                     ("Compactado (gzip)", "*.gz"), ("Todos os arquivos", "*.*")]
+BACKGROUND_IMAGE = "picapaupng.png"
+BACKGROUND_SIZE = (480, 540)
+
+def scaled_image_path(path, size):
+    """Caminho de uma cópia PNG de `path` já redimensionada para `size`.
+
+    A cópia é gerada uma vez (em .cache, ao lado da imagem, ou na pasta
+    temporária) e reaproveitada enquanto o original não mudar; só então o PIL
+    é usado para decodificar e redimensionar.
+    """
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    file_name = f"{name}-{size[0]}x{size[1]}-{int(stat.st_mtime)}-{stat.st_size}.png"
+    for cache_dir in (os.path.join(os.path.dirname(path), ".cache"), tempfile.gettempdir()):
+        cached = os.path.join(cache_dir, file_name)
+        if os.path.exists(cached):
+            return cached
+        try:
+            from PIL import Image
+            os.makedirs(cache_dir, exist_ok=True)
+            with Image.open(path) as image:
+                image.resize(size, Image.LANCZOS).save(cached)
+            return cached
+        except OSError:
+            continue
+    raise OSError(f"Não foi possível gerar a cópia redimensionada de {path}")
+
 
 class MarcenariaApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, on_startup_step=None):
+        """`on_startup_step(nome)`, se dado, é chamado ao fim de cada etapa da abertura."""
         super().__init__()
-        self.db = DatabaseManager() # Initialize the DatabaseManager
+        self._on_startup_step = on_startup_step
+        self._startup_step("janela")
+        self.db_worker = DatabaseWorker(self) # All database calls run on the worker thread
+        self._export_workers = [] # Report exports, each on its own worker so they don't hold up the screens
+        self._screen_requests = []
+        self._screens = {} # (container, name) -> screen frame, built once and reused
+        self._current_screens = {} # container -> screen frame being shown
+        self.loading_label = None
+        self.session_token = None
         self.title('Marcenaria Pica Pau - Login')
         self.geometry('960x540')
         self.resizable(False, False)
@@ -16,54 +63,140 @@ class MarcenariaApp(ctk.CTk):
         ctk.set_default_color_theme("blue")
         self.configure(fg_color=self._get_appearance_mode_color())
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.bind("<Control-D>", lambda event: self.show_diagnostics()) # Ctrl+Shift+D: hidden diagnostics screen
 
+        self.login_frame = ctk.CTkFrame(self, width=480, height=540, corner_radius=0, fg_color=self._get_appearance_mode_color())
+        self.main_content_frame = ctk.CTkFrame(self, fg_color=self._get_appearance_mode_color())
+        self.screen_container = None # Created with the nav bar on first login
+        self.show_login_widgets()
+        self._startup_step("tela de login")
+        # The background image and the database connection load after the login form is on screen
+        self.after_idle(self._load_background)
+        self.db_worker.submit(lambda db: None, on_done=self._on_database_ready,
+                              on_error=lambda _: self._startup_step("banco de dados"))
+
+    def _on_database_ready(self, _):
+        self._startup_step("banco de dados")
+        # Backup and statistics run on their own connection, only after the migrations are done;
+        # not while profiling the startup, where they would compete with the steps being timed
+        if self._on_startup_step is None:
+            maintenance.start_background(self.db_worker.db_name)
+
+    def _startup_step(self, step):
+        if self._on_startup_step:
+            self._on_startup_step(step)
+
+    def _load_background(self):
         try:
             script_dir = os.path.dirname(os.path.abspath(__file__))
-            bg_image_path = os.path.join(script_dir, "picapaupng.png")
-            self.bg_image = ctk.CTkImage(Image.open(bg_image_path), size=(480, 540))
-            self.background_label = ctk.CTkLabel(self, image=self.bg_image, text="")
+            size = tuple(self._apply_window_scaling(value) for value in BACKGROUND_SIZE)
+            self.bg_image = PhotoImage(file=scaled_image_path(os.path.join(script_dir, BACKGROUND_IMAGE), size))
+            self.background_label = Label(self, image=self.bg_image, borderwidth=0, highlightthickness=0)
             self.background_label.place(x=0, y=0)
+            self.background_label.lower()
         except FileNotFoundError:
-            print("Aviso: Imagem 'picapaupng.png' não encontrada.")
-
-        self.login_frame = ctk.CTkFrame(self, width=480, height=540, corner_radius=0, fg_color=self._get_appearance_mode_color())
-        self.main_content_frame = ctk.CTkFrame(self, fg_color=self._get_appearance_mode_color())
-        self.show_login_widgets()
+            print(f"Aviso: Imagem '{BACKGROUND_IMAGE}' não encontrada.")
+        except OSError as e:
+            print(f"Aviso: Imagem '{BACKGROUND_IMAGE}' não carregada: {e}")
+        self._startup_step("imagem de fundo")
 
     def on_closing(self):
-        self.db.close()
+        for worker in self._export_workers:
+            worker.close() # Waits a few seconds for an export still running
+        self.db_worker.close()
         self.destroy()
 
+    def _db_call(self, method, *args, on_done=None, on_error=None):
+        """Envia uma chamada ao banco; o resultado é descartado se a tela mudar antes."""
+        def done(result):
+            self._finish_request(request)
+            if on_done:
+                on_done(result)
+        def failed(error):
+            self._finish_request(request)
+            if on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Erro", f"Erro no banco de dados: {error}")
+        request = self.db_worker.submit(method, *args, on_done=done, on_error=failed)
+        self._screen_requests.append(request)
+        self._update_loading()
+        return request
+
+    def _finish_request(self, request):
+        if request in self._screen_requests:
+            self._screen_requests.remove(request)
+        self._update_loading()
+
+    def _cancel_screen_requests(self):
+        for request in self._screen_requests:
+            request.cancel()
+        self._screen_requests.clear()
+        self._update_loading()
+
+    def _update_loading(self):
+        if self.loading_label is not None and self.loading_label.winfo_exists():
+            self.loading_label.configure(text="Carregando..." if self._screen_requests else "")
+
     def _get_appearance_mode_color(self):
         return "#2b2b2b" if ctk.get_appearance_mode() == "Dark" else "#e6e6e6"
 
-    def clear_frame(self, frame):
-        for widget in frame.winfo_children():
-            widget.destroy()
+    def _show_screen(self, container, name, build):
+        """Mostra a tela `name` em `container`, criando-a só na primeira vez.
+
+        `build(frame)` monta os widgets da tela e devolve a função que atualiza
+        seus dados (ou None); ela roda a cada vez que a tela é mostrada.
+        """
+        self._cancel_screen_requests()
+        key = (container, name)
+        if key not in self._screens:
+            frame = ctk.CTkFrame(container, fg_color="transparent")
+            frame.refresh = build(frame)
+            self._screens[key] = frame
+        frame = self._screens[key]
+        current = self._current_screens.get(container)
+        if current is not frame:
+            if current is not None:
+                current.pack_forget()
+            frame.pack(fill="both", expand=True)
+            self._current_screens[container] = frame
+        if frame.refresh:
+            frame.refresh()
 
     def show_login_widgets(self):
         self.main_content_frame.place_forget()
         self.login_frame.place(relx=0.75, rely=0.5, anchor='center')
-        self.clear_frame(self.login_frame)
-        ctk.CTkLabel(self.login_frame, text="Marcenaria Pica Pau", font=ctk.CTkFont(size=30, weight="bold")).pack(pady=(50, 30))
-        self.user_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Usuário", width=300, height=40)
+        self._show_screen(self.login_frame, 'login', self._build_login)
+
+    def _build_login(self, frame):
+        ctk.CTkLabel(frame, text="Marcenaria Pica Pau", font=ctk.CTkFont(size=30, weight="bold")).pack(pady=(50, 30))
+        self.user_entry = ctk.CTkEntry(frame, placeholder_text="Usuário", width=300, height=40)
         self.user_entry.pack(pady=10)
-        self.pass_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Senha", show="*", width=300, height=40)
+        self.pass_entry = ctk.CTkEntry(frame, placeholder_text="Senha", show="*", width=300, height=40)
         self.pass_entry.pack(pady=10)
-        ctk.CTkButton(self.login_frame, text="Login", command=self.login, width=300, height=40).pack(pady=20)
-        ctk.CTkButton(self.login_frame, text="Cadastrar Novo Usuário", command=self.show_register_widgets, width=300, height=40).pack(pady=10)
+        ctk.CTkButton(frame, text="Login", command=self.login, width=300, height=40).pack(pady=20)
+        ctk.CTkButton(frame, text="Cadastrar Novo Usuário", command=self.show_register_widgets, width=300, height=40).pack(pady=10)
+        def refresh():
+            self.pass_entry.delete(0, END)
+        return refresh
 
     def show_register_widgets(self):
-        self.clear_frame(self.login_frame)
-        ctk.CTkLabel(self.login_frame, text="Cadastro de Usuário", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(50, 30))
-        self.reg_user_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Novo Usuário", width=300, height=40)
+        self._show_screen(self.login_frame, 'register', self._build_register)
+
+    def _build_register(self, frame):
+        ctk.CTkLabel(frame, text="Cadastro de Usuário", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(50, 30))
+        self.reg_user_entry = ctk.CTkEntry(frame, placeholder_text="Novo Usuário", width=300, height=40)
         self.reg_user_entry.pack(pady=10)
-        self.reg_pass_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Nova Senha", show="*", width=300, height=40)
+        self.reg_pass_entry = ctk.CTkEntry(frame, placeholder_text="Nova Senha", show="*", width=300, height=40)
         self.reg_pass_entry.pack(pady=10)
-        self.reg_pass_confirm_entry = ctk.CTkEntry(self.login_frame, placeholder_text="Confirmar Senha", show="*", width=300, height=40)
+        self.reg_pass_confirm_entry = ctk.CTkEntry(frame, placeholder_text="Confirmar Senha", show="*", width=300, height=40)
         self.reg_pass_confirm_entry.pack(pady=10)
-        ctk.CTkButton(self.login_frame, text="Cadastrar", command=self.register_user, width=300, height=40).pack(pady=20)
-        ctk.CTkButton(self.login_frame, text="Voltar para Login", command=self.show_login_widgets, width=200, fg_color="transparent", border_width=1).pack(pady=10)
+        ctk.CTkButton(frame, text="Cadastrar", command=self.register_user, width=300, height=40).pack(pady=20)
+        ctk.CTkButton(frame, text="Voltar para Login", command=self.show_login_widgets, width=200, fg_color="transparent", border_width=1).pack(pady=10)
+        def refresh():
+            for entry in (self.reg_user_entry, self.reg_pass_entry, self.reg_pass_confirm_entry):
+                entry.delete(0, END)
+        return refresh
 
     def register_user(self):
         username = self.reg_user_entry.get()
@@ -75,76 +208,107 @@ class MarcenariaApp(ctk.CTk):
         if password != password_confirm:
             messagebox.showerror("Erro", "As senhas não coincidem.")
             return
-        if self.db.check_user_exists(username):
-            messagebox.showerror("Erro", "Este nome de usuário já existe.")
-            return
-        if self.db.add_user(username, password):
-            messagebox.showinfo("Sucesso", "Usuário cadastrado com sucesso!")
-            self.show_login_widgets()
-        else:
-            messagebox.showerror("Erro", "Não foi possível cadastrar o usuário.")
+        def on_user_checked(existing_user):
+            if existing_user:
+                messagebox.showerror("Erro", "Este nome de usuário já existe.")
+                return
+            self._db_call('add_user', username, password, on_done=on_user_added)
+        def on_user_added(added):
+            if added:
+                messagebox.showinfo("Sucesso", "Usuário cadastrado com sucesso!")
+                self.show_login_widgets()
+            else:
+                messagebox.showerror("Erro", "Não foi possível cadastrar o usuário.")
+        self._db_call('check_user_exists', username, on_done=on_user_checked)
 
     def login(self):
         username = self.user_entry.get()
         password = self.pass_entry.get()
-        user = self.db.verify_user(username, password)
-        if user:
-            self.username = username
-            self.show_main_window()
-        else:
-            messagebox.showerror("Erro", "Usuário ou senha inválidos.")
+        def on_verified(token):
+            if token:
+                self.username = username
+                self.session_token = token
+                self.show_main_window()
+            else:
+                messagebox.showerror("Erro", "Usuário ou senha inválidos.")
+        self._db_call('verify_user', username, password, on_done=on_verified)
 
     def logout(self):
-        self.clear_frame(self.main_content_frame)
+        # Submitted directly: leaving the screen must not cancel it
+        self.db_worker.submit('end_session', self.session_token)
+        self.session_token = None
         self.show_login_widgets()
 
     def show_main_window(self):
         self.login_frame.place_forget()
         self.main_content_frame.place(relx=0, rely=0, relwidth=1, relheight=1)
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text=f"Bem-vindo(a), {self.username}!", font=ctk.CTkFont(size=18, weight="bold")).pack(pady=20)
-        ctk.CTkLabel(self.main_content_frame, text="Use a barra de navegação para gerenciar o sistema.", font=ctk.CTkFont(size=14)).pack(pady=10)
+        if self.screen_container is None:
+            self._add_nav_bar()
+            self.screen_container = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+            self.screen_container.pack(fill="both", expand=True)
+        self._show_screen(self.screen_container, 'home', self._build_home)
+
+    def _build_home(self, frame):
+        welcome_label = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=18, weight="bold"))
+        welcome_label.pack(pady=20)
+        ctk.CTkLabel(frame, text="Use a barra de navegação para gerenciar o sistema.", font=ctk.CTkFont(size=14)).pack(pady=10)
+        return lambda: welcome_label.configure(text=f"Bem-vindo(a), {self.username}!")
 
     def _add_nav_bar(self):
         nav_bar = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
         nav_bar.pack(pady=10, fill="x", padx=20)
-        ctk.CTkButton(nav_bar, text="Produtos", command=self.show_manage_products).pack(side="left", expand=True, padx=5)
-        ctk.CTkButton(nav_bar, text="Nova Encomenda", command=self.show_create_order).pack(side="left", expand=True, padx=5)
-        ctk.CTkButton(nav_bar, text="Atualizar Encomenda", command=self.show_update_order_status).pack(side="left", expand=True, padx=5)
-        ctk.CTkButton(nav_bar, text="Relatórios", command=self.show_reports).pack(side="left", expand=True, padx=5)
-        ctk.CTkButton(nav_bar, text="Logout", command=self.logout, fg_color="red").pack(side="right", padx=5)
+        for text, show in (("Produtos", self.show_manage_products), ("Nova Encomenda", self.show_create_order),
+                           ("Encomendas", self.show_update_order_status), ("Relatórios", self.show_reports),
+                           ("Painel", self.show_dashboard), ("Estoque", self.show_inventory)):
+            ctk.CTkButton(nav_bar, text=text, command=self._with_session(show), width=120).pack(side="left", expand=True, padx=5)
+        ctk.CTkButton(nav_bar, text="Logout", command=self.logout, fg_color="red", width=100).pack(side="right", padx=5)
+        self.loading_label = ctk.CTkLabel(nav_bar, text="", width=90)
+        self.loading_label.pack(side="right", padx=5)
+        self._update_loading()
+
+    def _with_session(self, show):
+        """Wraps a screen so it only opens while the login session is valid; an expired one goes back to login."""
+        def check():
+            def on_user(user):
+                if user is not None and user == self.username:
+                    show()
+                else:
+                    messagebox.showinfo("Sessão expirada", "Sua sessão expirou. Entre novamente.")
+                    self.logout()
+            self._db_call('get_session_user', self.session_token, on_done=on_user)
+        return check
 
     def show_manage_products(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Gerenciamento de Produtos", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
-        actions_frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+        self._show_screen(self.screen_container, 'products', self._build_manage_products)
+
+    def _build_manage_products(self, frame):
+        ctk.CTkLabel(frame, text="Gerenciamento de Produtos", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        actions_frame = ctk.CTkFrame(frame, fg_color="transparent")
         actions_frame.pack(pady=10)
         ctk.CTkButton(actions_frame, text="Adicionar Novo Produto", command=self._show_add_product_form).pack(side="left", padx=5)
         ctk.CTkButton(actions_frame, text="Editar Produto Existente", command=self._show_edit_product_form).pack(side="left", padx=5)
         ctk.CTkButton(actions_frame, text="Remover Produto", command=self._show_delete_product_form).pack(side="left", padx=5)
-        self.product_list_text = ctk.CTkTextbox(self.main_content_frame, width=780, height=300)
-        self.product_list_text.pack(pady=10)
-        self.refresh_product_list(self.product_list_text)
-
-    def refresh_product_list(self, textbox):
-        textbox.delete("1.0", END)
-        products = self.db.get_all_products()
-        if not products:
-            textbox.insert(END, "Nenhum produto cadastrado.")
-            return
-        header = f"{'ID':<5}{'Nome':<30}{'Descrição':<40}{'Preço (R$)':>10}\n" + "-"*85 + "\n"
-        textbox.insert(END, header)
-        for p in products:
-            line = f"{p[0]:<5}{p[1]:<30}{p[2] if p[2] else '':<40}{p[3]:>10.2f}\n"
-            textbox.insert(END, line)
+        self.product_list_view = PagedListView(frame, self._load_products_page, header=PRODUCT_HEADER,
+                                               empty_text="Nenhum produto cadastrado.", page_size=100,
+                                               width=780, height=300)
+        self.product_list_view.pack(pady=10)
+        return lambda: self.refresh_product_list(self.product_list_view)
+
+    def refresh_product_list(self, list_view):
+        list_view.reset()
+
+    def _load_products_page(self, after_id, limit, on_page):
+        def on_products(products):
+            next_cursor = products[-1][0] if len(products) == limit else None
+            on_page([format_product_line(p) for p in products], next_cursor)
+        self._db_call('get_products_page', after_id or 0, limit, on_done=on_products)
 
     def _show_add_product_form(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Adicionar Novo Produto", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
-        form_frame = ctk.CTkFrame(self.main_content_frame)
+        self._show_screen(self.screen_container, 'add_product', self._build_add_product_form)
+
+    def _build_add_product_form(self, frame):
+        ctk.CTkLabel(frame, text="Adicionar Novo Produto", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
+        form_frame = ctk.CTkFrame(frame)
         form_frame.pack(pady=10)
         ctk.CTkLabel(form_frame, text="Nome:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
         name_entry = ctk.CTkEntry(form_frame, width=250)
@@ -160,77 +324,93 @@ class MarcenariaApp(ctk.CTk):
             if not name or not price:
                 messagebox.showerror("Erro", "Nome e Preço são obrigatórios.")
                 return
-            if self.db.add_product(name, desc, price):
-                messagebox.showinfo("Sucesso", "Produto adicionado.")
-                self.show_manage_products()
-            else:
-                messagebox.showerror("Erro", "Preço inválido ou erro no banco de dados.")
-        ctk.CTkButton(self.main_content_frame, text="Salvar Produto", command=save, width=150, height=40).pack(pady=20)
-        ctk.CTkButton(self.main_content_frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+            try:
+                price_cents = to_cents(price)
+            except ValueError:
+                messagebox.showerror("Erro", "Preço inválido.")
+                return
+            def on_saved(added):
+                if added:
+                    messagebox.showinfo("Sucesso", "Produto adicionado.")
+                    self.show_manage_products()
+                else:
+                    messagebox.showerror("Erro", "Erro no banco de dados.")
+            self._db_call('add_product', name, desc, price_cents, on_done=on_saved)
+        ctk.CTkButton(frame, text="Salvar Produto", command=save, width=150, height=40).pack(pady=20)
+        ctk.CTkButton(frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+        def refresh():
+            for entry in (name_entry, desc_entry, price_entry):
+                entry.delete(0, END)
+        return refresh
 
     def _show_edit_product_form(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Editar Produto Existente", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
-        edit_form_frame = ctk.CTkFrame(self.main_content_frame)
+        self._show_screen(self.screen_container, 'edit_product', self._build_edit_product_form)
+
+    def _build_edit_product_form(self, frame):
+        ctk.CTkLabel(frame, text="Editar Produto Existente", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
+        edit_form_frame = ctk.CTkFrame(frame)
         edit_form_frame.pack(pady=10)
         ctk.CTkLabel(edit_form_frame, text="ID do Produto:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
         id_entry = ctk.CTkEntry(edit_form_frame, width=250)
         id_entry.grid(row=0, column=1, padx=10, pady=5)
-        name_entry = ctk.CTkEntry(edit_form_frame, width=250)
-        desc_entry = ctk.CTkEntry(edit_form_frame, width=250)
-        price_entry = ctk.CTkEntry(edit_form_frame, width=250)
+        # Fields stay hidden until a product is loaded
+        field_widgets = []
+        entries = []
+        for row, label_text in enumerate(["Novo Nome:", "Nova Descrição:", "Novo Preço:"], start=1):
+            label = ctk.CTkLabel(edit_form_frame, text=label_text)
+            entry = ctk.CTkEntry(edit_form_frame, width=250)
+            field_widgets.append((label, dict(row=row, column=0, padx=10, pady=5, sticky="w")))
+            field_widgets.append((entry, dict(row=row, column=1, padx=10, pady=5)))
+            entries.append(entry)
+        name_entry, desc_entry, price_entry = entries
         def load_product_data():
             try:
                 prod_id = int(id_entry.get())
-                product = self.db.get_product(prod_id)
-                if product:
-                    # Clear and re-pack existing widgets for dynamic update
-                    for widget in [name_entry, desc_entry, price_entry]:
-                        widget.grid_forget() # Hide if already visible
-                    for label_text in ["Novo Nome:", "Nova Descrição:", "Novo Preço:"]:
-                        for child in edit_form_frame.winfo_children():
-                            if isinstance(child, ctk.CTkLabel) and child.cget("text") == label_text:
-                                child.destroy()
-
-                    ctk.CTkLabel(edit_form_frame, text="Novo Nome:").grid(row=1, column=0, padx=10, pady=5, sticky="w")
-                    name_entry.grid(row=1, column=1, padx=10, pady=5)
-                    name_entry.delete(0, END); name_entry.insert(0, product[0])
-                    ctk.CTkLabel(edit_form_frame, text="Nova Descrição:").grid(row=2, column=0, padx=10, pady=5, sticky="w")
-                    desc_entry.grid(row=2, column=1, padx=10, pady=5)
-                    desc_entry.delete(0, END); desc_entry.insert(0, product[1])
-                    ctk.CTkLabel(edit_form_frame, text="Novo Preço:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
-                    price_entry.grid(row=3, column=1, padx=10, pady=5)
-                    price_entry.delete(0, END); price_entry.insert(0, str(product[2]))
-                    
-                    # Ensure "Salvar Alterações" button is present and correctly linked
-                    for widget in edit_form_frame.winfo_children():
-                        if isinstance(widget, ctk.CTkButton) and widget.cget("text") == "Salvar Alterações":
-                            widget.destroy() # Remove old button to prevent duplicates
-                    ctk.CTkButton(edit_form_frame, text="Salvar Alterações", command=save_changes, width=150).grid(row=4, column=0, columnspan=2, pady=10)
-                else:
-                    messagebox.showerror("Erro", "Produto não encontrado.")
             except ValueError:
                 messagebox.showerror("Erro", "ID inválido.")
+                return
+            self._db_call('get_product', prod_id, on_done=show_product_data)
+        def show_product_data(product):
+            if product:
+                for widget, grid_options in field_widgets:
+                    widget.grid(**grid_options)
+                save_button.grid(row=4, column=0, columnspan=2, pady=10)
+                name, desc, price_cents = product
+                for entry, value in zip(entries, (name, desc, format_money(price_cents))):
+                    entry.delete(0, END); entry.insert(0, str(value) if value is not None else "")
+            else:
+                messagebox.showerror("Erro", "Produto não encontrado.")
         def save_changes():
             try:
                 prod_id = int(id_entry.get())
-                name, desc, price = name_entry.get(), desc_entry.get(), price_entry.get()
-                if self.db.update_product(prod_id, name, desc, price):
+                price_cents = to_cents(price_entry.get())
+            except ValueError:
+                messagebox.showerror("Erro", "Dados inválidos.")
+                return
+            name, desc = name_entry.get(), desc_entry.get()
+            def on_saved(updated):
+                if updated:
                     messagebox.showinfo("Sucesso", "Produto atualizado.")
                     self.show_manage_products()
                 else:
                     messagebox.showerror("Erro", "Não foi possível salvar.")
-            except ValueError:
-                messagebox.showerror("Erro", "Dados inválidos.")
+            self._db_call('update_product', prod_id, name, desc, price_cents, on_done=on_saved)
+        save_button = ctk.CTkButton(edit_form_frame, text="Salvar Alterações", command=save_changes, width=150)
         ctk.CTkButton(edit_form_frame, text="Carregar Produto", command=load_product_data, width=150).grid(row=0, column=2, padx=10, pady=5)
-        ctk.CTkButton(self.main_content_frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+        ctk.CTkButton(frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+        def refresh():
+            id_entry.delete(0, END)
+            for widget, _ in field_widgets:
+                widget.grid_forget()
+            save_button.grid_forget()
+        return refresh
 
     def _show_delete_product_form(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Remover Produto", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
-        delete_form_frame = ctk.CTkFrame(self.main_content_frame)
+        self._show_screen(self.screen_container, 'delete_product', self._build_delete_product_form)
+
+    def _build_delete_product_form(self, frame):
+        ctk.CTkLabel(frame, text="Remover Produto", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=20)
+        delete_form_frame = ctk.CTkFrame(frame)
         delete_form_frame.pack(pady=10)
         ctk.CTkLabel(delete_form_frame, text="ID do Produto para Remover:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
         id_entry = ctk.CTkEntry(delete_form_frame, width=250)
@@ -240,58 +420,69 @@ class MarcenariaApp(ctk.CTk):
                 return
             try:
                 prod_id = int(id_entry.get())
-                if self.db.delete_product(prod_id):
+            except ValueError:
+                messagebox.showerror("Erro", "ID inválido.")
+                return
+            def on_deleted(deleted):
+                if deleted:
                     messagebox.showinfo("Sucesso", "Produto removido.")
                     self.show_manage_products()
                 else:
                     messagebox.showerror("Erro", "Produto não encontrado ou associado a uma encomenda.")
-            except ValueError:
-                messagebox.showerror("Erro", "ID inválido.")
+            self._db_call('delete_product', prod_id, on_done=on_deleted)
         ctk.CTkButton(delete_form_frame, text="Remover", command=delete, fg_color="red", width=150).grid(row=0, column=2, padx=10, pady=5)
-        ctk.CTkButton(self.main_content_frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+        ctk.CTkButton(frame, text="Voltar", command=self.show_manage_products, fg_color="transparent", border_width=1).pack(pady=5)
+        return lambda: id_entry.delete(0, END)
 
     def show_create_order(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Criar Nova Encomenda", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
-        client_info_frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+        self._show_screen(self.screen_container, 'create_order', self._build_create_order)
+
+    def _build_create_order(self, frame):
+        ctk.CTkLabel(frame, text="Criar Nova Encomenda", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        client_info_frame = ctk.CTkFrame(frame, fg_color="transparent")
         client_info_frame.pack(pady=5)
         ctk.CTkLabel(client_info_frame, text="Nome do Cliente:").pack(side="left", padx=5)
         client_name_entry = ctk.CTkEntry(client_info_frame, width=400)
         client_name_entry.pack(side="left", padx=5)
-        items_display_frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+        items_display_frame = ctk.CTkFrame(frame, fg_color="transparent")
         items_display_frame.pack(fill="both", expand=True, padx=20, pady=10)
         self.order_items_display = ctk.CTkTextbox(items_display_frame, width=600, height=200)
         self.order_items_display.pack(pady=5, fill="both", expand=True)
-        self.order_items_display.insert(END, f"{'ID':<5}{'Produto':<30}{'Preço Uni.':<15}{'Qtd':<10}{'Subtotal':>15}\n" + "="*80 + "\n")
-        self.products_in_current_order = []
-        action_buttons_frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
+        order_lines = OrderLines() # Parallel integer arrays, prices in cents
+        action_buttons_frame = ctk.CTkFrame(frame, fg_color="transparent")
         action_buttons_frame.pack(pady=10)
         total_label = ctk.CTkLabel(action_buttons_frame, text="Total: R$ 0.00", font=ctk.CTkFont(size=16, weight="bold"))
         total_label.pack(side="left", padx=10)
         def update_total():
-            current_total = sum(item['subtotal'] for item in self.products_in_current_order)
-            total_label.configure(text=f"Total: R$ {current_total:.2f}")
+            total_label.configure(text=f"Total: R$ {format_money(order_lines.totals()['total'])}")
+        def reset_order():
+            client_name_entry.delete(0, END)
+            order_lines.clear()
+            self.order_items_display.delete("1.0", END)
+            self.order_items_display.insert(END, f"{'ID':<5}{'Produto':<30}{'Preço Uni.':<15}{'Qtd':<10}{'Subtotal':>15}\n" + "="*80 + "\n")
+            update_total()
         def add_item_to_order_popup():
+            self._db_call('search_products', "", PRODUCT_PICKER_LIMIT, on_done=open_product_popup) # Get products from the database
+        def open_product_popup(products):
+            if not products:
+                messagebox.showerror("Erro", "Nenhum produto cadastrado. Cadastre produtos antes de criar uma encomenda.")
+                return
             select_prod_win = ctk.CTkToplevel(self)
             select_prod_win.title("Selecionar Produto")
-            select_prod_win.geometry("500x400")
+            select_prod_win.geometry("500x480")
             select_prod_win.transient(self)
             select_prod_win.configure(fg_color=self._get_appearance_mode_color()) # Set background color
 
-            products = self.db.get_all_products() # Get products from the database
-            if not products:
-                messagebox.showerror("Erro", "Nenhum produto cadastrado. Cadastre produtos antes de criar uma encomenda.", parent=select_prod_win)
-                select_prod_win.destroy()
-                return
-
-            product_map = {f"{p[0]} - {p[1]} (R$ {p[3]:.2f})": {"id": p[0], "name": p[1], "price": p[3]} for p in products} # Corrected index for price (p[3])
-            product_options = list(product_map.keys())
-
             ctk.CTkLabel(select_prod_win, text="Selecione um Produto:").pack(pady=10)
-            product_combobox = ctk.CTkComboBox(select_prod_win, values=product_options, width=400)
-            product_combobox.pack(pady=10)
-            product_combobox.set(product_options[0] if product_options else "")
+            def search(text, limit, on_results):
+                self._db_call('search_products', text, limit, on_done=on_results)
+            product_picker = SearchPicker(select_prod_win, search, lambda p: f"{p[0]} - {p[1]} (R$ {format_money(p[3])})", # Price in cents is p[3]
+                                          on_choose=lambda p: confirm_add(), limit=PRODUCT_PICKER_LIMIT,
+                                          placeholder_text="Digite parte do nome ou da descrição", width=400, height=220,
+                                          fg_color="transparent")
+            product_picker.pack(pady=5)
+            product_picker.show_results(products)
+            product_picker.entry.focus_set()
 
             ctk.CTkLabel(select_prod_win, text="Quantidade:").pack(pady=5)
             quantity_entry = ctk.CTkEntry(select_prod_win, width=100)
@@ -300,36 +491,28 @@ class MarcenariaApp(ctk.CTk):
 
             def confirm_add():
                 try:
-                    selected_prod_text = product_combobox.get()
+                    selected_product = product_picker.selected()
                     qty_str = quantity_entry.get()
 
-                    if not selected_prod_text or not qty_str:
+                    if not selected_product or not qty_str:
                         messagebox.showerror("Erro", "Selecione um produto e insira a quantidade.", parent=select_prod_win)
                         return
 
-                    selected_info = product_map[selected_prod_text]
-                    product_id = selected_info["id"]
-                    product_name = selected_info["name"]
-                    product_price = selected_info["price"]
+                    product_id, product_name, _, product_price = selected_product
                     quantity = int(qty_str)
 
                     if quantity <= 0:
                         messagebox.showerror("Erro", "A quantidade deve ser maior que zero.", parent=select_prod_win)
                         return
 
+                    order_lines.add(product_id, product_name, product_price, quantity)
                     subtotal = product_price * quantity
-                    self.products_in_current_order.append({"id": product_id, "name": product_name,
-                                                            "price": product_price, "quantity": quantity,
-                                                            "subtotal": subtotal})
-
-                    self.order_items_display.insert(END, f"{product_id:<5}{product_name:<30}{product_price:<15.2f}{quantity:<10}{subtotal:>15.2f}\n")
+                    self.order_items_display.insert(END, f"{product_id:<5}{product_name:<30}{format_money(product_price):<15}{quantity:<10}{format_money(subtotal):>15}\n")
                     update_total()
                     select_prod_win.destroy()
 
                 except ValueError:
                     messagebox.showerror("Erro", "Quantidade inválida.", parent=select_prod_win)
-                except KeyError:
-                    messagebox.showerror("Erro", "Produto selecionado inválido.", parent=select_prod_win)
 
             ctk.CTkButton(select_prod_win, text="Adicionar Produto", command=confirm_add).pack(pady=20)
 
@@ -337,82 +520,302 @@ class MarcenariaApp(ctk.CTk):
             client_name = client_name_entry.get()
             if not client_name:
                 messagebox.showerror("Erro", "Nome do cliente é obrigatório."); return
-            if not self.products_in_current_order:
+            if not order_lines:
                 messagebox.showerror("Erro", "Adicione pelo menos um item."); return
-            order_total = sum(item['subtotal'] for item in self.products_in_current_order)
-            order_id = self.db.create_order(client_name, order_total, self.products_in_current_order)
-            if order_id:
-                messagebox.showinfo("Sucesso", f"Encomenda #{order_id} criada com sucesso!")
+            order_total = order_lines.totals()['total']
+            def on_saved(order_id):
+                if order_id:
+                    self._db_call('get_order_plan', order_id, on_done=lambda plan: on_planned(order_id, plan))
+                else:
+                    messagebox.showerror("Erro", "Não foi possível salvar a encomenda.")
+            def on_planned(order_id, plan):
+                message = f"Encomenda #{order_id} criada com sucesso!"
+                if plan:
+                    message += f"\nPrevisão de término: {plan['finish_date']:%d/%m/%Y} ({plan['position']}º na fila)."
+                    if plan['missing']:
+                        message += "\nAtenção: falta material para esta encomenda (veja Estoque)."
+                messagebox.showinfo("Sucesso", message)
                 self.show_create_order()
-            else:
-                messagebox.showerror("Erro", "Não foi possível salvar a encomenda.")
+            self._db_call('create_order', client_name, order_total, order_lines.as_items(), on_done=on_saved)
         ctk.CTkButton(action_buttons_frame, text="Adicionar Item", command=add_item_to_order_popup, width=150).pack(side="left", padx=10)
         ctk.CTkButton(action_buttons_frame, text="Salvar Encomenda", command=save_order, width=150).pack(side="right", padx=10)
+        return reset_order
 
     def show_update_order_status(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Atualizar Status da Encomenda", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
-        ctk.CTkLabel(self.main_content_frame, text="ID da Encomenda:").pack(pady=10)
-        order_id_entry = ctk.CTkEntry(self.main_content_frame, width=250)
-        order_id_entry.pack(pady=5)
-        current_status_label = ctk.CTkLabel(self.main_content_frame, text="Status Atual: N/A", font=ctk.CTkFont(size=14, weight="bold"))
-        current_status_label.pack(pady=5)
-        ctk.CTkLabel(self.main_content_frame, text="Novo Status:").pack(pady=5)
-        status_options = ["Pendente", "Em Produção", "Concluído", "Entregue", "Cancelado"]
-        status_combobox = ctk.CTkComboBox(self.main_content_frame, values=status_options, width=250)
-        status_combobox.pack(pady=5)
-        def load_order_status():
+        self._show_screen(self.screen_container, 'order_status', self._build_update_order_status)
+
+    def _build_update_order_status(self, frame):
+        ctk.CTkLabel(frame, text="Encomendas", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(10, 5))
+        filter_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        filter_frame.pack(pady=5)
+        client_entry = ctk.CTkEntry(filter_frame, width=170, placeholder_text="Cliente (início do nome)")
+        client_entry.pack(side="left", padx=3)
+        status_filter = ctk.CTkComboBox(filter_frame, values=["Todos"] + ORDER_STATUSES, width=130)
+        status_filter.set("Todos")
+        status_filter.pack(side="left", padx=3)
+        date_from_entry = ctk.CTkEntry(filter_frame, width=100, placeholder_text="De AAAA-MM-DD")
+        date_from_entry.pack(side="left", padx=3)
+        date_to_entry = ctk.CTkEntry(filter_frame, width=100, placeholder_text="Até AAAA-MM-DD")
+        date_to_entry.pack(side="left", padx=3)
+        total_min_entry = ctk.CTkEntry(filter_frame, width=90, placeholder_text="Total mín.")
+        total_min_entry.pack(side="left", padx=3)
+        total_max_entry = ctk.CTkEntry(filter_frame, width=90, placeholder_text="Total máx.")
+        total_max_entry.pack(side="left", padx=3)
+        filters = {}
+        def read_filters():
             try:
-                order_id = int(order_id_entry.get())
-                status = self.db.get_order_status(order_id)
-                if status:
-                    current_status_label.configure(text=f"Status Atual: {status}")
-                    status_combobox.set(status)
-                else:
-                    messagebox.showerror("Erro", "Encomenda não encontrada.")
+                dates = [datetime.date.fromisoformat(e.get().strip()).isoformat() if e.get().strip() else None
+                         for e in (date_from_entry, date_to_entry)]
             except ValueError:
-                messagebox.showerror("Erro", "ID inválido.")
-        def save_new_status():
+                messagebox.showerror("Erro", "Datas devem estar no formato AAAA-MM-DD.")
+                return None
             try:
-                order_id = int(order_id_entry.get())
-                new_status = status_combobox.get()
-                if not new_status:
-                    messagebox.showerror("Erro", "Selecione um novo status."); return
-                if self.db.update_order_status(order_id, new_status):
-                    messagebox.showinfo("Sucesso", f"Status da Encomenda #{order_id} atualizado.")
-                    self.show_update_order_status()
-                else:
-                    messagebox.showerror("Erro", "Encomenda não encontrada.")
+                totals = [to_cents(e.get()) if e.get().strip() else None for e in (total_min_entry, total_max_entry)]
             except ValueError:
-                messagebox.showerror("Erro", "ID inválido.")
-        button_group_frame = ctk.CTkFrame(self.main_content_frame, fg_color="transparent")
-        button_group_frame.pack(pady=20)
-        ctk.CTkButton(button_group_frame, text="Carregar Status", command=load_order_status, width=150).pack(side="left", padx=10)
-        ctk.CTkButton(button_group_frame, text="Salvar Novo Status", command=save_new_status, fg_color="green", width=150).pack(side="left", padx=10)
+                messagebox.showerror("Erro", "Totais inválidos.")
+                return None
+            status = status_filter.get()
+            return {'client_prefix': client_entry.get().strip() or None,
+                    'statuses': None if status == "Todos" else [status],
+                    'date_from': dates[0], 'date_to': dates[1], 'total_min': totals[0], 'total_max': totals[1]}
+        def search():
+            new_filters = read_filters()
+            if new_filters is not None:
+                filters.clear()
+                filters.update(new_filters)
+                orders_table.reset()
+        columns = [("id", "Nº", 70, "e"), ("client_name", "Cliente", 300, "w"), ("order_date", "Data", 110, "center"),
+                   ("status", "Status", 130, "w"), ("total", "Total (R$)", 120, "e")]
+        sort_index = {key: index for index, (key, *_) in enumerate(columns)}
+        def load_page(sort, descending, cursor, limit, on_page):
+            def on_orders(orders):
+                next_cursor = (orders[-1][sort_index[sort]], orders[-1][0]) if len(orders) == limit else None
+                on_page(orders, next_cursor)
+            self._db_call('search_orders', filters.get('client_prefix'), filters.get('statuses'),
+                          filters.get('date_from'), filters.get('date_to'), filters.get('total_min'),
+                          filters.get('total_max'), sort, descending, cursor, limit, on_done=on_orders)
+        orders_table = SortableTable(frame, columns, load_page, page_size=100, width=760, height=290,
+                                     descending_first=("id", "order_date", "total"),
+                                     format_value=lambda key, value: format_money(value) if key == "total" else value)
+        orders_table.pack(pady=5)
+        ctk.CTkButton(filter_frame, text="Buscar", command=search, width=80).pack(side="left", padx=3)
+        for entry in (client_entry, date_from_entry, date_to_entry, total_min_entry, total_max_entry):
+            entry.bind("<Return>", lambda event: search())
+        bulk_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        bulk_frame.pack(pady=5)
+        ctk.CTkLabel(bulk_frame, text="Novo status das selecionadas:").pack(side="left", padx=5)
+        status_combobox = ctk.CTkComboBox(bulk_frame, values=ORDER_STATUSES, width=150)
+        status_combobox.set(ORDER_STATUSES[0])
+        status_combobox.pack(side="left", padx=5)
+        def save_new_status():
+            selected = orders_table.selected_rows()
+            if not selected:
+                messagebox.showerror("Erro", "Selecione uma ou mais encomendas na tabela."); return
+            new_status = status_combobox.get()
+            if not messagebox.askyesno("Confirmar", f"Mudar {len(selected)} encomenda(s) para \"{new_status}\"?"):
+                return
+            def on_saved(updated):
+                messagebox.showinfo("Sucesso", f"{updated} encomenda(s) atualizada(s).")
+                orders_table.reset()
+            self._db_call('update_orders_status', [order[0] for order in selected], new_status, on_done=on_saved)
+        ctk.CTkButton(bulk_frame, text="Aplicar", command=save_new_status, fg_color="green", width=120).pack(side="left", padx=5)
+        return orders_table.reset
 
     def show_reports(self):
-        self.clear_frame(self.main_content_frame)
-        self._add_nav_bar()
-        ctk.CTkLabel(self.main_content_frame, text="Relatório de Encomendas", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
-        report_text = ctk.CTkTextbox(self.main_content_frame, width=780, height=400)
-        report_text.pack(pady=10, padx=10)
-        report_data = self.db.get_full_report()
-        if not report_data:
-            report_text.insert(END, "Nenhuma encomenda registrada.")
-            return
-        for data in report_data:
-            order, items = data['order'], data['items']
-            order_id, client, date, status, total = order
-            report_text.insert(END, f"--- Encomenda ID: {order_id} | Cliente: {client} | Data: {date} ---\n")
-            report_text.insert(END, f"    Status: {status}\n    Total: R$ {total:.2f}\n    Itens:\n")
-            if not items:
-                report_text.insert(END, "        (Nenhum item encontrado)\n")
+        self._show_screen(self.screen_container, 'reports', self._build_reports)
+
+    def _build_reports(self, frame):
+        ctk.CTkLabel(frame, text="Relatório de Encomendas", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(20, 10))
+        export_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        export_frame.pack(pady=5)
+        ctk.CTkLabel(export_frame, text="De:").pack(side="left", padx=5)
+        date_from_entry = ctk.CTkEntry(export_frame, width=110, placeholder_text="AAAA-MM-DD")
+        date_from_entry.pack(side="left", padx=5)
+        ctk.CTkLabel(export_frame, text="Até:").pack(side="left", padx=5)
+        date_to_entry = ctk.CTkEntry(export_frame, width=110, placeholder_text="AAAA-MM-DD")
+        date_to_entry.pack(side="left", padx=5)
+        status_combobox = ctk.CTkComboBox(export_frame, values=["Todos"] + ORDER_STATUSES, width=140)
+        status_combobox.set("Todos")
+        status_combobox.pack(side="left", padx=5)
+        include_archive = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(export_frame, text="Incluir arquivo", variable=include_archive, width=120,
+                        command=lambda: report_view.reset()).pack(side="left", padx=5)
+        def export():
+            dates = []
+            for entry in (date_from_entry, date_to_entry):
+                text = entry.get().strip()
+                try:
+                    dates.append(datetime.date.fromisoformat(text).isoformat() if text else None)
+                except ValueError:
+                    messagebox.showerror("Erro", "Datas devem estar no formato AAAA-MM-DD.")
+                    return
+            status = status_combobox.get()
+            path = filedialog.asksaveasfilename(parent=self, title="Exportar Relatório", defaultextension=".csv",
+                                                filetypes=EXPORT_FILE_TYPES, initialfile="relatorio.csv")
+            if not path:
+                return
+            def finished():
+                self._export_workers.remove(worker)
+                worker.close()
+                export_button.configure(state="normal")
+            def on_exported(count):
+                finished()
+                messagebox.showinfo("Sucesso", f"{count} registros exportados para {os.path.basename(path)}.")
+            def on_failed(error):
+                finished()
+                messagebox.showerror("Erro", f"Não foi possível exportar o relatório: {error}")
+            # Its own thread and connection, so a long export doesn't block the other screens' calls;
+            # submitted directly, so leaving the screen doesn't drop the result. Rows stream straight to the file
+            worker = DatabaseWorker(self, self.db_worker.db_name)
+            self._export_workers.append(worker)
+            export_button.configure(state="disabled")
+            worker.submit(export_report, path, None, *dates, None if status == "Todos" else [status],
+                          include_archive.get(), on_done=on_exported, on_error=on_failed)
+        export_button = ctk.CTkButton(export_frame, text="Exportar...", command=export, width=120)
+        export_button.pack(side="left", padx=10)
+        report_view = PagedListView(frame, lambda before_id, limit, on_page: self._load_report_page(
+                                        before_id, limit, on_page, include_archive.get()),
+                                    empty_text="Nenhuma encomenda registrada.", page_size=50,
+                                    width=780, height=340)
+        report_view.pack(pady=10, padx=10)
+        return report_view.reset
+
+    def _load_report_page(self, before_id, limit, on_page, include_archive=False):
+        def on_report_page(page):
+            next_cursor = page[-1]['order'][0] if len(page) == limit else None
+            on_page([format_report_entry(data) for data in page], next_cursor)
+        self._db_call('get_report_page', before_id, limit, include_archive, on_done=on_report_page)
+
+    def show_dashboard(self):
+        self._show_screen(self.screen_container, 'dashboard', self._build_dashboard)
+
+    def _build_dashboard(self, frame):
+        ctk.CTkLabel(frame, text="Painel de Vendas", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=20)
+        dashboard_text = ctk.CTkTextbox(frame, width=780, height=400, font=("Courier", 13))
+        dashboard_text.pack(pady=10, padx=10)
+        def on_metrics(metrics):
+            dashboard_text.configure(state="normal")
+            dashboard_text.delete("1.0", END)
+            dashboard_text.insert(END, format_dashboard(metrics))
+            dashboard_text.configure(state="disabled")
+        return lambda: self._db_call('get_dashboard_metrics', on_done=on_metrics)
+
+    def show_inventory(self):
+        self._show_screen(self.screen_container, 'inventory', self._build_inventory)
+
+    def _build_inventory(self, frame):
+        ctk.CTkLabel(frame, text="Estoque e Produção", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(20, 10))
+        def entry_row(fields, button_text, command):
+            row = ctk.CTkFrame(frame, fg_color="transparent")
+            row.pack(pady=3)
+            entries = [ctk.CTkEntry(row, width=width, placeholder_text=text) for text, width in fields]
+            for entry in entries:
+                entry.pack(side="left", padx=5)
+            ctk.CTkButton(row, text=button_text, command=command, width=150).pack(side="left", padx=10)
+            return entries
+        def read_ints(entries, optional=()):
+            # Blank optional fields come back as None
+            values = []
+            for entry in entries:
+                text = entry.get().strip()
+                if not text and entry in optional:
+                    values.append(None)
+                    continue
+                try:
+                    values.append(int(text))
+                except ValueError:
+                    messagebox.showerror("Erro", "Informe números inteiros nos campos de ids e quantidades.")
+                    return None
+            return values
+        def on_changed(ok, entries):
+            if ok:
+                for entry in entries:
+                    entry.delete(0, END)
+                refresh()
             else:
-                for item in items:
-                    report_text.insert(END, f"        - {item[0]}: {item[1]} unidade(s)\n")
-            report_text.insert(END, "-"*60 + "\n\n")
+                messagebox.showerror("Erro", "Não foi possível gravar. Confira os ids informados.")
+        def add_material():
+            name, unit = name_entry.get().strip(), unit_entry.get().strip() or "un"
+            values = read_ints([on_hand_entry], optional=[on_hand_entry])
+            if not name:
+                messagebox.showerror("Erro", "Nome do material é obrigatório."); return
+            if values is None:
+                return
+            self._db_call('add_material', name, unit, values[0] or 0,
+                          on_done=lambda material_id: on_changed(material_id, [name_entry, unit_entry, on_hand_entry]))
+        def adjust_stock():
+            values = read_ints([material_entry, delta_entry])
+            if values:
+                self._db_call('adjust_material_stock', *values,
+                              on_done=lambda ok: on_changed(ok, [material_entry, delta_entry]))
+        def save_bill_of_materials():
+            values = read_ints([product_entry, bom_material_entry, per_unit_entry, minutes_entry],
+                               optional=[bom_material_entry, per_unit_entry, minutes_entry])
+            if values is None:
+                return
+            product_id, material_id, per_unit, minutes = values
+            entries = [bom_material_entry, per_unit_entry, minutes_entry]
+            if material_id is not None and per_unit is not None:
+                self._db_call('set_product_material', product_id, material_id, per_unit,
+                              on_done=lambda ok: on_changed(ok, entries))
+            if minutes is not None:
+                self._db_call('set_production_minutes', product_id, minutes, on_done=lambda ok: on_changed(ok, entries))
+        name_entry, unit_entry, on_hand_entry = entry_row(
+            [("Material", 180), ("Unidade", 80), ("Saldo inicial", 110)], "Cadastrar Material", add_material)
+        material_entry, delta_entry = entry_row(
+            [("ID do material", 120), ("Entrada (+) / baixa (-)", 170)], "Lançar Movimento", adjust_stock)
+        product_entry, bom_material_entry, per_unit_entry, minutes_entry = entry_row(
+            [("ID do produto", 110), ("ID do material", 110), ("Qtd. por unidade", 120), ("Minutos/unidade", 120)],
+            "Salvar na Ficha", save_bill_of_materials)
+        inventory_text = ctk.CTkTextbox(frame, width=880, height=300, font=("Courier", 12), wrap="none")
+        inventory_text.pack(pady=10, padx=10)
+        def show(text):
+            inventory_text.configure(state="normal")
+            inventory_text.delete("1.0", END)
+            inventory_text.insert(END, text)
+            inventory_text.configure(state="disabled")
+        def refresh():
+            def on_materials(materials):
+                self._db_call('get_production_plan', 30,
+                              on_done=lambda plan: show(format_materials(materials) + "\n" + format_production_plan(plan)))
+            self._db_call('get_materials', on_done=on_materials)
+        return refresh
+
+    def show_diagnostics(self):
+        if self.screen_container is None or not self.main_content_frame.winfo_ismapped():
+            return # Only after login
+        self._with_session(lambda: self._show_screen(self.screen_container, 'diagnostics', self._build_diagnostics))()
+
+    def _build_diagnostics(self, frame):
+        ctk.CTkLabel(frame, text="Diagnóstico do Banco de Dados", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(20, 10))
+        diagnostics_text = ctk.CTkTextbox(frame, width=880, height=340, font=("Courier", 12), wrap="none")
+        diagnostics_text.pack(pady=10, padx=10)
+        def on_diagnostics(diagnostics):
+            diagnostics_text.configure(state="normal")
+            diagnostics_text.delete("1.0", END)
+            diagnostics_text.insert(END, format_diagnostics(diagnostics))
+            diagnostics_text.configure(state="disabled")
+        def refresh():
+            self._db_call('get_diagnostics', on_done=on_diagnostics)
+        def save():
+            path = filedialog.asksaveasfilename(parent=self, title="Salvar Diagnóstico", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")], initialfile="diagnostico.json")
+            if not path:
+                return
+            def on_saved(saved):
+                if saved:
+                    messagebox.showinfo("Sucesso", f"Diagnóstico salvo em {os.path.basename(path)}.")
+                else:
+                    messagebox.showerror("Erro", "Instrumentação desligada ou arquivo não gravado.")
+            self._db_call('dump_diagnostics', path, on_done=on_saved)
+        button_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        button_frame.pack(pady=5)
+        ctk.CTkButton(button_frame, text="Atualizar", command=refresh, width=120).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Zerar", command=lambda: self._db_call('reset_diagnostics', on_done=lambda _: refresh()),
+                      width=120).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Salvar em Arquivo...", command=save, width=150).pack(side="left", padx=5)
+        return refresh
 
 if __name__ == "__main__":
     app = MarcenariaApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
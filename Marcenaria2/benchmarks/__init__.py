@@ -0,0 +1,9 @@
+# benchmarks
+"""Medições de desempenho do banco. Rode a partir da pasta Marcenaria2, por exemplo:
+
+    python -m benchmarks.run --scales 1000 10000 100000 --output resultados.json
+    python -m benchmarks.synthetic /tmp/marcenaria.db --orders 100000
+    python -m benchmarks.indexes --orders 100000
+    python -m benchmarks.api_load --connections 50 --duration 10
+    python -m benchmarks.password_cost --target-ms 100
+"""
@@ -0,0 +1,172 @@
+# benchmarks/api_load.py
+"""Teste de carga da API HTTP (api_server.py) com conexões keep-alive.
+
+    python -m benchmarks.api_load --connections 50 --duration 10
+    python -m benchmarks.api_load --url 127.0.0.1:8080 --mix products:1,status:1
+
+Sem --url, gera um banco sintético numa pasta temporária e sobe o servidor
+num processo separado (para não dividir o GIL com os clientes). Cada conexão
+manda um pedido por vez, sorteado pelo --mix; o catálogo é pedido com
+If-None-Match, como faria a loja virtual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import generate_shop
+
+DEFAULT_MIX = "products:40,status:40,order:15,report:5"
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_server.py')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split(':')
+        if name not in KINDS:
+            raise argparse.ArgumentTypeError(f"tipo desconhecido: {name} (use {', '.join(KINDS)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def request_products(state, rng):
+    headers = {'If-None-Match': state['etag']} if state.get('etag') else {}
+    return 'GET', '/products', headers, None
+
+
+def request_status(state, rng):
+    return 'GET', f"/orders/{rng.randint(1, state['orders'])}", {}, None
+
+
+def request_order(state, rng):
+    items = [{'id': rng.randint(1, state['products']), 'quantity': rng.randint(1, 3)} for _ in range(3)]
+    return 'POST', '/orders', {}, {'client_name': "Cliente Carga", 'items': items}
+
+
+def request_report(state, rng):
+    return 'GET', '/report?limit=20', {}, None
+
+
+KINDS = {'products': request_products, 'status': request_status, 'order': request_order, 'report': request_report}
+
+
+async def send(reader, writer, host, method, path, headers, payload):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split(' ')[1])
+    response_headers = {}
+    for line in head[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            response_headers[name.strip().lower()] = value.strip()
+    length = int(response_headers.get('content-length') or 0)
+    await reader.readexactly(length)
+    return status, response_headers
+
+
+async def client(host, port, deadline, kinds, weights, state, seed, results):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, headers, payload = KINDS[kind](state, rng)
+            start = time.perf_counter()
+            status, response_headers = await send(reader, writer, host, method, path, headers, payload)
+            results.append((kind, status, time.perf_counter() - start))
+            if kind == 'products' and 'etag' in response_headers:
+                state['etag'] = response_headers['etag']
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(results, elapsed):
+    summary = {'requests': len(results), 'elapsed_s': elapsed, 'requests_per_s': len(results) / elapsed, 'kinds': {}}
+    for kind in sorted({r[0] for r in results}):
+        latencies = sorted(r[2] for r in results if r[0] == kind)
+        statuses = {}
+        for r in results:
+            if r[0] == kind:
+                statuses[str(r[1])] = statuses.get(str(r[1]), 0) + 1
+        summary['kinds'][kind] = {'count': len(latencies), 'statuses': statuses,
+                                  'p50_ms': percentile(latencies, 0.50) * 1000,
+                                  'p95_ms': percentile(latencies, 0.95) * 1000,
+                                  'p99_ms': percentile(latencies, 0.99) * 1000}
+    return summary
+
+
+async def run_load(host, port, connections, duration, mix, state):
+    kinds, weights = list(mix), list(mix.values())
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, start + duration, kinds, weights, state, seed, results)
+                           for seed in range(connections)))
+    return summarize(results, time.perf_counter() - start)
+
+
+def start_server(db_path, workers):
+    process = subprocess.Popen([sys.executable, SERVER, '--db', db_path, '--port', '0', '--workers', str(workers)],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Servindo em"):
+        process.kill()
+        raise RuntimeError(f"O servidor não subiu: {line!r}")
+    host, port = line.rsplit('/', 1)[1].strip().rsplit(':', 1)
+    return process, host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="host:porta de um servidor já rodando")
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10, help="segundos")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"padrão: {DEFAULT_MIX}")
+    parser.add_argument('--orders', type=int, default=10000, help="encomendas no banco sintético")
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4, help="threads de banco do servidor")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    state = {'orders': args.orders, 'products': args.products}
+    with tempfile.TemporaryDirectory() as tmp:
+        process = None
+        if args.url:
+            host, port = args.url.rsplit(':', 1)
+            port = int(port)
+        else:
+            generate_shop(os.path.join(tmp, 'marcenaria.db'), args.products, args.orders).close()
+            process, host, port = start_server(os.path.join(tmp, 'marcenaria.db'), args.workers)
+        try:
+            summary = asyncio.run(run_load(host, port, args.connections, args.duration, args.mix, state))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    print(f"{summary['requests']} pedidos em {summary['elapsed_s']:.1f} s: {summary['requests_per_s']:.0f} pedidos/s",
+          file=sys.stderr)
+    for kind, stats in summary['kinds'].items():
+        print(f"  {kind:<10}{stats['count']:>8}  p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+              f"p99 {stats['p99_ms']:.2f} ms  {stats['statuses']}", file=sys.stderr)
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
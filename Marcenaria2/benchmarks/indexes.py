@@ -0,0 +1,83 @@
+# benchmarks/indexes.py
+"""Compara as consultas de relatório e de busca antes e depois dos índices (migração 2).
+
+Monta um banco temporário na versão 1 do esquema, mede cada consulta e mostra o
+EXPLAIN QUERY PLAN; depois aplica as migrações restantes e repete.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from database import run_migrations, SCHEMA_VERSION
+
+STATUSES = ["Pendente", "Em Produção", "Concluído", "Entregue", "Cancelado"]
+
+QUERIES = {
+    'itens da encomenda': ('SELECT product_id, quantity FROM order_items WHERE order_id = ?',
+                           lambda n: (random.randint(1, n),)),
+    'encomendas do produto': ('SELECT order_id FROM order_items WHERE product_id = ? LIMIT 50',
+                              lambda n: (random.randint(1, 200),)),
+    'encomendas por status': ('SELECT id FROM orders WHERE status = ? ORDER BY id DESC LIMIT 50',
+                              lambda n: ("Cancelado",)),
+    'encomendas do dia': ('SELECT id FROM orders WHERE order_date = ?',
+                          lambda n: (f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",)),
+    'encomendas do cliente': ('SELECT id FROM orders WHERE client_name = ?',
+                              lambda n: (f"Cliente {random.randint(1, n // 3 or 1)}",)),
+}
+
+
+def populate(conn, orders, items_per_order):
+    conn.executemany('INSERT INTO products (name, description, price) VALUES (?, ?, ?)',
+                     ((f"Produto {i}", "", 10.0 + i) for i in range(1, 201)))
+    conn.executemany('INSERT INTO orders (id, client_name, order_date, status, total) VALUES (?, ?, ?, ?, ?)',
+                     ((i, f"Cliente {random.randint(1, orders // 3 or 1)}",
+                       f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+                       random.choices(STATUSES, weights=(2, 2, 2, 10, 1))[0], 100.0)
+                      for i in range(1, orders + 1)))
+    conn.executemany('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)',
+                     ((i, random.randint(1, 200), random.randint(1, 5))
+                      for i in range(1, orders + 1) for _ in range(items_per_order)))
+    conn.commit()
+
+
+def measure(conn, orders, repeat):
+    results = {}
+    for name, (sql, make_params) in QUERIES.items():
+        plan = " / ".join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, make_params(orders)))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, make_params(orders)).fetchall()
+        results[name] = ((time.perf_counter() - start) / repeat * 1000, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--items', type=int, default=3, help="itens por encomenda")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'marcenaria.db'))
+        run_migrations(conn, target=1)
+        populate(conn, args.orders, args.items)
+        before = measure(conn, args.orders, args.repeat)
+        run_migrations(conn)
+        conn.execute('ANALYZE')
+        after = measure(conn, args.orders, args.repeat)
+        conn.close()
+
+    print(f"{args.orders} encomendas, {args.orders * args.items} itens (esquema v1 -> v{SCHEMA_VERSION})\n")
+    for name in QUERIES:
+        (ms_before, plan_before), (ms_after, plan_after) = before[name], after[name]
+        print(f"{name}: {ms_before:.3f} ms -> {ms_after:.3f} ms ({ms_before / max(ms_after, 1e-6):.0f}x)")
+        print(f"    antes:  {plan_before}")
+        print(f"    depois: {plan_after}")
+
+
+if __name__ == '__main__':
+    main()
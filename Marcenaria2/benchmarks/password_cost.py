@@ -0,0 +1,63 @@
+# benchmarks/password_cost.py
+"""Calibra o custo do scrypt (n) para um tempo de login alvo nesta máquina.
+
+    python -m benchmarks.password_cost --target-ms 100 --terminals 20
+
+Mede quanto um hash demora para cada n (potências de 2) e quanto levam
+`--terminals` logins simultâneos, como na troca de turno. Sugere o maior n
+cujo hash fica dentro do alvo; para usá-lo, defina MARCENARIA_SCRYPT_N antes
+de abrir o app ou a API. Hashes com outro custo são refeitos no próximo login.
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import passwords
+
+
+def time_hash(n, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        passwords.hash_password("senha-de-teste", n)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def time_concurrent_logins(n, terminals):
+    stored = passwords.hash_password("senha-de-teste", n)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(terminals) as executor:
+        list(executor.map(lambda _: passwords.verify_password("senha-de-teste", stored), range(terminals)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target-ms', type=float, default=100, help="tempo máximo de um hash")
+    parser.add_argument('--terminals', type=int, default=10, help="logins simultâneos simulados")
+    parser.add_argument('--min-log2', type=int, default=10)
+    parser.add_argument('--max-log2', type=int, default=18)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    chosen = None
+    print(f"{'n':>8}  {'hash':>10}  {f'{args.terminals} logins':>14}")
+    for log2 in range(args.min_log2, args.max_log2 + 1):
+        n = 2 ** log2
+        single = time_hash(n, args.repeat)
+        burst = time_concurrent_logins(n, args.terminals)
+        print(f"{n:>8}  {single * 1000:>7.1f} ms  {burst * 1000:>11.1f} ms")
+        if single * 1000 <= args.target_ms:
+            chosen = n
+        else:
+            break
+    if chosen is None:
+        print(f"Nenhum n cabe em {args.target_ms:.0f} ms; use --min-log2 menor.", file=sys.stderr)
+        sys.exit(1)
+    print(f"\nSugestão para {args.target_ms:.0f} ms: MARCENARIA_SCRYPT_N={chosen} (atual: {passwords.SCRYPT_N})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# benchmarks/run.py
+"""Mede as operações principais do DatabaseManager em várias escalas e grava JSON.
+
+    python -m benchmarks.run --scales 1000 10000 100000 --output resultados.json
+    python -m benchmarks.run --baseline resultados.json   # falha se algo piorar
+
+Cada escala é um banco sintético novo (benchmarks.synthetic) num diretório
+temporário. O caminho de renderização do relatório é medido sem Tk: gera o
+texto de todas as encomendas com as mesmas funções usadas na tela.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import BENCH_USER, FIRST_NAMES, LAST_NAMES, generate_shop
+from export import export_report
+from inventory import ProductionPlanner
+from money import OrderLines
+from passwords import SessionCache
+from formatting import format_report_entry
+
+
+def bench_full_report(db, rng):
+    db.get_full_report()
+
+
+def bench_report_page(db, rng):
+    db.get_report_page(None, 50)
+
+
+def bench_render_report(db, rng):
+    for data in db.iter_full_report():
+        format_report_entry(data)
+
+
+def bench_export_report(db, rng):
+    export_report(db, os.devnull, 'csv')
+
+
+def bench_search_orders(db, rng):
+    db.search_orders(client_prefix=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(100)}")
+
+
+def bench_all_products(db, rng):
+    db.get_all_products()
+
+
+def bench_create_order(db, rng):
+    db.create_order("Cliente Benchmark", 10000, [{'id': rng.randint(1, 50), 'quantity': 1} for _ in range(3)])
+
+
+def bench_create_order_replan(db, rng):
+    order_id = db.create_order("Cliente Benchmark", 10000, [{'id': rng.randint(1, 50), 'quantity': 1} for _ in range(3)])
+    db.get_order_plan(order_id)
+
+
+def bench_load_production_plan(db, rng):
+    ProductionPlanner.load(db.conn).queue()
+
+
+def bench_order_totals(db, rng):
+    lines = OrderLines()
+    for prod_id in range(1, 1001):
+        lines.add(prod_id, "Produto", rng.randrange(100, 400000), rng.randint(1, 20))
+    lines.totals(discount_bp=1000, tax_bp=1800)
+
+
+def bench_reprice_products(db, rng):
+    db.reprice_products(rng.choice((100, -100)))
+
+
+def bench_verify_user(db, rng):
+    db.verify_user(*BENCH_USER)
+
+
+def bench_verify_user_cold(db, rng):
+    db.sessions = SessionCache()  # sem sessão anterior: mede o scrypt
+    db.verify_user(*BENCH_USER)
+
+
+# nome -> (função, repetições); as que leem tudo repetem menos.
+BENCHMARKS = {
+    'get_full_report': (bench_full_report, 3),
+    'get_report_page': (bench_report_page, 50),
+    'render_report': (bench_render_report, 3),
+    'export_report': (bench_export_report, 3),
+    'search_orders': (bench_search_orders, 100),
+    'get_all_products': (bench_all_products, 20),
+    'create_order': (bench_create_order, 200),
+    'create_order_replan': (bench_create_order_replan, 200),
+    'load_production_plan': (bench_load_production_plan, 5),
+    'order_totals_1000_lines': (bench_order_totals, 50),
+    'reprice_products': (bench_reprice_products, 20),
+    'verify_user': (bench_verify_user, 200),
+    'verify_user_cold': (bench_verify_user_cold, 10),
+}
+
+
+def run_scale(orders, products, items_per_order, only):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        db = generate_shop(os.path.join(tmp, 'marcenaria.db'), products, orders, items_per_order)
+        print(f"[{orders} encomendas] banco gerado em {time.perf_counter() - start:.1f} s", file=sys.stderr)
+        try:
+            for name, (func, repeat) in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                rng = random.Random(1)
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    func(db, rng)
+                    timings.append(time.perf_counter() - start)
+                result = {'scale': orders, 'benchmark': name, 'runs': repeat,
+                          'median_s': statistics.median(timings), 'min_s': min(timings)}
+                print(f"[{orders} encomendas] {name}: {result['median_s'] * 1000:.3f} ms", file=sys.stderr)
+                results.append(result)
+        finally:
+            db.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista as medições mais lentas que a referência além da tolerância."""
+    reference = {(r['scale'], r['benchmark']): r['median_s'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = reference.get((result['scale'], result['benchmark']))
+        if before and result['median_s'] > before * (1 + tolerance):
+            regressions.append(f"{result['benchmark']} @ {result['scale']}: "
+                               f"{before * 1000:.3f} ms -> {result['median_s'] * 1000:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="números de encomendas (até 1000000)")
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=3, help="itens por encomenda")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="roda só estas medições")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="piora aceita em relação à referência")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, args.products, args.items, args.only))
+    report = {'meta': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                       'platform': platform.platform(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'products': args.products, 'items_per_order': args.items},
+              'results': results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSÃO: {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
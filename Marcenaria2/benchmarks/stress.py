@@ -0,0 +1,370 @@
+# benchmarks/stress.py
+"""Teste de carga e de consistência do DatabaseManager com vários terminais no mesmo banco.
+
+    python -m benchmarks.stress --threads 8 --duration 20
+    python -m benchmarks.stress --processes 4 --threads 2 --mix order:50,status:30,report:20
+    python -m benchmarks.stress --db copia.db --seed 7 --output stress.json
+
+Cada processo (um "terminal") abre o seu DatabaseManager e roda --threads
+threads sobre ele, como o servidor da API; sem --processes tudo roda neste
+processo. Cada thread sorteia operações pelo --mix com a sua semente
+(--seed + número da thread), então uma falha pode ser repetida. Sem --db, usa
+um banco sintético (benchmarks.synthetic) numa pasta temporária.
+
+Ao final confere as invariantes e sai com código 1 se alguma falhar:
+cada id devolvido por create_order/create_orders tem exatamente os itens
+enviados e total igual à soma deles; não há order_items sem encomenda nem
+encomenda nova sem itens; sales_daily bate com as encomendas; as reservas
+das encomendas novas batem com as fichas técnicas; o plano de produção
+mantido em memória por cada terminal é igual ao relido do banco; o banco
+passa no integrity_check; e não houve erro do banco além do lock de escrita
+esgotado. Os erros são contados pelo on_error do DatabaseManager. Também
+mostra vazão, latências e quantas vezes alguém esperou além do busy_timeout
+(esses erros contam como carga, não como defeito).
+
+tests/test_stress.py roda uma versão curta disto com pytest.
+"""
+import argparse
+import collections
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.synthetic import FIRST_NAMES, LAST_NAMES, STATUSES, generate_shop
+
+DEFAULT_MIX = "order:30,batch:5,status:25,report:15,search:10,plan:10,stock:5"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split(':')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"operação desconhecida: {name} (use {', '.join(OPERATIONS)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def _random_order(rng, state):
+    items = [{'id': product_id, 'quantity': rng.randint(1, 4), 'unit_price_cents': state['prices'][product_id]}
+             for product_id in rng.sample(state['product_ids'], rng.randint(1, 4))]
+    return {'client_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} Carga",
+            'total': sum(item['unit_price_cents'] * item['quantity'] for item in items), 'items': items}
+
+
+def _created(state, order_id, order):
+    state['created'].append((order_id, order['total'],
+                             sorted((item['id'], item['quantity']) for item in order['items'])))
+
+
+def op_order(db, rng, state):
+    order = _random_order(rng, state)
+    order_id = db.create_order(order['client_name'], order['total'], order['items'])
+    if order_id is None:
+        return False
+    _created(state, order_id, order)
+    return True
+
+
+def op_batch(db, rng, state):
+    orders = [_random_order(rng, state) for _ in range(rng.randint(2, 10))]
+    order_ids = db.create_orders(orders)
+    for order_id, order in zip(order_ids, orders):
+        if order_id is not None:
+            _created(state, order_id, order)
+    return None not in order_ids
+
+
+def op_status(db, rng, state):
+    created = state['created']
+    if not created:
+        return True
+    order_ids = [rng.choice(created)[0] for _ in range(rng.randint(1, 5))]
+    db.update_orders_status(order_ids, rng.choice(STATUSES))  # 0 também quando nada mudou; erros vão para db_errors
+    return True
+
+
+def op_report(db, rng, state):
+    db.get_report_page(rng.randint(1, state['max_id'] + len(state['created']) + 1), 50)
+    return True
+
+
+def op_search(db, rng, state):
+    db.search_orders(client_prefix=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                     statuses=rng.sample(STATUSES, 2), limit=50)
+    return True
+
+
+def op_plan(db, rng, state):
+    db.get_production_plan(20)
+    return True
+
+
+def op_stock(db, rng, state):
+    if not state['material_ids']:
+        return True
+    return db.adjust_material_stock(rng.choice(state['material_ids']), rng.randint(-50, 500))
+
+
+OPERATIONS = {'order': op_order, 'batch': op_batch, 'status': op_status, 'report': op_report,
+              'search': op_search, 'plan': op_plan, 'stock': op_stock}
+
+
+def is_lock_error(error):
+    """O erro é o lock de escrita esgotado (SQLITE_BUSY/SQLITE_LOCKED)?"""
+    name = getattr(error, 'sqlite_errorname', None)  # Python 3.11+
+    if name is not None:
+        return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+
+class _ErrorCounter:
+    """on_error do DatabaseManager: conta os erros em vez de imprimi-los, separando os de lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.errors = 0
+        self.locked = 0
+        self.examples = []  # alguns erros que não são de lock, para o relatório
+
+    def __call__(self, method, error):
+        with self.lock:
+            self.errors += 1
+            if is_lock_error(error):
+                self.locked += 1
+            elif len(self.examples) < 5:
+                self.examples.append(f"{method}: {error!r}")
+
+
+def _run_thread(db, seed, deadline, mix, state, results, counter):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        try:
+            ok = OPERATIONS[kind](db, rng, state)
+        except sqlite3.Error as e:  # os métodos que não tratam erro (ex.: update_order_status)
+            ok = False
+            counter(kind, e)
+        results.append((kind, ok, time.perf_counter() - start))
+    db.release_connection()
+
+
+def run_terminal(db_path, terminal, threads, duration, mix, seed, state, busy_timeout, barrier=None):
+    """Um terminal: um DatabaseManager e `threads` threads até o prazo; devolve resultados e ids criados.
+
+    `barrier` (com vários processos) segura a conferência do plano até todos pararem de gravar.
+    """
+    from database import DatabaseManager
+    from inventory import ProductionPlanner
+    counter = _ErrorCounter()
+    db = DatabaseManager(db_path, pragmas={'busy_timeout': busy_timeout}, on_error=counter)
+    state = {**state, 'created': []}
+    results = []
+    db.get_production_plan(1)  # carrega o plano para que as gravações o mantenham em memória
+    deadline = time.perf_counter() + duration
+    workers = [threading.Thread(target=_run_thread,
+                                args=(db, seed + terminal * 1000 + i, deadline, mix, state, results, counter))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if barrier is not None:
+        barrier.wait()
+    try:
+        # O plano que este terminal manteve (ou releu) tem que ser igual ao do banco agora.
+        kept = db.get_production_plan(None)['queue']
+        fresh = ProductionPlanner.load(db.conn)
+        fresh.set_stock(db.conn.execute('SELECT id, name, unit, on_hand FROM materials'))
+        planner_ok = kept == fresh.queue()
+    finally:
+        db.close()
+    return {'results': results, 'created': state['created'], 'db_errors': counter.errors,
+            'locked': counter.locked, 'error_examples': counter.examples, 'planner_ok': planner_ok}
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(terminals, elapsed):
+    results = [r for terminal in terminals for r in terminal['results']]
+    summary = {'operations': len(results), 'elapsed_s': elapsed, 'operations_per_s': len(results) / elapsed,
+               'db_errors': sum(t['db_errors'] for t in terminals),
+               'locked': sum(t['locked'] for t in terminals), 'kinds': {}}
+    by_kind = collections.defaultdict(list)
+    failures = collections.Counter()
+    for kind, ok, seconds in results:
+        by_kind[kind].append(seconds)
+        failures[kind] += not ok
+    for kind in sorted(by_kind):
+        latencies = sorted(by_kind[kind])
+        summary['kinds'][kind] = {'count': len(latencies), 'per_s': len(latencies) / elapsed,
+                                  'failed': failures[kind],
+                                  'p50_ms': percentile(latencies, 0.50) * 1000,
+                                  'p95_ms': percentile(latencies, 0.95) * 1000,
+                                  'p99_ms': percentile(latencies, 0.99) * 1000,
+                                  'max_ms': latencies[-1] * 1000}
+    return summary
+
+
+def check_invariants(db_path, created, max_id, terminals):
+    """Confere o banco depois da carga; devolve a lista de invariantes violadas (vazia = tudo certo)."""
+    import maintenance
+    from database import DatabaseManager
+    db = DatabaseManager(db_path)
+    conn = db.conn
+    problems = []
+    try:
+        ids = [order_id for order_id, _, _ in created]
+        if len(ids) != len(set(ids)):
+            problems.append("o mesmo id de encomenda foi devolvido a duas gravações")
+        items = collections.defaultdict(list)
+        for order_id, product_id, quantity in conn.execute(
+                'SELECT order_id, product_id, quantity FROM order_items WHERE order_id > ?', (max_id,)):
+            items[order_id].append((product_id, quantity))
+        wrong = [order_id for order_id, _, sent in created if sorted(items.get(order_id, ())) != sent]
+        if wrong:
+            problems.append(f"{len(wrong)} encomendas com itens diferentes dos enviados (ex.: #{wrong[0]})")
+        mismatched = conn.execute('''
+            SELECT COUNT(*) FROM orders o WHERE o.id > ? AND o.total_cents !=
+                (SELECT COALESCE(SUM(quantity * unit_price_cents), 0) FROM order_items WHERE order_id = o.id)
+        ''', (max_id,)).fetchone()[0]
+        if mismatched:
+            problems.append(f"{mismatched} encomendas novas com total diferente da soma dos itens")
+        empty = conn.execute('''SELECT COUNT(*) FROM orders o WHERE o.id > ?
+                                AND NOT EXISTS (SELECT 1 FROM order_items WHERE order_id = o.id)''',
+                             (max_id,)).fetchone()[0]
+        if empty:
+            problems.append(f"{empty} encomendas novas sem itens")
+        orphans = conn.execute('''SELECT COUNT(*) FROM order_items oi
+                                  WHERE NOT EXISTS (SELECT 1 FROM orders WHERE id = oi.order_id)''').fetchone()[0]
+        if orphans:
+            problems.append(f"{orphans} order_items sem encomenda")
+        unknown = conn.execute('SELECT COUNT(*) FROM orders WHERE id > ?', (max_id,)).fetchone()[0] - len(set(ids))
+        if unknown:
+            problems.append(f"{unknown} encomendas gravadas sem id devolvido a ninguém")
+        maintenance.attach_archive(conn, db.archive_name)  # as arquivadas também contam nos totais
+        source = 'orders'
+        if conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'").fetchone():
+            source = ('(SELECT order_date, status, total_cents FROM orders '
+                      'UNION ALL SELECT order_date, status, total_cents FROM archive.orders)')
+        expected = set(conn.execute(f'SELECT order_date, status, COUNT(*), SUM(total_cents) FROM {source} '
+                                    'GROUP BY order_date, status'))
+        stored = set(conn.execute('SELECT day, status, orders, revenue FROM sales_daily WHERE orders != 0'))
+        if expected != stored:
+            problems.append(f"sales_daily difere das encomendas em {len(expected ^ stored)} linhas")
+        expected = set(conn.execute('''
+            SELECT o.id, pm.material_id, SUM(pm.quantity * oi.quantity)
+            FROM orders o JOIN order_items oi ON oi.order_id = o.id
+            JOIN product_materials pm ON pm.product_id = oi.product_id
+            WHERE o.id > ? AND o.status IN ('Pendente', 'Em Produção')
+            GROUP BY o.id, pm.material_id
+        ''', (max_id,)))
+        reservations = len(expected ^ set(conn.execute(
+            'SELECT order_id, material_id, quantity FROM stock_reservations WHERE order_id > ?', (max_id,))))
+        if reservations:
+            problems.append(f"{reservations} reservas de material diferentes das fichas técnicas")
+        stale = [i for i, terminal in enumerate(terminals) if not terminal['planner_ok']]
+        if stale:
+            problems.append(f"plano de produção em memória diferente do banco nos terminais {stale}")
+        integrity = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        if integrity != 'ok':
+            problems.append(f"integrity_check: {integrity}")
+    finally:
+        db.close()
+    return problems
+
+
+def run_stress(db_path, processes, threads, duration, mix, seed, busy_timeout):
+    from database import DatabaseManager
+    db = DatabaseManager(db_path)
+    try:
+        products = db.get_all_products()
+        state = {'product_ids': [p[0] for p in products], 'prices': {p[0]: p[3] for p in products},
+                 'material_ids': [m[0] for m in db.get_materials()],
+                 'max_id': db.conn.execute('SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]}
+    finally:
+        db.close()
+    if not state['product_ids']:
+        raise SystemExit("O banco não tem produtos.")
+    start = time.perf_counter()
+    if processes:
+        # spawn também no Linux: um fork herdaria conexões SQLite abertas.
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager, ProcessPoolExecutor(processes, mp_context=context) as pool:
+            barrier = manager.Barrier(processes)
+            futures = [pool.submit(run_terminal, db_path, terminal, threads, duration, mix, seed, state, busy_timeout,
+                                   barrier)
+                       for terminal in range(processes)]
+            terminals = [future.result() for future in futures]
+    else:
+        terminals = [run_terminal(db_path, 0, threads, duration, mix, seed, state, busy_timeout)]
+    summary = summarize(terminals, time.perf_counter() - start)
+    summary.update({'processes': processes, 'threads': threads, 'seed': seed,
+                    'date': datetime.datetime.now().isoformat(timespec='seconds')})
+    created = [entry for terminal in terminals for entry in terminal['created']]
+    summary['orders_created'] = len(created)
+    summary['problems'] = check_invariants(db_path, created, state['max_id'], terminals)
+    if summary['db_errors'] > summary['locked']:
+        # Esgotar o busy_timeout é carga; qualquer outro erro do banco é defeito.
+        examples = [example for terminal in terminals for example in terminal['error_examples']]
+        summary['problems'].append(f"{summary['db_errors'] - summary['locked']} erros do banco que não são de lock "
+                                   f"(ex.: {'; '.join(examples[:3])})")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="banco a usar (é alterado!); padrão: um sintético temporário")
+    parser.add_argument('--processes', type=int, default=0, help="terminais em processos separados (0 = só este)")
+    parser.add_argument('--threads', type=int, default=4, help="threads por terminal")
+    parser.add_argument('--duration', type=float, default=10, help="segundos")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"padrão: {DEFAULT_MIX}")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--orders', type=int, default=10000, help="encomendas no banco sintético")
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--busy-timeout', type=int, default=5000, help="ms esperando o lock de escrita")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, 'marcenaria.db')
+            generate_shop(db_path, args.products, args.orders).close()
+        summary = run_stress(db_path, args.processes, args.threads, args.duration, args.mix, args.seed,
+                             args.busy_timeout)
+    print(f"{summary['operations']} operações em {summary['elapsed_s']:.1f} s: "
+          f"{summary['operations_per_s']:.0f} op/s ({args.processes or 1} terminal(is) x {args.threads} threads)",
+          file=sys.stderr)
+    for kind, stats in summary['kinds'].items():
+        print(f"  {kind:<8}{stats['count']:>8}  {stats['per_s']:>7.0f}/s  p50 {stats['p50_ms']:.2f} ms  "
+              f"p95 {stats['p95_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms  máx {stats['max_ms']:.0f} ms  "
+              f"falhas {stats['failed']}", file=sys.stderr)
+    print(f"  erros do banco: {summary['db_errors']} (lock de escrita esgotado: {summary['locked']})", file=sys.stderr)
+    for problem in summary['problems']:
+        print(f"FALHOU: {problem}", file=sys.stderr)
+    if not summary['problems']:
+        print(f"Invariantes ok ({summary['orders_created']} encomendas novas conferidas).", file=sys.stderr)
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if summary['problems']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
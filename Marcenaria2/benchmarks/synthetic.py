@@ -0,0 +1,89 @@
+# benchmarks/synthetic.py
+"""Gera uma marcenaria sintética (produtos, materiais, fichas técnicas, encomendas e itens) num banco novo.
+
+    python -m benchmarks.synthetic /tmp/marcenaria.db --orders 100000
+"""
+import argparse
+import datetime
+import random
+import time
+from database import DatabaseManager
+
+KINDS = ["Mesa", "Cadeira", "Armário", "Estante", "Cômoda", "Banco", "Rack", "Criado-mudo", "Escrivaninha", "Cama"]
+WOODS = ["Pinus", "Carvalho", "Cedro", "Peroba", "Imbuia", "Jatobá", "MDF", "Freijó"]
+FINISHES = ["natural", "envernizado", "laqueado", "rústico", "com gavetas", "de canto"]
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Irene", "João"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Pereira", "Lima", "Costa", "Ribeiro", "Almeida", "Gomes", "Martins"]
+STATUSES = ["Pendente", "Em Produção", "Concluído", "Entregue", "Cancelado"]
+MATERIALS = [("Tábua", "cm"), ("Compensado", "cm2"), ("Parafuso", "un"), ("Dobradiça", "un"), ("Verniz", "ml"),
+             ("Cola", "ml"), ("Puxador", "un"), ("Lixa", "un")]
+
+BENCH_USER = ("bench", "bench-senha")
+
+
+def iter_products(rng, count):
+    for i in range(1, count + 1):
+        name = f"{rng.choice(KINDS)} {rng.choice(WOODS)} {i}"
+        yield name, f"{rng.choice(KINDS)} {rng.choice(FINISHES)}", rng.randrange(8000, 400001)
+
+
+def iter_bill_of_materials(rng, product_ids, material_ids, per_product=3):
+    for product_id in product_ids:
+        for material_id in rng.sample(material_ids, min(per_product, len(material_ids))):
+            yield product_id, material_id, rng.randint(1, 60)
+
+
+def iter_orders(rng, count, items_per_order, prices, days):
+    today = datetime.date.today()
+    product_ids = list(prices)
+    for _ in range(count):
+        age = rng.randrange(days)
+        # Encomendas antigas quase sempre já foram entregues (ou canceladas).
+        status = rng.choices(STATUSES, weights=(1, 1, 1, 20, 1) if age > 60 else (4, 3, 2, 2, 1))[0]
+        items = [{'id': prod_id, 'quantity': rng.randint(1, 4)} for prod_id in rng.sample(product_ids, items_per_order)]
+        yield {'client_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(count // 4 + 1)}",
+               'order_date': (today - datetime.timedelta(days=age)).isoformat(),
+               'status': status,
+               'total': sum(prices[item['id']] * item['quantity'] for item in items),
+               'items': items}
+
+
+def generate_shop(path, products=500, orders=1000, items_per_order=3, seed=42, days=730, materials=40):
+    """Cria o banco em `path` e devolve o DatabaseManager aberto sobre ele.
+
+    As fichas técnicas são gravadas antes das encomendas, para que as abertas
+    reservem material como no uso real.
+    """
+    rng = random.Random(seed)
+    db = DatabaseManager(path)
+    db.add_products_bulk(iter_products(rng, products), batch_size=5000)
+    prices = {p[0]: p[3] for p in db.get_all_products()}
+    material_ids = []
+    for i in range(1, materials + 1):
+        name, unit = rng.choice(MATERIALS)
+        material_ids.append(db.add_material(f"{name} {i}", unit, rng.randrange(10000, 1000000)))
+    with db.conn:
+        db.conn.executemany('INSERT INTO product_materials (product_id, material_id, quantity) VALUES (?, ?, ?)',
+                            iter_bill_of_materials(rng, list(prices), material_ids))
+        db.conn.executemany('INSERT INTO production_times (product_id, minutes) VALUES (?, ?)',
+                            [(product_id, rng.randrange(30, 481)) for product_id in prices])
+    db.create_orders_bulk(iter_orders(rng, orders, min(items_per_order, products), prices, days), batch_size=5000)
+    db.add_user(*BENCH_USER)
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=3, help="itens por encomenda")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    generate_shop(args.path, args.products, args.orders, args.items, args.seed).close()
+    print(f"{args.orders} encomendas e {args.products} produtos gerados em {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# catalog.py
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+
+def normalize(text):
+    """Minúsculas e sem acentos, para a busca por nome."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductCatalog:
+    """Cache do catálogo de produtos na frente de um DatabaseManager.
+
+    A tabela products é lida uma vez e guardada por id, junto com um índice de
+    busca pelo nome: prefixos de palavras (lista ordenada + bisect) e trigramas
+    para trechos no meio do nome. add_product, update_product, delete_product,
+    add_products_bulk e reprice_products invalidam o cache; alterações feitas por outras conexões
+    são percebidas pelo contador de versão do catálogo (get_products_version).
+    Os demais métodos são repassados ao DatabaseManager.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._version = None
+        self._products = {}    # id -> (id, name, description, price_cents)
+        self._ordered = []     # os mesmos produtos em ordem de id
+        self._ids = []
+        self._words = []       # (palavra normalizada, id), ordenado
+        self._names = {}       # id -> nome normalizado
+        self._trigrams = {}    # trigrama -> ids
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def _ensure_loaded(self):
+        version = self.db.get_products_version()
+        if version == self._version:
+            return
+        products = sorted(self.db.get_all_products(), key=lambda p: p[0])
+        words, names, index = [], {}, {}
+        for product in products:
+            prod_id, name = product[0], normalize(product[1])
+            names[prod_id] = name
+            words.extend((word, prod_id) for word in name.split())
+            for gram in trigrams(name):
+                index.setdefault(gram, []).append(prod_id)
+        words.sort()
+        self._products = {p[0]: p for p in products}
+        self._ordered = products
+        self._ids = [p[0] for p in products]
+        self._words, self._names, self._trigrams = words, names, index
+        self._version = version
+
+    # --- LEITURAS EM CACHE ---
+    def get_all_products(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._ordered
+
+    def get_product(self, prod_id):
+        with self._lock:
+            self._ensure_loaded()
+            product = self._products.get(prod_id)
+        return product[1:] if product else None
+
+    def get_products_page(self, after_id=0, limit=100):
+        with self._lock:
+            self._ensure_loaded()
+            start = bisect_right(self._ids, after_id)
+            return self._ordered[start:start + limit]
+
+    def find_products(self, text, limit=20):
+        """Produtos cujo nome tem uma palavra começando por `text` ou contém `text`.
+
+        Os que casam pelo início de uma palavra vêm primeiro; o resto em ordem de id.
+        """
+        query = normalize(text).strip()
+        with self._lock:
+            self._ensure_loaded()
+            if not query:
+                return self._ordered[:limit]
+            found = []
+            seen = set()
+            start = bisect_left(self._words, (query,))
+            for word, prod_id in self._words[start:]:
+                if not word.startswith(query) or len(found) >= limit:
+                    break
+                if prod_id not in seen:
+                    seen.add(prod_id)
+                    found.append(prod_id)
+            if len(found) < limit and len(query) >= 3:
+                candidates = None
+                for gram in trigrams(query):
+                    ids = self._trigrams.get(gram, ())
+                    candidates = set(ids) if candidates is None else candidates & set(ids)
+                    if not candidates:
+                        break
+                for prod_id in sorted(candidates or ()):
+                    if len(found) >= limit:
+                        break
+                    if prod_id not in seen and query in self._names[prod_id]:
+                        seen.add(prod_id)
+                        found.append(prod_id)
+            return [self._products[prod_id] for prod_id in found]
+
+    def search_products(self, text, limit=10):
+        """Busca pelo índice FTS5 do banco; sem ele, pelo índice em memória."""
+        if self.db.has_full_text_search:
+            return self.db.search_products(text, limit)
+        return self.find_products(text, limit)
+
+    # --- ESCRITAS (INVALIDAM O CACHE) ---
+    def add_product(self, name, description, price_cents):
+        result = self.db.add_product(name, description, price_cents)
+        self.invalidate()
+        return result
+
+    def add_products_bulk(self, products, batch_size=1000):
+        result = self.db.add_products_bulk(products, batch_size)
+        self.invalidate()
+        return result
+
+    def update_product(self, prod_id, name, desc, price_cents):
+        result = self.db.update_product(prod_id, name, desc, price_cents)
+        self.invalidate()
+        return result
+
+    def reprice_products(self, basis_points, product_ids=None):
+        result = self.db.reprice_products(basis_points, product_ids)
+        self.invalidate()
+        return result
+
+    def delete_product(self, prod_id):
+        result = self.db.delete_product(prod_id)
+        self.invalidate()
+        return result
@@ -1,38 +1,353 @@
 # database.py
 import sqlite3
 import datetime
+import heapq
+import itertools
+import re
+import threading
+import aggregates
+from money import BASIS_POINTS, check_cents
+from instrumentation import Instrumentation, InstrumentedConnection
+import inventory
+import maintenance
+import passwords
+import sync
+from itertools import groupby, islice
+
+MAX_ROWID = 2**63 - 1
+
+# PRAGMAs aplicados a cada conexão aberta; DatabaseManager(pragmas=...) troca
+# qualquer um deles. Com WAL, leitores não bloqueiam o escritor e vice-versa, o
+# que permite vários terminais no mesmo arquivo.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms esperando um lock antes de "database is locked"
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -16000,          # negativo = KiB por conexão
+    'temp_store': 'MEMORY',
+}
+
+_memory_db_ids = itertools.count(1)
+
+# Colunas pelas quais search_orders pode ordenar (a chave da página é coluna + id).
+ORDER_SORT_COLUMNS = {'id': 'id', 'client_name': 'client_name COLLATE NOCASE', 'order_date': 'order_date',
+                      'status': 'status', 'total': 'total_cents'}
+
+ORDER_STATUSES = ['Pendente', 'Em Produção', 'Concluído', 'Entregue', 'Cancelado']
+
+INSERT_ORDER_ITEM_SQL = '''
+    INSERT INTO order_items (order_id, product_id, quantity, unit_price_cents)
+    VALUES (?, ?, ?, COALESCE(?, (SELECT price_cents FROM products WHERE id = ?)))
+'''
+
+# Cada migração leva o banco da versão anterior para a sua; a versão aplicada
+# fica em PRAGMA user_version. Bancos antigos (versão 0) já têm as tabelas da
+# versão 1, por isso ela usa IF NOT EXISTS.
+MIGRATIONS = [
+    (1, [
+        '''CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY, password TEXT NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+            description TEXT, price REAL NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, client_name TEXT NOT NULL,
+            order_date TEXT NOT NULL, status TEXT NOT NULL, total REAL NOT NULL)''',
+        '''CREATE TABLE IF NOT EXISTS order_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
+            product_id INTEGER, quantity INTEGER NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id))''',
+    ]),
+    (2, [
+        'CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)',
+        'CREATE INDEX IF NOT EXISTS idx_order_items_product_id ON order_items(product_id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_client_name ON orders(client_name)',
+    ]),
+    (3, [
+        # Contador de alterações do catálogo, usado para invalidar caches (até de outros processos).
+        'CREATE TABLE IF NOT EXISTS change_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        "INSERT OR IGNORE INTO change_counters (name, value) VALUES ('products', 0)",
+        *(f'''CREATE TRIGGER IF NOT EXISTS products_changed_{event.lower()} AFTER {event} ON products
+              BEGIN UPDATE change_counters SET value = value + 1 WHERE name = 'products'; END'''
+          for event in ('INSERT', 'UPDATE', 'DELETE')),
+    ]),
+    (4, [lambda conn: _create_products_fts(conn)]),
+    (5, [
+        # Preço unitário no momento da venda, para os totais por produto não mudarem com o catálogo.
+        'ALTER TABLE order_items ADD COLUMN unit_price REAL',
+        'UPDATE order_items SET unit_price = (SELECT price FROM products WHERE id = order_items.product_id)',
+        # Os totais de vendas (aggregates.py) eram criados aqui; desde a migração 8 são criados lá.
+    ]),
+    (6, [lambda conn: _hash_plain_passwords(conn)]),
+    (7, [
+        # Busca de encomendas: prefixo do cliente sem diferenciar maiúsculas e faixa/ordem por total.
+        'DROP INDEX IF EXISTS idx_orders_client_name',
+        'CREATE INDEX IF NOT EXISTS idx_orders_client_name_nocase ON orders(client_name COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_total ON orders(total)',
+    ]),
+    (8, [lambda conn: _money_to_cents(conn), *aggregates.SCHEMA, aggregates.refill]),
+    # Registro de alterações para a sincronização entre filiais (sync.py).
+    (9, [*sync.SCHEMA, sync.init_branch]),
+    (10, maintenance.SCHEMA),
+    # Estoque, fichas técnicas e reservas de material (inventory.py).
+    (11, inventory.SCHEMA),
+    # Encomendas reabertas de Concluído/Entregue também voltam a reservar material.
+    (12, ['DROP TRIGGER IF EXISTS inventory_order_reopened', inventory.REOPENED_TRIGGER]),
+    # A migração 7 apagou este índice, mas a busca exata por cliente (client_name = ?,
+    # collation BINARY) não usa o de NOCASE; os dois convivem.
+    (13, ['CREATE INDEX IF NOT EXISTS idx_orders_client_name ON orders(client_name)']),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _item_row(order_id, item):
+    """Parâmetros de INSERT_ORDER_ITEM_SQL; sem unit_price_cents no item, vale o preço do catálogo."""
+    price = item.get('unit_price_cents')
+    return order_id, item['id'], item['quantity'], None if price is None else check_cents(price), item['id']
+
+
+def batched(iterable, size):
+    """Divide `iterable` em listas de até `size` elementos, sem carregar tudo."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _create_products_fts(conn):
+    """Índice de texto completo (FTS5) sobre nome e descrição, mantido por triggers.
+
+    Se o SQLite não tiver FTS5 a migração passa sem ele e a busca cai no LIKE.
+    """
+    try:
+        conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                            name, description, content='products', content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2')''')
+    except sqlite3.OperationalError as e:
+        print(f"Aviso: busca de produtos sem FTS5 ({e}).")
+        return
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                        INSERT INTO products_fts (products_fts, rowid, name, description)
+                        VALUES ('delete', old.id, old.name, old.description);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+                        INSERT INTO products_fts (products_fts, rowid, name, description)
+                        VALUES ('delete', old.id, old.name, old.description);
+                        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+                    END''')
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+HAS_DROP_COLUMN = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _drop_column(conn, table, column):
+    """ALTER TABLE DROP COLUMN; no SQLite anterior ao 3.35, que não o tem, recria a tabela sem a coluna.
+
+    A recriação segue o roteiro da documentação do SQLite (tabela nova, cópia,
+    DROP, RENAME) dentro da transação da migração, refaz os índices e triggers
+    da tabela e mantém o contador do AUTOINCREMENT.
+    """
+    if HAS_DROP_COLUMN:
+        conn.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+        return
+    create = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,))]
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA table_info({table})') if row[1] != column)
+    definition = re.sub(rf',\s*{column}\s[^,)]*', '', create[create.index('('):], count=1)
+    conn.execute(f'CREATE TABLE {table}_new {definition}')
+    conn.execute(f'INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    for sql in dependents:
+        conn.execute(sql)
+    if sequence is not None:
+        conn.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
+        conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, sequence[0]))
+
+
+# Colunas REAL em reais que a migração 8 troca por INTEGER em centavos.
+MONEY_COLUMNS = [('products', 'price', 'price_cents INTEGER NOT NULL DEFAULT 0'),
+                 ('orders', 'total', 'total_cents INTEGER NOT NULL DEFAULT 0'),
+                 ('order_items', 'unit_price', 'unit_price_cents INTEGER')]
+
+
+def _money_to_cents(conn):
+    """Troca preços e totais REAL por inteiros de centavos, arredondando cada valor uma vez.
+
+    Triggers e índices que usam as colunas antigas saem antes de apagá-las;
+    os totais de vendas são recriados em seguida, já em centavos.
+    """
+    for trigger in aggregates.TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS sales_daily')
+    conn.execute('DROP TABLE IF EXISTS sales_product_daily')
+    conn.execute('DROP INDEX IF EXISTS idx_orders_total')
+    for table, old, new in MONEY_COLUMNS:
+        new_name = new.split()[0]
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {new}')
+        conn.execute(f'UPDATE {table} SET {new_name} = CAST(ROUND({old} * 100) AS INTEGER) WHERE {old} IS NOT NULL')
+        _drop_column(conn, table, old)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_orders_total_cents ON orders(total_cents)')
+
+
+def _hash_plain_passwords(conn):
+    # Senhas gravadas antes do hash passam a ser guardadas com scrypt.
+    users = conn.execute('SELECT username, password FROM users').fetchall()
+    conn.executemany('UPDATE users SET password = ? WHERE username = ?',
+                     [(passwords.hash_password(password), username)
+                      for username, password in users if not passwords.is_hashed(password)])
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn, target=SCHEMA_VERSION):
+    """Aplica, em ordem e cada uma na sua transação, as migrações acima da versão atual.
+
+    Um passo pode ser SQL ou uma função que recebe a conexão. Devolve a versão final.
+    Com o banco já na versão pedida, só lê o user_version (nenhum DDL nem transação).
+    """
+    version = get_schema_version(conn)
+    if version >= target:
+        return version
+    for migration_version, steps in MIGRATIONS:
+        if not version < migration_version <= target:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {migration_version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = migration_version
+    return version
+
 
 class DatabaseManager:
-    def __init__(self, db_name='marcenaria.db'):
-        """Conecta ao banco de dados ao ser instanciada."""
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_name='marcenaria.db', pragmas=None, max_idle_connections=4, instrumentation=None,
+                 archive_name=None, on_error=None):
+        """Conecta ao banco de dados ao ser instanciada.
+
+        Cada thread usa a sua própria conexão (e cursor), aberta na primeira
+        chamada feita por ela; conexões de threads que terminaram, ou liberadas
+        com release_connection(), voltam para um pool e são reaproveitadas.
+        `instrumentation` (padrão: a de MARCENARIA_PROFILE, se houver) mede
+        cada comando; veja instrumentation.py. `archive_name` é o banco das
+        encomendas arquivadas (padrão: marcenaria_arquivo.db ao lado do banco).
+        `on_error(método, exceção)` recebe os erros que os métodos tratam e
+        transformam em None/False/0; sem ele, eles são impressos.
+        """
+        self.db_name = db_name
+        self.archive_name = archive_name or (maintenance.archive_name_for(db_name) if db_name != ':memory:' else None)
+        self._uri = False
+        if db_name == ':memory:':
+            # Um banco em memória compartilhado entre as conexões desta instância.
+            self.db_name = f'file:marcenaria-mem-{next(_memory_db_ids)}?mode=memory&cache=shared'
+            self._uri = True
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.instrumentation = instrumentation or Instrumentation.from_environment()
+        self.max_idle_connections = max_idle_connections
+        self.on_error = on_error
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._in_use = {}  # thread -> conexão
+        self._idle = []
+        self._closed = False
+        self._has_fts = None
+        self.sessions = passwords.SessionCache()
+        self._planner = None  # inventory.ProductionPlanner, carregado na primeira consulta
+        self._planner_lock = threading.Lock()
+        # Mantém o banco em memória vivo enquanto a instância existir.
+        self._keepalive = self._connect() if self._uri else None
         self.create_tables()
 
+    @property
+    def conn(self):
+        """Conexão da thread atual."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._acquire_connection()
+        return conn
+
+    @property
+    def cursor(self):
+        """Cursor compartilhado pelos métodos, um por thread."""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self.conn.cursor()
+        return cursor
+
+    def _connect(self):
+        if self.instrumentation is None:
+            conn = sqlite3.connect(self.db_name, uri=self._uri, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_name, uri=self._uri, check_same_thread=False, factory=InstrumentedConnection)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        if self.instrumentation is not None:
+            # Só depois dos PRAGMAs: a configuração da conexão não entra nas estatísticas.
+            conn.instrumentation = self.instrumentation
+        return conn
+
+    def _acquire_connection(self):
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("DatabaseManager já foi fechado.")
+            for thread in [t for t in self._in_use if not t.is_alive()]:
+                self._recycle(self._in_use.pop(thread))
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            self._in_use[threading.current_thread()] = conn
+        self._local.conn = conn
+        self._local.cursor = None
+        return conn
+
+    def release_connection(self):
+        """Devolve ao pool a conexão da thread atual (ex.: fim de uma tarefa de um executor)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = self._local.cursor = None
+        with self._lock:
+            self._in_use.pop(threading.current_thread(), None)
+            if not self._closed:
+                self._recycle(conn)
+
+    def _recycle(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if len(self._idle) < self.max_idle_connections:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    def _report_error(self, method, error):
+        if self.on_error is not None:
+            self.on_error(method, error)
+        else:
+            print(f"DB Error on {method}: {error}")
+
     def create_tables(self):
-        """Cria as tabelas do sistema se elas não existirem."""
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY, password TEXT NOT NULL)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
-                description TEXT, price REAL NOT NULL)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, client_name TEXT NOT NULL,
-                order_date TEXT NOT NULL, status TEXT NOT NULL, total REAL NOT NULL)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                item_id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
-                product_id INTEGER, quantity INTEGER NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders(id),
-                FOREIGN KEY (product_id) REFERENCES products(id))
-        ''')
-        self.conn.commit()
+        """Cria as tabelas do sistema e aplica as migrações pendentes."""
+        run_migrations(self.conn)
 
     # --- MÉTODOS DE USUÁRIO ---
     def check_user_exists(self, username):
@@ -41,96 +356,637 @@ class DatabaseManager:
 
     def add_user(self, username, password):
         try:
-            self.cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
+            self.cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                                (username, passwords.hash_password(password)))
             self.conn.commit()
             return True
         except sqlite3.Error as e:
-            print(f"DB Error on add_user: {e}")
+            self._report_error('add_user', e)
             return False
 
     def verify_user(self, username, password):
-        self.cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, password))
-        return self.cursor.fetchone()
+        """Confere a senha e devolve um token de sessão, ou None se não confere.
+
+        Um novo login com a mesma senha enquanto a sessão anterior vale não
+        repete o scrypt; um hash com custo diferente do atual é refeito.
+        """
+        token = self.sessions.recall(username, password)
+        if token:
+            return token
+        self.cursor.execute('SELECT password FROM users WHERE username = ?', (username,))
+        row = self.cursor.fetchone()
+        if row is None or not passwords.verify_password(password, row[0]):
+            return None
+        if passwords.needs_rehash(row[0]):
+            try:
+                self.cursor.execute('UPDATE users SET password = ? WHERE username = ?',
+                                    (passwords.hash_password(password), username))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self._report_error('verify_user', e)
+        return self.sessions.remember(username, password)
+
+    def get_session_user(self, token):
+        """Usuário da sessão `token`, ou None se ela expirou ou não existe; renova a sessão."""
+        return self.sessions.user(token)
+
+    def end_session(self, token):
+        self.sessions.end(token)
 
     # --- MÉTODOS DE PRODUTO ---
-    def add_product(self, name, description, price):
+    def add_product(self, name, description, price_cents):
         try:
-            self.cursor.execute('INSERT INTO products (name, description, price) VALUES (?, ?, ?)', (name, description, float(price)))
+            self.cursor.execute('INSERT INTO products (name, description, price_cents) VALUES (?, ?, ?)',
+                                (name, description, check_cents(price_cents)))
             self.conn.commit()
             return True
         except (sqlite3.Error, ValueError) as e:
-            print(f"DB Error on add_product: {e}")
+            self._report_error('add_product', e)
             return False
 
+    def add_products_bulk(self, products, batch_size=1000):
+        """Insere produtos (name, description, price_cents) com executemany, uma transação por lote.
+
+        Devolve quantos produtos foram gravados; um lote com erro é desfeito e a
+        importação para nele.
+        """
+        count = 0
+        for batch in batched(products, batch_size):
+            try:
+                with self.conn:
+                    self.cursor.executemany('INSERT INTO products (name, description, price_cents) VALUES (?, ?, ?)',
+                                            [(name, description, check_cents(price_cents))
+                                             for name, description, price_cents in batch])
+            except (sqlite3.Error, ValueError) as e:
+                self._report_error('add_products_bulk', e)
+                break
+            count += len(batch)
+        return count
+
     def get_all_products(self):
-        self.cursor.execute('SELECT id, name, description, price FROM products')
+        self.cursor.execute('SELECT id, name, description, price_cents FROM products')
+        return self.cursor.fetchall()
+
+    def get_products_page(self, after_id=0, limit=100):
+        """Próxima página de produtos com id maior que `after_id` (paginação por chave)."""
+        self.cursor.execute('SELECT id, name, description, price_cents FROM products WHERE id > ? ORDER BY id LIMIT ?',
+                            (after_id, limit))
+        return self.cursor.fetchall()
+
+    def get_products_version(self):
+        """Número que muda a cada alteração na tabela products."""
+        self.cursor.execute("SELECT value FROM change_counters WHERE name = 'products'")
+        return self.cursor.fetchone()[0]
+
+    @property
+    def has_full_text_search(self):
+        if self._has_fts is None:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+            self._has_fts = self.cursor.fetchone() is not None
+        return self._has_fts
+
+    def search_products(self, text, limit=10):
+        """Até `limit` produtos com palavras no nome ou na descrição começando pelos termos de `text`.
+
+        Usa o índice FTS5 (nome pesa mais que descrição); sem ele, busca o trecho no nome com LIKE.
+        """
+        terms = re.findall(r'\w+', text)
+        if not terms:
+            return self.get_products_page(0, limit)
+        if self.has_full_text_search:
+            query = " ".join(f'"{term}"*' for term in terms)
+            self.cursor.execute('''
+                SELECT p.id, p.name, p.description, p.price_cents
+                FROM products_fts JOIN products p ON p.id = products_fts.rowid
+                WHERE products_fts MATCH ? ORDER BY bm25(products_fts, 10.0, 1.0) LIMIT ?
+            ''', (query, limit))
+        else:
+            # % e _ digitados são texto, não curingas do LIKE.
+            fragment = re.sub(r'([\\%_])', r'\\\1', text.strip())
+            self.cursor.execute(r"SELECT id, name, description, price_cents FROM products WHERE name LIKE ? ESCAPE '\' "
+                                'ORDER BY id LIMIT ?', (f"%{fragment}%", limit))
         return self.cursor.fetchall()
 
     def get_product(self, prod_id):
-        self.cursor.execute('SELECT name, description, price FROM products WHERE id = ?', (prod_id,))
+        self.cursor.execute('SELECT name, description, price_cents FROM products WHERE id = ?', (prod_id,))
         return self.cursor.fetchone()
 
-    def update_product(self, prod_id, name, desc, price):
+    def update_product(self, prod_id, name, desc, price_cents):
         try:
-            self.cursor.execute('UPDATE products SET name=?, description=?, price=? WHERE id=?', (name, desc, float(price), prod_id))
+            self.cursor.execute('UPDATE products SET name=?, description=?, price_cents=? WHERE id=?',
+                                (name, desc, check_cents(price_cents), prod_id))
             self.conn.commit()
             return True
         except (sqlite3.Error, ValueError) as e:
-            print(f"DB Error on update_product: {e}")
+            self._report_error('update_product', e)
             return False
 
+    def reprice_products(self, basis_points, product_ids=None):
+        """Reajusta preços em `basis_points` (500 = +5%, -1000 = -10%) num só UPDATE; devolve quantos mudaram.
+
+        A conta é feita em centavos pelo SQLite, arredondando meio para cima;
+        sem `product_ids`, vale para o catálogo inteiro. Reduções de 100% ou
+        mais (preço zero ou negativo) são recusadas.
+        """
+        sql = '''UPDATE products SET price_cents = (price_cents * (10000 + ?) + 5000) / 10000
+                 WHERE price_cents > 0'''
+        try:
+            if basis_points <= -BASIS_POINTS:
+                raise ValueError(f"reajuste de {basis_points} pontos-base zeraria os preços")
+            with self.conn:
+                if product_ids is None:
+                    self.cursor.execute(sql, (basis_points,))
+                else:
+                    self.cursor.executemany(sql + ' AND id = ?', [(basis_points, prod_id) for prod_id in product_ids])
+                return self.cursor.rowcount
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('reprice_products', e)
+            return 0
+
     def delete_product(self, prod_id):
         try:
             self.cursor.execute('DELETE FROM products WHERE id = ?', (prod_id,))
             self.conn.commit()
             return self.cursor.rowcount > 0
         except sqlite3.Error as e:
-            print(f"DB Error on delete_product: {e}")
+            self._report_error('delete_product', e)
             return False
 
     # --- MÉTODOS DE ENCOMENDA ---
     def create_order(self, client_name, order_total, items):
+        """Grava a encomenda com total em centavos.
+
+        Cada item pode trazer unit_price_cents, o preço com que o total foi
+        calculado, e é ele que fica gravado; sem ele, vale o preço atual do catálogo.
+        """
         try:
             current_date = datetime.date.today().isoformat()
-            self.cursor.execute('INSERT INTO orders (client_name, order_date, status, total) VALUES (?, ?, ?, ?)',
-                               (client_name, current_date, 'Pendente', order_total))
-            order_id = self.cursor.lastrowid
-            for item in items:
-                self.cursor.execute('INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)',
-                                   (order_id, item['id'], item['quantity']))
-            self.conn.commit()
+            with self.conn:
+                self.cursor.execute('INSERT INTO orders (client_name, order_date, status, total_cents) VALUES (?, ?, ?, ?)',
+                                   (client_name, current_date, 'Pendente', check_cents(order_total)))
+                order_id = self.cursor.lastrowid
+                self.cursor.executemany(INSERT_ORDER_ITEM_SQL, [_item_row(order_id, item) for item in items])
+                self._planner_changed(1, lambda planner: planner.add_order(order_id, items, 'Pendente', current_date,
+                                                                           client_name))
             return order_id
-        except sqlite3.Error as e:
-            print(f"DB Error on create_order: {e}")
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('create_order', e)
             return None
 
+    def create_orders(self, orders):
+        """Grava várias encomendas (dicts com client_name, total em centavos e items) numa só transação.
+
+        Devolve os ids na ordem recebida. Se a transação falhar, cada encomenda
+        é tentada sozinha com create_order, e as que falharem ficam com None.
+        """
+        current_date = datetime.date.today().isoformat()
+        try:
+            order_ids = []
+            with self.conn:
+                for order in orders:
+                    self.cursor.execute('INSERT INTO orders (client_name, order_date, status, total_cents) VALUES (?, ?, ?, ?)',
+                                        (order['client_name'], current_date, 'Pendente', check_cents(order['total'])))
+                    order_id = self.cursor.lastrowid
+                    self.cursor.executemany(INSERT_ORDER_ITEM_SQL, [_item_row(order_id, item) for item in order['items']])
+                    order_ids.append(order_id)
+                self._planner_changed(len(order_ids), lambda planner: [
+                    planner.add_order(order_id, order['items'], 'Pendente', current_date, order['client_name'])
+                    for order_id, order in zip(order_ids, orders)])
+            return order_ids
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('create_orders', e)
+            return [self.create_order(order['client_name'], order['total'], order['items']) for order in orders]
+
+    def create_orders_bulk(self, orders, batch_size=1000):
+        """Insere muitas encomendas com executemany, uma transação por lote.
+
+        Cada encomenda é um dict como os argumentos de create_order (client_name,
+        total em centavos, items) e pode trazer order_date e status. Os ids são reservados
+        dentro da transação, então pedidos e itens de um lote vão em dois
+        executemany. Devolve quantas encomendas foram gravadas; um lote com erro
+        é desfeito e a importação para nele.
+        """
+        today = datetime.date.today().isoformat()
+        count = 0
+        for batch in batched(orders, batch_size):
+            try:
+                self.cursor.execute('BEGIN IMMEDIATE')
+                next_id = self._next_order_id()
+                order_rows, item_rows = [], []
+                for order_id, order in enumerate(batch, start=next_id):
+                    order_rows.append((order_id, order['client_name'], order.get('order_date') or today,
+                                       order.get('status') or 'Pendente', check_cents(order['total'])))
+                    item_rows.extend(_item_row(order_id, item) for item in order['items'])
+                self.cursor.executemany('INSERT INTO orders (id, client_name, order_date, status, total_cents) VALUES (?, ?, ?, ?, ?)',
+                                        order_rows)
+                self.cursor.executemany(INSERT_ORDER_ITEM_SQL, item_rows)
+                self.conn.commit()
+            except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+                self.conn.rollback()
+                self._report_error('create_orders_bulk', e)
+                break
+            count += len(batch)
+        return count
+
+    def _next_order_id(self):
+        # Respeita o AUTOINCREMENT: nunca reaproveita ids de encomendas removidas.
+        self.cursor.execute('''
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0),
+                       COALESCE((SELECT MAX(id) FROM orders), 0)) + 1
+        ''')
+        return self.cursor.fetchone()[0]
+
     def get_order_status(self, order_id):
         self.cursor.execute('SELECT status FROM orders WHERE id = ?', (order_id,))
         result = self.cursor.fetchone()
         return result[0] if result else None
 
     def update_order_status(self, order_id, new_status):
-        self.cursor.execute('UPDATE orders SET status = ? WHERE id = ?', (new_status, order_id))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        with self.conn:
+            self.cursor.execute('UPDATE orders SET status = ? WHERE id = ?', (new_status, order_id))
+            changed = self.cursor.rowcount
+            self._planner_changed(changed, lambda planner: planner.set_status(order_id, new_status, self.conn))
+        return changed > 0
+
+    def update_orders_status(self, order_ids, new_status):
+        """Troca o status de várias encomendas numa transação; devolve quantas mudaram."""
+        try:
+            with self.conn:
+                self.cursor.executemany('UPDATE orders SET status = ? WHERE id = ? AND status IS NOT ?',
+                                        [(new_status, order_id, new_status) for order_id in order_ids])
+                changed = self.cursor.rowcount
+                self._planner_changed(changed, lambda planner: all(
+                    [planner.set_status(order_id, new_status, self.conn) for order_id in order_ids]))
+                return changed
+        except sqlite3.Error as e:
+            self._report_error('update_orders_status', e)
+            return 0
+
+    def search_orders(self, client_prefix=None, statuses=None, date_from=None, date_to=None,
+                      total_min=None, total_max=None, sort='id', descending=True, after=None, limit=100):
+        """Encomendas que passam nos filtros, ordenadas por `sort`, em páginas de `limit`.
+
+        Devolve (id, client_name, order_date, status, total_cents); os filtros de
+        total também são em centavos. A próxima página
+        vem passando `after=(valor de sort, id)` da última linha, sem OFFSET.
+        O nome do cliente é comparado pelo prefixo, sem diferenciar maiúsculas
+        (faixa no índice idx_orders_client_name_nocase).
+        """
+        column = ORDER_SORT_COLUMNS[sort]
+        conditions, params = [], []
+        if client_prefix:
+            conditions.append('client_name >= ? COLLATE NOCASE')
+            params.append(client_prefix)
+            conditions.append('client_name < ? COLLATE NOCASE')
+            params.append(client_prefix + '\U0010ffff')
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        for condition, value in (('order_date >= ?', date_from), ('order_date <= ?', date_to),
+                                 ('total_cents >= ?', total_min), ('total_cents <= ?', total_max)):
+            if value is not None and value != '':
+                conditions.append(condition)
+                params.append(value)
+        direction, compare = ('DESC', '<') if descending else ('ASC', '>')
+        if after is not None:
+            if sort == 'id':
+                conditions.append(f'id {compare} ?')
+                params.append(after[1])
+            else:
+                conditions.append(f'({column}, id) {compare} (?, ?)')
+                params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order_by = f'id {direction}' if sort == 'id' else f'{column} {direction}, id {direction}'
+        self.cursor.execute(f'SELECT id, client_name, order_date, status, total_cents FROM orders {where} '
+                            f'ORDER BY {order_by} LIMIT ?', (*params, limit))
+        return self.cursor.fetchall()
+
+    def iter_full_report(self, fetch_size=500):
+        """Gera as encomendas (mais recentes primeiro) com seus itens, uma por vez.
+
+        Uma única consulta com JOIN traz encomendas e itens já ordenados; as
+        linhas são agrupadas por encomenda à medida que saem do cursor, então a
+        memória usada não cresce com o histórico.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT o.id, o.client_name, o.order_date, o.status, o.total_cents, p.name, oi.quantity
+            FROM orders o
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            LEFT JOIN products p ON oi.product_id = p.id
+            ORDER BY o.id DESC, oi.item_id
+        ''')
+        try:
+            yield from self._group_report_rows(cursor, fetch_size)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _group_report_rows(cursor, fetch_size):
+        rows = iter(lambda: cursor.fetchmany(fetch_size), [])
+        flat_rows = (row for chunk in rows for row in chunk)
+        for order, group in groupby(flat_rows, key=lambda row: row[:5]):
+            # Itens de produtos removidos não aparecem, como no JOIN original.
+            items = [(name, quantity) for *_, name, quantity in group if name is not None]
+            yield {'order': order, 'items': items}
+
+    def get_report_page(self, before_id=None, limit=50, include_archive=False):
+        """Até `limit` encomendas com id menor que `before_id`, já com seus itens.
+
+        Com `include_archive`, junta as do banco de arquivo (se existir) na mesma ordem.
+        """
+        if before_id is None:
+            before_id = MAX_ROWID
+        page = self._report_page('''
+            WITH page AS (
+                SELECT id, client_name, order_date, status, total_cents FROM orders
+                WHERE id < ? ORDER BY id DESC LIMIT ?)
+            SELECT page.id, page.client_name, page.order_date, page.status, page.total_cents, p.name, oi.quantity
+            FROM page
+            LEFT JOIN order_items oi ON oi.order_id = page.id
+            LEFT JOIN products p ON oi.product_id = p.id
+            ORDER BY page.id DESC, oi.item_id
+        ''', before_id, limit)
+        if include_archive and self._attach_archive():
+            archived = self._report_page('''
+                WITH page AS (
+                    SELECT id, client_name, order_date, status, total_cents FROM archive.orders
+                    WHERE id < ? ORDER BY id DESC LIMIT ?)
+                SELECT page.id, page.client_name, page.order_date, page.status, page.total_cents,
+                       oi.product_name, oi.quantity
+                FROM page LEFT JOIN archive.order_items oi ON oi.order_id = page.id
+                ORDER BY page.id DESC, oi.item_id
+            ''', before_id, limit)
+            page = heapq.nlargest(limit, page + archived, key=lambda entry: entry['order'][0])
+        return page
+
+    def _report_page(self, sql, before_id, limit):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, (before_id, limit))
+        try:
+            return list(self._group_report_rows(cursor, limit))
+        finally:
+            cursor.close()
 
     def get_full_report(self):
-        self.cursor.execute('SELECT id, client_name, order_date, status, total FROM orders ORDER BY id DESC')
-        orders = self.cursor.fetchall()
-        report_data = []
-        for order in orders:
-            order_id = order[0]
-            self.cursor.execute('''
-                SELECT p.name, oi.quantity
-                FROM order_items oi
-                JOIN products p ON oi.product_id = p.id
-                WHERE oi.order_id = ?
-            ''', (order_id,))
-            items = self.cursor.fetchall()
-            report_data.append({'order': order, 'items': items})
-        return report_data
-    
+        return list(self.iter_full_report())
+
+    def iter_report_rows(self, date_from=None, date_to=None, statuses=None, fetch_size=1000, include_archive=False):
+        """Gera blocos de até `fetch_size` linhas planas (uma por item) para exportação.
+
+        Cada linha é (id, client_name, order_date, status, total_cents, product_id,
+        product_name, quantity, unit_price_cents), em ordem de data, encomenda e item;
+        encomendas sem itens saem numa linha com os campos do item vazios.
+        Período (datas AAAA-MM-DD, inclusivas) e status são filtrados no SQL.
+        A leitura segue o índice de datas, então o SQLite não precisa ordenar
+        o resultado numa tabela temporária. Com `include_archive`, as linhas
+        do banco de arquivo (se existir) são intercaladas por data à medida
+        que saem dos dois cursores.
+        """
+        conditions, params = [], []
+        if date_from:
+            conditions.append('o.order_date >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('o.order_date <= ?')
+            params.append(date_to)
+        if statuses:
+            # O '+' impede o uso de idx_orders_status, que obrigaria a ordenar tudo depois.
+            conditions.append(f"+o.status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        queries = [f'''
+            SELECT o.id, o.client_name, o.order_date, o.status, o.total_cents,
+                   oi.product_id, p.name, oi.quantity, oi.unit_price_cents
+            FROM orders o
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            LEFT JOIN products p ON oi.product_id = p.id
+            {where}
+            ORDER BY o.order_date, o.id, oi.item_id
+        ''']
+        if include_archive and self._attach_archive():
+            queries.append(f'''
+                SELECT o.id, o.client_name, o.order_date, o.status, o.total_cents,
+                       oi.product_id, oi.product_name, oi.quantity, oi.unit_price_cents
+                FROM archive.orders o
+                LEFT JOIN archive.order_items oi ON oi.order_id = o.id
+                {where}
+                ORDER BY o.order_date, o.id, oi.item_id
+            ''')
+        cursors = [self.conn.cursor() for _ in queries]
+        try:
+            for cursor, sql in zip(cursors, queries):
+                cursor.execute(sql, params)
+            if len(cursors) == 1:
+                yield from iter(lambda: cursors[0].fetchmany(fetch_size), [])
+            else:
+                rows = heapq.merge(*(self._iter_rows(cursor, fetch_size) for cursor in cursors),
+                                   key=lambda row: (row[2], row[0]))
+                yield from batched(rows, fetch_size)
+        finally:
+            for cursor in cursors:
+                cursor.close()
+
+    @staticmethod
+    def _iter_rows(cursor, fetch_size):
+        for chunk in iter(lambda: cursor.fetchmany(fetch_size), []):
+            yield from chunk
+
+    def _attach_archive(self):
+        """Anexa o banco de arquivo à conexão da thread, se ele existir."""
+        return bool(self.archive_name) and maintenance.attach_archive(self.conn, self.archive_name)
+
+    # --- TOTAIS DE VENDAS ---
+    def get_dashboard_metrics(self, days=30, months=12, top=10):
+        return aggregates.dashboard_metrics(self.conn, days, months, top)
+
+    def rebuild_sales_aggregates(self):
+        try:
+            self._attach_archive()  # as encomendas arquivadas continuam nos totais
+            aggregates.rebuild(self.conn)
+            return True
+        except sqlite3.Error as e:
+            self._report_error('rebuild_sales_aggregates', e)
+            return False
+
+    # --- ESTOQUE E PRODUÇÃO ---
+    def add_material(self, name, unit='un', on_hand=0):
+        """Cadastra um material (saldo inteiro na sua unidade); devolve o id ou None."""
+        try:
+            with self.conn:
+                self.cursor.execute('INSERT INTO materials (name, unit, on_hand) VALUES (?, ?, ?)',
+                                    (name, unit, int(on_hand)))
+            return self.cursor.lastrowid
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('add_material', e)
+            return None
+
+    def get_materials(self):
+        """(id, nome, unidade, saldo, reservado) de cada material, por nome."""
+        self.cursor.execute('''
+            SELECT m.id, m.name, m.unit, m.on_hand, COALESCE(SUM(r.quantity), 0)
+            FROM materials m LEFT JOIN stock_reservations r ON r.material_id = m.id
+            GROUP BY m.id ORDER BY m.name
+        ''')
+        return self.cursor.fetchall()
+
+    def adjust_material_stock(self, material_id, delta):
+        """Soma `delta` (negativo para baixas) ao saldo do material."""
+        try:
+            with self.conn:
+                self.cursor.execute('UPDATE materials SET on_hand = on_hand + ? WHERE id = ?', (int(delta), material_id))
+            return self.cursor.rowcount > 0
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('adjust_material_stock', e)
+            return False
+
+    def get_product_materials(self, product_id):
+        """Ficha técnica do produto: ((material_id, nome, unidade, quantidade), ...), minutos de oficina."""
+        self.cursor.execute('''
+            SELECT m.id, m.name, m.unit, pm.quantity FROM product_materials pm
+            JOIN materials m ON m.id = pm.material_id WHERE pm.product_id = ? ORDER BY m.name
+        ''', (product_id,))
+        materials = self.cursor.fetchall()
+        self.cursor.execute('SELECT minutes FROM production_times WHERE product_id = ?', (product_id,))
+        row = self.cursor.fetchone()
+        return materials, row[0] if row else 0
+
+    def set_product_material(self, product_id, material_id, quantity):
+        """Quanto do material vai numa unidade do produto; 0 tira o material da ficha.
+
+        Vale para as encomendas novas; as reservas já feitas só mudam com rebuild_stock_reservations.
+        """
+        try:
+            with self.conn:
+                if int(quantity) > 0:
+                    self.cursor.execute('''INSERT INTO product_materials (product_id, material_id, quantity)
+                                           VALUES (?, ?, ?)
+                                           ON CONFLICT (product_id, material_id) DO UPDATE SET quantity = excluded.quantity''',
+                                        (product_id, material_id, int(quantity)))
+                else:
+                    self.cursor.execute('DELETE FROM product_materials WHERE product_id = ? AND material_id = ?',
+                                        (product_id, material_id))
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('set_product_material', e)
+            return False
+
+    def set_production_minutes(self, product_id, minutes):
+        """Minutos de oficina para fazer uma unidade do produto."""
+        try:
+            with self.conn:
+                self.cursor.execute('INSERT OR REPLACE INTO production_times (product_id, minutes) VALUES (?, ?)',
+                                    (product_id, int(minutes)))
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            self._report_error('set_production_minutes', e)
+            return False
+
+    def rebuild_stock_reservations(self):
+        try:
+            return inventory.rebuild_reservations(self.conn)
+        except sqlite3.Error as e:
+            self._report_error('rebuild_stock_reservations', e)
+            return None
+
+    def get_production_plan(self, limit=50):
+        """Faltas de material e as primeiras `limit` encomendas da fila da oficina (veja inventory.py)."""
+        with self._planner_lock:
+            planner = self._current_planner()
+            return {'shortfalls': planner.shortfalls(), 'queue': planner.queue(limit), 'open_orders': len(planner),
+                    'workshop_minutes': planner.total_minutes, 'daily_minutes': planner.daily_minutes,
+                    'materials': dict(planner.materials)}
+
+    def get_order_plan(self, order_id):
+        """Posição na fila, previsão de término e faltas da encomenda, ou None se ela não está aberta."""
+        with self._planner_lock:
+            return self._current_planner().plan(order_id)
+
+    def preview_order(self, items):
+        """Previsão e faltas de uma encomenda ainda não gravada, no formato de create_order."""
+        with self._planner_lock:
+            return self._current_planner().preview(items)
+
+    def _current_planner(self):
+        # Chamada com _planner_lock. Relê tudo se outra conexão mexeu nas encomendas ou nas fichas;
+        # os saldos são poucos e são relidos sempre (as baixas não passam pelo contador).
+        if self._planner is None or self._planner.version != inventory.version(self.conn):
+            self._planner = inventory.ProductionPlanner.load(self.conn)
+        else:
+            self._planner.set_stock(self.conn.execute('SELECT id, name, unit, on_hand FROM materials'))
+        return self._planner
+
+    def _planner_changed(self, changes, apply):
+        """Leva ao plano em memória uma alteração da transação atual, que moveu o contador `changes` vezes.
+
+        Se ele andou mais que isso, outra conexão também gravou: o plano é
+        descartado e relido na próxima consulta.
+        """
+        with self._planner_lock:
+            planner = self._planner
+            if planner is None:
+                return
+            current = inventory.version(self.conn)
+            if current == planner.version + changes and apply(planner) is not False:
+                planner.version = current
+            else:
+                self._planner = None
+
+    # --- MANUTENÇÃO ---
+    def archive_old_orders(self, months=maintenance.ARCHIVE_MONTHS):
+        """Move para o banco de arquivo as encomendas encerradas há mais de `months` meses; devolve quantas."""
+        try:
+            return maintenance.archive_orders(self.conn, self.archive_name, months)
+        except sqlite3.Error as e:
+            self._report_error('archive_old_orders', e)
+            return None
+
+    # --- SINCRONIZAÇÃO ENTRE FILIAIS ---
+    def get_branch_id(self):
+        return sync.branch_id(self.conn)
+
+    def sync_with(self, other_db_name):
+        """Troca as alterações novas com o banco de outra filial (veja sync.py).
+
+        Devolve o resumo de sync.sync_pair, ou None se a sincronização falhar.
+        """
+        other = DatabaseManager(other_db_name, max_idle_connections=1)
+        try:
+            return sync.sync_pair(self.conn, other.conn)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self._report_error('sync_with', e)
+            return None
+        finally:
+            other.close()
+
+    # --- DIAGNÓSTICO ---
+    def get_diagnostics(self):
+        """Contagens, latências e consultas lentas, ou None sem instrumentação."""
+        return self.instrumentation.snapshot() if self.instrumentation else None
+
+    def reset_diagnostics(self):
+        if self.instrumentation:
+            self.instrumentation.reset()
+
+    def dump_diagnostics(self, path):
+        if not self.instrumentation:
+            return False
+        try:
+            self.instrumentation.dump(path)
+            return True
+        except OSError as e:
+            print(f"Erro ao gravar diagnóstico: {e}")
+            return False
+
     def close(self):
-        """Fecha a conexão com o banco de dados."""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        """Fecha as conexões com o banco de dados."""
+        with self._lock:
+            self._closed = True
+            connections = list(self._in_use.values()) + self._idle
+            self._in_use.clear()
+            self._idle.clear()
+        if self._keepalive is not None:
+            connections.append(self._keepalive)
+        for conn in connections:
+            conn.close()
+        self._local.conn = self._local.cursor = None
\ No newline at end of file
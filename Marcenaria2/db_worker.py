@@ -0,0 +1,108 @@
+# db_worker.py
+import queue
+import threading
+from catalog import ProductCatalog
+from database import DatabaseManager
+
+
+class DbRequest:
+    """Uma chamada pendente no DatabaseWorker. `cancel()` descarta o resultado."""
+
+    def __init__(self, method, args, kwargs, on_done, on_error):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DatabaseWorker:
+    """Executa as chamadas ao banco numa thread dedicada.
+
+    A thread abre sua própria conexão (um DatabaseManager só dela, atrás do
+    cache ProductCatalog) e atende os pedidos da fila em ordem. Os resultados voltam por outra fila, esvaziada no
+    mainloop do Tk com `after()`, então `on_done`/`on_error` sempre rodam na
+    thread da interface. `method` é o nome de um método do catálogo/DatabaseManager ou
+    uma função chamada como `method(db, *args)`.
+    """
+
+    POLL_MS = 20
+
+    def __init__(self, root, db_name='marcenaria.db'):
+        self.root = root
+        self.db_name = db_name
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, method, *args, on_done=None, on_error=None, **kwargs):
+        request = DbRequest(method, args, kwargs, on_done, on_error)
+        self._pending += 1
+        self._requests.put(request)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+        return request
+
+    def _run(self):
+        try:
+            db = ProductCatalog(DatabaseManager(self.db_name))
+        except Exception as e:
+            db, init_error = None, e
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            if request.cancelled:
+                self._results.put((request, None, None))
+                continue
+            try:
+                if db is None:
+                    raise init_error
+                if isinstance(request.method, str):
+                    result = getattr(db, request.method)(*request.args, **request.kwargs)
+                else:
+                    result = request.method(db, *request.args, **request.kwargs)
+                self._results.put((request, result, None))
+            except Exception as e:
+                self._results.put((request, None, e))
+        if db is not None:
+            db.close()
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                request, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if request.cancelled:
+                continue
+            if error is not None:
+                if request.on_error:
+                    request.on_error(error)
+                else:
+                    print(f"DB Error on {request.method}: {error}")
+            elif request.on_done:
+                request.on_done(result)
+        if self._pending and self._poll_id is None:
+            self._poll_id = self.root.after(self.POLL_MS, self._poll)
+
+    def close(self):
+        """Termina a thread depois dos pedidos já enfileirados."""
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._requests.put(None)
+        self._thread.join(timeout=5)
@@ -0,0 +1,171 @@
+# export.py
+"""Exportação do relatório de encomendas para arquivos.
+
+Formatos:
+  csv       uma linha por item, com os dados da encomenda repetidos;
+  jsonl     uma encomenda por linha, com a lista de itens;
+  colunar   JSON Lines em grupos de linhas, cada coluna guardada junta:
+            textos repetidos (cliente, status, produto) viram um dicionário
+            mais índices e ids viram diferenças em relação ao anterior.
+            `iter_columnar` lê o arquivo de volta linha a linha.
+
+Valores em dinheiro saem como no banco, em centavos inteiros (total_cents,
+unit_price_cents), sem arredondamento de float em nenhum formato.
+
+As linhas saem do cursor em blocos (DatabaseManager.iter_report_rows) e são
+gravadas bloco a bloco, então o arquivo pode ter anos de encomendas sem que
+elas fiquem todas na memória. Caminhos terminados em .gz são gravados com gzip.
+
+    python export.py relatorio.csv
+    python export.py vendas_2024.jsonl.gz --de 2024-01-01 --ate 2024-12-31 --status Entregue
+"""
+import argparse
+import csv
+import gzip
+import json
+import time
+from itertools import groupby
+
+COLUMNS = ['order_id', 'client_name', 'order_date', 'status', 'total_cents',
+           'product_id', 'product_name', 'quantity', 'unit_price_cents']
+ORDER_COLUMNS = COLUMNS[:5]
+ITEM_COLUMNS = COLUMNS[5:]
+DICTIONARY_COLUMNS = {'client_name', 'order_date', 'status', 'product_name'}
+DELTA_COLUMNS = {'order_id'}
+FORMATS = ['csv', 'jsonl', 'colunar']
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.col': 'colunar', '.coljson': 'colunar'}
+COLUMNAR_FORMAT = 'marcenaria-colunar'
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    for extension, fmt in EXTENSIONS.items():
+        if name.endswith(extension):
+            return fmt
+    return 'csv'
+
+
+def open_output(path, compress=None):
+    """Abre `path` para escrita de texto, com gzip se pedido ou se terminar em .gz."""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def write_csv(chunks, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def write_jsonl(chunks, f):
+    count = 0
+    rows = (row for chunk in chunks for row in chunk)
+    for order, group in groupby(rows, key=lambda row: row[:5]):
+        entry = dict(zip(ORDER_COLUMNS, order))
+        entry['items'] = [dict(zip(ITEM_COLUMNS, row[5:])) for row in group if row[5] is not None]
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def encode_column(name, values):
+    if name in DICTIONARY_COLUMNS:
+        dictionary, codes, positions = [], [], {}
+        for value in values:
+            code = positions.get(value)
+            if code is None:
+                code = positions[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return {'dict': dictionary, 'codes': codes}
+    if name in DELTA_COLUMNS:
+        deltas, previous = [], 0
+        for value in values:
+            deltas.append(value - previous)
+            previous = value
+        return {'delta': deltas}
+    return {'values': list(values)}
+
+
+def decode_column(column):
+    if 'dict' in column:
+        dictionary = column['dict']
+        return [dictionary[code] for code in column['codes']]
+    if 'delta' in column:
+        values, current = [], 0
+        for delta in column['delta']:
+            current += delta
+            values.append(current)
+        return values
+    return column['values']
+
+
+def write_columnar(chunks, f):
+    """Um cabeçalho e depois um grupo de linhas (já em colunas) por bloco do cursor."""
+    f.write(json.dumps({'format': COLUMNAR_FORMAT, 'version': 1, 'columns': COLUMNS}) + '\n')
+    count = 0
+    for rows in chunks:
+        columns = {name: encode_column(name, values) for name, values in zip(COLUMNS, zip(*rows))}
+        f.write(json.dumps({'rows': len(rows), 'columns': columns}, ensure_ascii=False, separators=(',', ':')) + '\n')
+        count += len(rows)
+    return count
+
+
+def iter_columnar(path):
+    """Lê um arquivo colunar (com ou sem .gz) e gera as linhas como tuplas."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != COLUMNAR_FORMAT:
+            raise ValueError(f"{path} não é um arquivo {COLUMNAR_FORMAT}")
+        names = header['columns']
+        for line in f:
+            group = json.loads(line)
+            yield from zip(*(decode_column(group['columns'][name]) for name in names))
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'colunar': write_columnar}
+
+
+def export_report(db, path, fmt=None, date_from=None, date_to=None, statuses=None, include_archive=False,
+                  compress=None, chunk_size=1000):
+    """Grava o relatório filtrado em `path` e devolve quantas linhas (csv/colunar) ou encomendas (jsonl) saíram."""
+    fmt = fmt or guess_format(path)
+    chunks = db.iter_report_rows(date_from, date_to, statuses, fetch_size=chunk_size, include_archive=include_archive)
+    with open_output(path, compress) as f:
+        return WRITERS[fmt](chunks, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o relatório de encomendas.")
+    parser.add_argument('path', help="arquivo de saída (.csv, .jsonl, .col; + .gz para compactar)")
+    parser.add_argument('--formato', choices=FORMATS, help="padrão: pela extensão do arquivo")
+    parser.add_argument('--de', dest='date_from', help="data inicial, AAAA-MM-DD")
+    parser.add_argument('--ate', dest='date_to', help="data final, AAAA-MM-DD")
+    parser.add_argument('--status', action='append', help="pode repetir; padrão: todos")
+    parser.add_argument('--arquivo', action='store_true', help="inclui as encomendas arquivadas")
+    parser.add_argument('--gzip', action='store_true', default=None, help="compacta mesmo sem .gz no nome")
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--lote', type=int, default=1000, help="linhas lidas e gravadas por vez")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager(args.db)
+    try:
+        start = time.perf_counter()
+        count = export_report(db, args.path, args.formato, args.date_from, args.date_to,
+                              args.status, args.arquivo, args.gzip, args.lote)
+        print(f"{count} registros exportados para {args.path} em {time.perf_counter() - start:.1f} s.")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# formatting.py
+"""Formatação em texto das listas de produtos, do relatório de encomendas, do painel, do estoque e do diagnóstico."""
+from money import format_money
+
+PRODUCT_HEADER = f"{'ID':<5}{'Nome':<30}{'Descrição':<40}{'Preço (R$)':>10}\n" + "-"*85
+
+
+def format_product_line(product):
+    prod_id, name, description, price_cents = product
+    return f"{prod_id:<5}{name:<30}{description if description else '':<40}{format_money(price_cents):>10}\n"
+
+
+def format_report_entry(data):
+    """Texto de uma encomenda do relatório ({'order': ..., 'items': [...]})."""
+    order, items = data['order'], data['items']
+    order_id, client, date, status, total_cents = order
+    lines = [f"--- Encomenda ID: {order_id} | Cliente: {client} | Data: {date} ---\n",
+             f"    Status: {status}\n    Total: R$ {format_money(total_cents)}\n    Itens:\n"]
+    if not items:
+        lines.append("        (Nenhum item encontrado)\n")
+    else:
+        lines.extend(f"        - {item[0]}: {item[1]} unidade(s)\n" for item in items)
+    lines.append("-"*60 + "\n\n")
+    return "".join(lines)
+
+
+def _bar(value, largest, width=30):
+    return "█" * round(width * value / largest) if largest > 0 else ""
+
+
+def format_dashboard(metrics):
+    """Texto do painel a partir de DatabaseManager.get_dashboard_metrics()."""
+    lines = ["Faturamento por dia (últimos 30 dias)\n"]
+    largest = max((revenue for _, _, revenue in metrics['by_day']), default=0)
+    lines.extend(f"  {day}  {orders:>4} enc.  R$ {format_money(revenue):>12}  {_bar(revenue, largest)}\n"
+                 for day, orders, revenue in metrics['by_day'])
+    lines.append("\nFaturamento por mês\n")
+    largest = max((revenue for _, _, revenue in metrics['by_month']), default=0)
+    lines.extend(f"  {month}     {orders:>4} enc.  R$ {format_money(revenue):>12}  {_bar(revenue, largest)}\n"
+                 for month, orders, revenue in metrics['by_month'])
+    lines.append("\nEncomendas por status\n")
+    lines.extend(f"  {status:<15}{orders:>6}   R$ {format_money(revenue):>12}\n" for status, orders, revenue in metrics['by_status'])
+    lines.append("\nProdutos mais vendidos (últimos 30 dias)\n")
+    lines.extend(f"  {prod_id:<5}{name:<30}{quantity:>6} un.  R$ {format_money(revenue):>12}\n"
+                 for prod_id, name, quantity, revenue in metrics['top_products'])
+    return "".join(lines)
+
+
+def format_materials(materials):
+    """Tabela de materiais a partir de DatabaseManager.get_materials()."""
+    lines = [f"{'ID':<5}{'Material':<30}{'Un.':<6}{'Saldo':>10}{'Reservado':>11}{'Livre':>10}\n", "-" * 72 + "\n"]
+    lines.extend(f"{material_id:<5}{name[:29]:<30}{unit:<6}{on_hand:>10}{reserved:>11}{on_hand - reserved:>10}\n"
+                 for material_id, name, unit, on_hand, reserved in materials)
+    if not materials:
+        lines.append("Nenhum material cadastrado.\n")
+    return "".join(lines)
+
+
+def _missing_text(missing, materials):
+    return ", ".join(f"{quantity} {materials[material_id][1]} de {materials[material_id][0]}"
+                     for material_id, quantity in missing.items())
+
+
+def format_production_plan(plan):
+    """Faltas de material e fila da oficina a partir de DatabaseManager.get_production_plan()."""
+    materials = plan['materials']
+    days = plan['workshop_minutes'] / plan['daily_minutes']
+    lines = [f"{plan['open_orders']} encomendas abertas; {plan['workshop_minutes'] // 60} h de oficina "
+             f"(~{days:.1f} dias úteis)\n\nFaltas de material\n"]
+    lines.extend(f"  {name[:29]:<30}saldo {on_hand:>8} {unit:<4} precisa {needed:>8}   falta {missing:>8}\n"
+                 for _, name, unit, on_hand, needed, missing in plan['shortfalls'])
+    if not plan['shortfalls']:
+        lines.append("  Nenhuma: o estoque cobre todas as encomendas abertas.\n")
+    lines.append(f"\nFila da oficina (primeiras {len(plan['queue'])})\n")
+    for entry in plan['queue']:
+        lines.append(f"  {entry['position']:>4}. #{entry['order_id']:<7}{entry['client_name'][:24]:<25}"
+                     f"{entry['status']:<13}{entry['minutes']:>6} min  até {entry['finish_date'].isoformat()}\n")
+        if entry['missing']:
+            lines.append(f"          falta: {_missing_text(entry['missing'], materials)}\n")
+    return "".join(lines)
+
+
+def format_diagnostics(diagnostics):
+    """Texto da tela de diagnóstico a partir de DatabaseManager.get_diagnostics()."""
+    if diagnostics is None:
+        return ("Instrumentação desligada.\n\n"
+                "Abra o app com MARCENARIA_PROFILE=1 (e, opcionalmente, MARCENARIA_SLOW_MS=100)\n"
+                "para medir as consultas ao banco.\n")
+    lines = [f"Desde {diagnostics['since']}; lentas: acima de {diagnostics['slow_ms']:.0f} ms\n\n",
+             f"{'Método':<36}{'Chamadas':>9}{'Erros':>7}{'Média':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'Máx':>9}\n",
+             "-" * 97 + "\n"]
+    methods = sorted(diagnostics['methods'].items(), key=lambda item: item[1]['mean_ms'] * item[1]['calls'], reverse=True)
+    lines.extend(f"{name[:35]:<36}{s['calls']:>9}{s['errors']:>7}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+                 f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}\n" for name, s in methods)
+    lines.append(f"\nConsultas lentas ({len(diagnostics['slow_queries'])})\n")
+    for entry in reversed(diagnostics['slow_queries']):
+        lines.append(f"\n{entry['time']}  {entry['method']}  {entry['ms']:.1f} ms\n  {entry['sql']}\n")
+        lines.extend(f"    {step}\n" for step in entry['plan'])
+    return "".join(lines)
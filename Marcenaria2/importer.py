@@ -0,0 +1,97 @@
+# importer.py
+"""Importação em lote de produtos e encomendas a partir de arquivos.
+
+Encomendas podem vir em JSON Lines (um objeto por linha, com client_name,
+items [{"id", "quantity"}] e, opcionais, total, order_date e status) ou em CSV
+com uma linha por item e as colunas order_ref, client_name, product_id,
+quantity e, opcionais, order_date, status e total; linhas seguidas com o mesmo
+order_ref formam uma encomenda. Produtos vêm em CSV com name, description e
+price. Preços e totais vêm em reais ("12.50" ou "12,50") e são gravados em
+centavos. Os arquivos são lidos em fluxo e gravados em lotes, sem carregar tudo na
+memória.
+
+    python importer.py encomendas pedidos_loja.jsonl
+    python importer.py produtos catalogo.csv --db marcenaria.db
+"""
+import argparse
+import csv
+import json
+import time
+from itertools import groupby
+from database import DatabaseManager
+from money import to_cents
+
+
+def iter_products_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield row['name'], row.get('description') or '', to_cents(row['price'])
+
+
+def iter_orders_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_orders_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for _, rows in groupby(csv.DictReader(f), key=lambda row: row['order_ref']):
+            rows = list(rows)
+            first = rows[0]
+            order = {'client_name': first['client_name'],
+                     'order_date': first.get('order_date') or None,
+                     'status': first.get('status') or None,
+                     'items': [{'id': int(row['product_id']), 'quantity': int(row['quantity'])} for row in rows]}
+            if first.get('total'):
+                order['total'] = first['total']
+            yield order
+
+
+def with_totals(orders, prices):
+    """Passa o total das encomendas para centavos e completa o dos que não o trazem, pelos preços atuais.
+
+    Quando o total é calculado aqui, os itens levam os preços usados nele (unit_price_cents).
+    """
+    for order in orders:
+        if order.get('total') is None:
+            for item in order['items']:
+                item['unit_price_cents'] = prices[item['id']]
+            order['total'] = sum(item['unit_price_cents'] * item['quantity'] for item in order['items'])
+        else:
+            order['total'] = to_cents(order['total'])
+        yield order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa produtos ou encomendas em lote.")
+    parser.add_argument('kind', choices=['produtos', 'encomendas'])
+    parser.add_argument('path', help="arquivo .csv ou .jsonl")
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--lote', type=int, default=1000, help="registros por transação")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    start = time.perf_counter()
+    try:
+        if args.kind == 'produtos':
+            count = db.add_products_bulk(iter_products_csv(args.path), args.lote)
+        else:
+            orders = iter_orders_csv(args.path) if args.path.endswith('.csv') else iter_orders_jsonl(args.path)
+            prices = {p[0]: p[3] for p in db.get_all_products()}
+            count = db.create_orders_bulk(with_totals(orders, prices), args.lote)
+    except KeyError as e:
+        print(f"Erro: produto ou coluna {e} não encontrado; lotes anteriores já foram gravados.")
+        return
+    except ValueError as e:
+        print(f"Erro: {e}; lotes anteriores já foram gravados.")
+        return
+    finally:
+        db.close()
+    imported = "importados" if args.kind == 'produtos' else "importadas"
+    print(f"{count} {args.kind} {imported} em {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == '__main__':
+    main()
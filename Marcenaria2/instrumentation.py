@@ -0,0 +1,225 @@
+# instrumentation.py
+"""Medição das consultas do DatabaseManager: contagens, latências e consultas lentas.
+
+Desligada por padrão. Com MARCENARIA_PROFILE=1 no ambiente (ou
+DatabaseManager(instrumentation=Instrumentation())), as conexões passam a ser
+InstrumentedConnection: cada execute/executemany conta para o método do
+DatabaseManager que o chamou, com histograma de latência (p50/p95/p99).
+Consultas acima de MARCENARIA_SLOW_MS (padrão 100 ms) vão para o log
+"marcenaria.db" com o seu EXPLAIN QUERY PLAN. Desligada, as conexões são
+sqlite3.Connection comuns e nada disso roda.
+
+Os números aparecem na tela de diagnóstico do app (Ctrl+Shift+D) e podem ser
+gravados em JSON com `dump`; com MARCENARIA_PROFILE_FILE o arquivo é gravado
+ao sair do processo.
+"""
+import atexit
+import collections
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+logger = logging.getLogger('marcenaria.db')
+
+BUCKETS_PER_OCTAVE = 4  # cada balde do histograma cobre um fator de 2**(1/4) (~19%)
+SLOW_QUERIES_KEPT = 50
+
+
+def _bucket(seconds):
+    micros = max(seconds * 1e6, 1.0)
+    return int(math.log2(micros) * BUCKETS_PER_OCTAVE)
+
+
+def _bucket_upper_ms(bucket):
+    return 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1000
+
+
+class MethodStats:
+    __slots__ = ('calls', 'errors', 'total', 'max', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = collections.Counter()
+
+    def percentile_ms(self, fraction):
+        """Limite superior do balde onde cai o percentil (erro de até ~19%)."""
+        wanted = self.calls * fraction
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= wanted:
+                return _bucket_upper_ms(bucket)
+        return 0.0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'errors': self.errors,
+                'mean_ms': self.total / self.calls * 1000 if self.calls else 0.0,
+                'max_ms': self.max * 1000, 'p50_ms': self.percentile_ms(0.50),
+                'p95_ms': self.percentile_ms(0.95), 'p99_ms': self.percentile_ms(0.99)}
+
+
+class Instrumentation:
+    """Estatísticas por método, compartilhadas pelas conexões de um DatabaseManager."""
+
+    def __init__(self, slow_ms=100.0):
+        self.slow_ms = slow_ms
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._methods = collections.defaultdict(MethodStats)
+        self._slow = collections.deque(maxlen=SLOW_QUERIES_KEPT)
+
+    @classmethod
+    def from_environment(cls):
+        """Instrumentation ligada por MARCENARIA_PROFILE, ou None."""
+        if os.environ.get('MARCENARIA_PROFILE', '') in ('', '0'):
+            return None
+        instrumentation = cls(float(os.environ.get('MARCENARIA_SLOW_MS', 100)))
+        path = os.environ.get('MARCENARIA_PROFILE_FILE')
+        if path:
+            atexit.register(instrumentation.dump, path)
+        return instrumentation
+
+    def record(self, conn, method, sql, params, elapsed, error=None):
+        with self._lock:
+            stats = self._methods[method]
+            stats.calls += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.histogram[_bucket(elapsed)] += 1
+            if error is not None:
+                stats.errors += 1
+        if error is not None:
+            logger.error("DB Error on %s: %s | %s", method, error, ' '.join(sql.split()))
+        elif elapsed * 1000 >= self.slow_ms:
+            self._log_slow(conn, method, sql, params, elapsed)
+
+    def _log_slow(self, conn, method, sql, params, elapsed):
+        try:
+            plan = [row[3] for row in sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', params)]
+        except (sqlite3.Error, ValueError) as e:
+            plan = [f"(sem plano: {e})"]
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'method': method, 'ms': elapsed * 1000,
+                 'sql': ' '.join(sql.split()), 'plan': plan}
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning("Consulta lenta em %s (%.1f ms): %s\n    %s", method, entry['ms'], entry['sql'],
+                       '\n    '.join(plan))
+
+    def snapshot(self):
+        with self._lock:
+            methods = {name: stats.as_dict() for name, stats in self._methods.items()}
+            slow = list(self._slow)
+        return {'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'slow_ms': self.slow_ms, 'methods': methods, 'slow_queries': slow}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._slow.clear()
+            self.started = time.time()
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+def _is_manager(obj):
+    return any(cls.__name__ == 'DatabaseManager' for cls in type(obj).__mro__)
+
+
+def _caller(depth):
+    """Método do DatabaseManager que originou o comando.
+
+    Sobe a pilha a partir de `depth` até o primeiro método público do
+    DatabaseManager, pulando os auxiliares (_report_page, funções de
+    aggregates.py, inventory.py...). Sem um na pilha, fica o primeiro método
+    privado dele e, por fim, o chamador imediato.
+    """
+    frame = sys._getframe(depth)
+    caller = frame.f_code.co_name
+    private = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_argcount and code.co_varnames[0] == 'self' and _is_manager(frame.f_locals.get('self')):
+            if not code.co_name.startswith('_'):
+                return code.co_name
+            private = private or code.co_name
+        frame = frame.f_back
+    return private or caller
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Mede execute/executemany e, à parte ("método [leitura]"), as leituras fetch*."""
+
+    _method = _sql = None
+    _plan_parameters = ()
+
+    def execute(self, sql, parameters=(), _method=None):
+        if self.connection.instrumentation is None:
+            return super().execute(sql, parameters)
+        return self._timed(super().execute, sql, parameters, parameters, _method or _caller(2))
+
+    def executemany(self, sql, seq_of_parameters, _method=None):
+        if self.connection.instrumentation is None:
+            return super().executemany(sql, seq_of_parameters)
+        seq_of_parameters = list(seq_of_parameters)
+        first = seq_of_parameters[0] if seq_of_parameters else ()
+        return self._timed(super().executemany, sql, seq_of_parameters, first, _method or _caller(2))
+
+    def _timed(self, run, sql, parameters, plan_parameters, method):
+        self._method, self._sql, self._plan_parameters = method, sql, plan_parameters
+        start = time.perf_counter()
+        try:
+            result = run(sql, parameters)
+        except sqlite3.Error as e:
+            self.connection.instrumentation.record(self.connection, method, sql, plan_parameters,
+                                                   time.perf_counter() - start, e)
+            raise
+        self.connection.instrumentation.record(self.connection, method, sql, plan_parameters,
+                                               time.perf_counter() - start)
+        return result
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def _fetch(self, run, *args):
+        if self._method is None:
+            return run(*args)
+        start = time.perf_counter()
+        result = run(*args)
+        self.connection.instrumentation.record(self.connection, f"{self._method} [leitura]", self._sql,
+                                               self._plan_parameters, time.perf_counter() - start)
+        return result
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores medem cada comando; use com sqlite3.connect(factory=...)."""
+
+    instrumentation = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if self.instrumentation is None:
+            return self.cursor().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters, _method=_caller(2))
+
+    def executemany(self, sql, seq_of_parameters):
+        if self.instrumentation is None:
+            return self.cursor().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters, _method=_caller(2))
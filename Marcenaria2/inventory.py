@@ -0,0 +1,375 @@
+# inventory.py
+"""Estoque de materiais, ficha técnica dos produtos e fila da oficina.
+
+materials guarda o saldo físico de cada material (on_hand), numa unidade
+inteira à escolha (un, cm, g...), como o dinheiro em centavos. A ficha técnica
+(product_materials) diz quanto de cada material vai numa unidade do produto e
+production_times quantos minutos de oficina ela leva.
+
+Triggers reservam o material quando os itens de uma encomenda desta filial
+são gravados (create_order, create_orders, importação) em stock_reservations.
+Quando a encomenda sai de Pendente/Em Produção a reserva some: em Cancelado
+o material volta a ficar livre; em Concluído/Entregue ele é baixado do saldo.
+Uma encomenda reaberta (de volta a Pendente/Em Produção) reserva de novo.
+Encomendas vindas de outra filial (sync.py) não reservam nada aqui: cada
+filial tem o seu estoque.
+
+ProductionPlanner monta, em memória, a fila da oficina (Em Produção primeiro,
+depois Pendente por data) com o vetor de materiais de cada produto já
+calculado. Para cada posição da fila ele guarda o consumo acumulado até ali,
+então uma encomenda nova no fim da fila custa O(materiais dela) e as faltas
+de uma encomenda saem do acumulado e do saldo sem percorrer as anteriores. O
+contador 'inventory' em change_counters avisa quando outra conexão mudou as
+encomendas ou as fichas e o plano precisa ser relido.
+
+    python inventory.py plano --limite 30
+    python inventory.py reservar    # refaz as reservas com as fichas atuais
+"""
+import argparse
+import datetime
+from array import array
+from bisect import bisect_left
+
+OPEN_STATUSES = ('Pendente', 'Em Produção')
+IN_PRODUCTION = 'Em Produção'
+CANCELLED = 'Cancelado'
+WORKSHOP_MINUTES_PER_DAY = 8 * 60
+WORKDAYS = (0, 1, 2, 3, 4)  # segunda a sexta
+
+_OPEN = ', '.join(f"'{status}'" for status in OPEN_STATUSES)
+# Só encomendas criadas nesta filial (as de outras filiais ficam mapeadas em sync_ids).
+_LOCAL_ORDER = "NOT EXISTS (SELECT 1 FROM sync_ids WHERE table_name = 'orders' AND local_id = {0})"
+_BUMP = "UPDATE change_counters SET value = value + 1 WHERE name = 'inventory';"
+
+# Reaberta de qualquer status fechado: refazer uma peça já entregue também gasta material.
+REOPENED_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS inventory_order_reopened AFTER UPDATE OF status ON orders
+    WHEN old.status NOT IN ({_OPEN}) AND new.status IN ({_OPEN}) AND {_LOCAL_ORDER.format('new.id')} BEGIN
+        INSERT INTO stock_reservations (order_id, material_id, quantity)
+        SELECT new.id, pm.material_id, SUM(pm.quantity * oi.quantity)
+        FROM order_items oi JOIN product_materials pm ON pm.product_id = oi.product_id
+        WHERE oi.order_id = new.id GROUP BY pm.material_id;
+    END'''
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS materials (
+           id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE,
+           unit TEXT NOT NULL DEFAULT 'un', on_hand INTEGER NOT NULL DEFAULT 0)''',
+    '''CREATE TABLE IF NOT EXISTS product_materials (
+           product_id INTEGER NOT NULL, material_id INTEGER NOT NULL, quantity INTEGER NOT NULL,
+           PRIMARY KEY (product_id, material_id)) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_product_materials_material ON product_materials(material_id)',
+    'CREATE TABLE IF NOT EXISTS production_times (product_id INTEGER PRIMARY KEY, minutes INTEGER NOT NULL)',
+    '''CREATE TABLE IF NOT EXISTS stock_reservations (
+           order_id INTEGER NOT NULL, material_id INTEGER NOT NULL, quantity INTEGER NOT NULL,
+           PRIMARY KEY (order_id, material_id)) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_stock_reservations_material ON stock_reservations(material_id)',
+    "INSERT OR IGNORE INTO change_counters (name, value) VALUES ('inventory', 0)",
+    f'''CREATE TRIGGER IF NOT EXISTS inventory_item_reserve AFTER INSERT ON order_items
+        WHEN (SELECT status FROM orders WHERE id = new.order_id) IN ({_OPEN})
+             AND {_LOCAL_ORDER.format('new.order_id')} BEGIN
+            INSERT INTO stock_reservations (order_id, material_id, quantity)
+            SELECT new.order_id, material_id, quantity * new.quantity FROM product_materials
+            WHERE product_id = new.product_id
+            ON CONFLICT (order_id, material_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS inventory_order_closed AFTER UPDATE OF status ON orders
+        WHEN old.status IN ({_OPEN}) AND new.status NOT IN ({_OPEN}) BEGIN
+            UPDATE materials SET on_hand = on_hand - (SELECT quantity FROM stock_reservations
+                                                      WHERE order_id = new.id AND material_id = materials.id)
+            WHERE new.status IS NOT '{CANCELLED}'
+              AND id IN (SELECT material_id FROM stock_reservations WHERE order_id = new.id);
+            DELETE FROM stock_reservations WHERE order_id = new.id;
+        END''',
+    REOPENED_TRIGGER,
+    '''CREATE TRIGGER IF NOT EXISTS inventory_product_deleted AFTER DELETE ON products BEGIN
+           DELETE FROM product_materials WHERE product_id = old.id;
+           DELETE FROM production_times WHERE product_id = old.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS inventory_material_deleted AFTER DELETE ON materials BEGIN
+           DELETE FROM product_materials WHERE material_id = old.id;
+           DELETE FROM stock_reservations WHERE material_id = old.id;
+       END''',
+    # O contador conta uma vez por linha: quem grava sabe quanto ele deve andar (veja DatabaseManager).
+    f'CREATE TRIGGER IF NOT EXISTS inventory_changed_order_insert AFTER INSERT ON orders BEGIN {_BUMP} END',
+    f'CREATE TRIGGER IF NOT EXISTS inventory_changed_order_status AFTER UPDATE OF status ON orders BEGIN {_BUMP} END',
+    f'CREATE TRIGGER IF NOT EXISTS inventory_changed_order_delete AFTER DELETE ON orders BEGIN {_BUMP} END',
+    *(f'''CREATE TRIGGER IF NOT EXISTS inventory_changed_{table}_{event.lower()} AFTER {event} ON {table}
+          BEGIN {_BUMP} END'''
+      for table in ('product_materials', 'production_times') for event in ('INSERT', 'UPDATE', 'DELETE')),
+]
+
+
+def version(conn):
+    """Valor atual do contador de alterações do estoque."""
+    return conn.execute("SELECT value FROM change_counters WHERE name = 'inventory'").fetchone()[0]
+
+
+def rebuild_reservations(conn):
+    """Refaz as reservas das encomendas abertas desta filial com as fichas atuais; devolve quantas linhas."""
+    with conn:
+        conn.execute('DELETE FROM stock_reservations')
+        return conn.execute(f'''
+            INSERT INTO stock_reservations (order_id, material_id, quantity)
+            SELECT o.id, pm.material_id, SUM(pm.quantity * oi.quantity)
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            JOIN product_materials pm ON pm.product_id = oi.product_id
+            WHERE o.status IN ({_OPEN}) AND {_LOCAL_ORDER.format('o.id')}
+            GROUP BY o.id, pm.material_id''').rowcount
+
+
+def add_workdays(start, days):
+    """Data `days` dias úteis (WORKDAYS) depois de `start`; 0 devolve `start`."""
+    # Toda semana cheia tem len(WORKDAYS) dias úteis; o resto (1 a len(WORKDAYS)) é contado dia a dia.
+    weeks = max(days - 1, 0) // len(WORKDAYS)
+    date = start + datetime.timedelta(weeks=weeks)
+    days -= weeks * len(WORKDAYS)
+    while days > 0:
+        date += datetime.timedelta(days=1)
+        if date.weekday() in WORKDAYS:
+            days -= 1
+    return date
+
+
+class _OpenOrder:
+    __slots__ = ('key', 'client_name', 'status', 'order_date', 'items', 'demand', 'minutes')
+
+
+class ProductionPlanner:
+    """Fila da oficina e faltas de material das encomendas abertas, calculadas de forma incremental.
+
+    Os materiais ocupam posições fixas em vetores densos (array de inteiros);
+    a ficha de cada produto vira um vetor esparso de (posição, quantidade) e
+    a demanda de cada encomenda também. A fila é uma lista ordenada de chaves
+    (prioridade, data, id); `_cumulative[i]` é o consumo somado das encomendas
+    até a posição i, calculado sob demanda e refeito só a partir da primeira
+    posição alterada.
+    """
+
+    def __init__(self, daily_minutes=WORKSHOP_MINUTES_PER_DAY):
+        self.daily_minutes = daily_minutes
+        self.version = None
+        self.material_ids = []       # posição -> id do material
+        self.positions = {}          # id do material -> posição
+        self.materials = {}          # id -> (nome, unidade)
+        self.on_hand = array('q')
+        self.demand = array('q')     # consumo de todas as encomendas abertas
+        self.vectors = {}            # id do produto -> ((posição, quantidade por unidade), ...)
+        self.product_minutes = {}
+        self.total_minutes = 0
+        self._orders = {}
+        self._keys = []
+        self._cumulative = []        # array por posição da fila; None = ainda não calculado
+        self._cumulative_minutes = []
+        self._valid = 0
+
+    @classmethod
+    def load(cls, conn, daily_minutes=WORKSHOP_MINUTES_PER_DAY):
+        """Lê materiais, fichas e encomendas abertas desta filial numa só transação de leitura."""
+        planner = cls(daily_minutes)
+        conn.execute('BEGIN')
+        try:
+            planner.version = version(conn)
+            planner.set_stock(conn.execute('SELECT id, name, unit, on_hand FROM materials ORDER BY id'))
+            boms = {}
+            for product_id, material_id, quantity in conn.execute(
+                    'SELECT product_id, material_id, quantity FROM product_materials'):
+                boms.setdefault(product_id, {})[material_id] = quantity
+            for product_id, materials in boms.items():
+                planner.vectors[product_id] = planner._vector(materials)
+            planner.product_minutes = dict(conn.execute('SELECT product_id, minutes FROM production_times'))
+            items = {}
+            for order_id, product_id, quantity in conn.execute(f'''
+                    SELECT oi.order_id, oi.product_id, oi.quantity FROM orders o
+                    JOIN order_items oi ON oi.order_id = o.id
+                    WHERE o.status IN ({_OPEN}) AND {_LOCAL_ORDER.format('o.id')}'''):
+                items.setdefault(order_id, []).append((product_id, quantity))
+            orders = conn.execute(f'''SELECT id, client_name, order_date, status FROM orders o
+                                      WHERE status IN ({_OPEN}) AND {_LOCAL_ORDER.format('o.id')}''').fetchall()
+        finally:
+            conn.commit()
+        for order_id, client_name, order_date, status in orders:
+            planner._insert(order_id, client_name, order_date, status, items.get(order_id, ()))
+        return planner
+
+    def _vector(self, materials):
+        return tuple((self.positions[material_id], quantity)
+                     for material_id, quantity in materials.items() if material_id in self.positions)
+
+    def set_stock(self, rows):
+        """Atualiza saldos a partir de linhas (id, nome, unidade, on_hand); materiais novos ganham posição."""
+        for material_id, name, unit, on_hand in rows:
+            self.materials[material_id] = (name, unit)
+            position = self.positions.get(material_id)
+            if position is None:
+                self.positions[material_id] = len(self.material_ids)
+                self.material_ids.append(material_id)
+                self.on_hand.append(on_hand)
+                self.demand.append(0)
+                self._valid = 0  # os acumulados ficaram curtos
+            else:
+                self.on_hand[position] = on_hand
+
+    # --- FILA ---
+    def add_order(self, order_id, items, status='Pendente', order_date=None, client_name=''):
+        """Inclui uma encomenda aberta; `items` no formato de create_order ([{'id', 'quantity'}])."""
+        self._insert(order_id, client_name, order_date or datetime.date.today().isoformat(), status,
+                     [(item['id'], item['quantity']) for item in items])
+
+    def set_status(self, order_id, status, conn=None):
+        """Aplica uma troca de status; devolve False se a encomenda precisaria ser lida do banco.
+
+        Uma encomenda reaberta não está no plano: com `conn`, ela e seus itens
+        são lidos dali (na transação de quem gravou).
+        """
+        order = self._orders.get(order_id)
+        if order is None:
+            if status not in OPEN_STATUSES:
+                return True
+            if conn is None:
+                return False
+            row = conn.execute(f"SELECT client_name, order_date FROM orders o WHERE id = ? AND {_LOCAL_ORDER.format('o.id')}",
+                               (order_id,)).fetchone()
+            if row is not None:
+                items = conn.execute('SELECT product_id, quantity FROM order_items WHERE order_id = ?', (order_id,))
+                self._insert(order_id, row[0], row[1], status, items.fetchall())
+            return True
+        if status not in OPEN_STATUSES:
+            self._remove(order_id)
+        elif status != order.status:
+            self._remove(order_id)
+            self._insert(order_id, order.client_name, order.order_date, status, order.items)
+        return True
+
+    def _insert(self, order_id, client_name, order_date, status, items):
+        order = _OpenOrder()
+        order.key = (0 if status == IN_PRODUCTION else 1, order_date, order_id)
+        order.client_name, order.status, order.order_date, order.items = client_name, status, order_date, tuple(items)
+        order.demand, order.minutes = self._order_demand(order.items)
+        for position, quantity in order.demand:
+            self.demand[position] += quantity
+        self.total_minutes += order.minutes
+        index = bisect_left(self._keys, order.key)
+        self._keys.insert(index, order.key)
+        self._cumulative.insert(index, None)
+        self._cumulative_minutes.insert(index, 0)
+        self._valid = min(self._valid, index)
+        self._orders[order_id] = order
+
+    def _remove(self, order_id):
+        order = self._orders.pop(order_id)
+        for position, quantity in order.demand:
+            self.demand[position] -= quantity
+        self.total_minutes -= order.minutes
+        index = bisect_left(self._keys, order.key)
+        del self._keys[index], self._cumulative[index], self._cumulative_minutes[index]
+        self._valid = min(self._valid, index)
+
+    def _order_demand(self, items):
+        totals = {}
+        minutes = 0
+        for product_id, quantity in items:
+            for position, per_unit in self.vectors.get(product_id, ()):
+                totals[position] = totals.get(position, 0) + per_unit * quantity
+            minutes += self.product_minutes.get(product_id, 0) * quantity
+        return tuple(totals.items()), minutes
+
+    def _ensure(self, count):
+        """Calcula os acumulados das primeiras `count` posições da fila."""
+        if self._valid >= count:
+            return
+        empty = array('q', bytes(8 * len(self.material_ids)))
+        previous = self._cumulative[self._valid - 1] if self._valid else empty
+        minutes = self._cumulative_minutes[self._valid - 1] if self._valid else 0
+        for index in range(self._valid, count):
+            order = self._orders[self._keys[index][2]]
+            current = array('q', previous)
+            for position, quantity in order.demand:
+                current[position] += quantity
+            minutes += order.minutes
+            self._cumulative[index], self._cumulative_minutes[index] = current, minutes
+            previous = current
+        self._valid = count
+
+    # --- CONSULTAS ---
+    def __len__(self):
+        return len(self._keys)
+
+    def _missing(self, demand, cumulative):
+        # O que falta para esta encomenda depois de atender todas as que estão antes dela.
+        missing = {}
+        for position, quantity in demand:
+            short = min(quantity, cumulative[position] - self.on_hand[position])
+            if short > 0:
+                missing[self.material_ids[position]] = short
+        return missing
+
+    def _entry(self, index, today):
+        order = self._orders[self._keys[index][2]]
+        finished = self._cumulative_minutes[index]
+        return {'order_id': self._keys[index][2], 'client_name': order.client_name, 'status': order.status,
+                'order_date': order.order_date, 'position': index + 1, 'minutes': order.minutes,
+                'finish_date': add_workdays(today, -(-finished // self.daily_minutes)),
+                'missing': self._missing(order.demand, self._cumulative[index])}
+
+    def plan(self, order_id, today=None):
+        """Posição na fila, previsão de término e faltas da encomenda (ou None se ela não está aberta)."""
+        order = self._orders.get(order_id)
+        if order is None:
+            return None
+        index = bisect_left(self._keys, order.key)
+        self._ensure(index + 1)
+        return self._entry(index, today or datetime.date.today())
+
+    def queue(self, limit=None, today=None):
+        """As primeiras `limit` encomendas da fila (todas, sem limite), como em `plan`."""
+        count = len(self._keys) if limit is None else min(limit, len(self._keys))
+        self._ensure(count)
+        today = today or datetime.date.today()
+        return [self._entry(index, today) for index in range(count)]
+
+    def preview(self, items, today=None):
+        """Previsão e faltas de uma encomenda nova com `items`, que entraria no fim da fila."""
+        demand, minutes = self._order_demand([(item['id'], item['quantity']) for item in items])
+        cumulative = array('q', self.demand)
+        for position, quantity in demand:
+            cumulative[position] += quantity
+        finished = self.total_minutes + minutes
+        return {'minutes': minutes,
+                'finish_date': add_workdays(today or datetime.date.today(), -(-finished // self.daily_minutes)),
+                'missing': self._missing(demand, cumulative)}
+
+    def shortfalls(self):
+        """Materiais cujo consumo das encomendas abertas passa do saldo: (id, nome, unidade, saldo, consumo, falta)."""
+        result = []
+        for position, material_id in enumerate(self.material_ids):
+            needed = self.demand[position]
+            if needed > self.on_hand[position]:
+                name, unit = self.materials[material_id]
+                result.append((material_id, name, unit, self.on_hand[position], needed,
+                               needed - self.on_hand[position]))
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estoque de materiais e fila da oficina.")
+    parser.add_argument('command', choices=['plano', 'reservar'])
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--limite', type=int, default=20, help="encomendas da fila mostradas")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    from formatting import format_production_plan
+    db = DatabaseManager(args.db)
+    try:
+        if args.command == 'reservar':
+            print(f"{rebuild_reservations(db.conn)} reservas gravadas.")
+        else:
+            print(format_production_plan(db.get_production_plan(args.limite)), end='')
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,46 @@
 # main.py
-from app import MarcenariaApp
+"""Abre a Marcenaria Pica Pau.
+
+    python main.py
+    python main.py --profile-startup   # mede cada etapa da abertura e fecha
+
+O app é importado só depois de ler os argumentos; no modo de perfil cada etapa
+(imports, janela, tela de login, imagem de fundo, banco de dados) é cronometrada
+a partir do início do processo. A manutenção em segundo plano (backup e
+estatísticas) não roda nesse modo, para não pesar nas medidas.
+"""
+import argparse
+import sys
+import time
+
+STARTUP_STEPS = ("imagem de fundo", "banco de dados") # Last steps; the profile ends when both are done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Marcenaria Pica Pau")
+    parser.add_argument('--profile-startup', action='store_true', help="mostra o tempo de cada etapa da abertura e fecha")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings = []
+    def mark(step):
+        timings.append((step, time.perf_counter() - start))
+        if args.profile_startup and all(any(name == last for name, _ in timings) for last in STARTUP_STEPS):
+            app.after_idle(finish)
+    def finish():
+        previous = 0.0
+        for step, elapsed in timings:
+            print(f"{step:<22}{elapsed * 1000:>9.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)", file=sys.stderr)
+            previous = elapsed
+        app.on_closing()
+
+    import customtkinter # noqa: F401 (imported here only to time it apart from the app)
+    mark("import customtkinter")
+    from app import MarcenariaApp
+    mark("import app")
+    app = MarcenariaApp(on_startup_step=mark if args.profile_startup else None)
+    app.mainloop()
+
 
 if __name__ == "__main__":
-    app = MarcenariaApp()
-    app.mainloop()
\ No newline at end of file
+    main()
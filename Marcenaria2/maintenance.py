@@ -0,0 +1,296 @@
+# maintenance.py
+"""Manutenção do banco: cópias de segurança, estatísticas, compactação e arquivo de encomendas antigas.
+
+backup      copia o banco em uso com sqlite3.Connection.backup, algumas
+            páginas por vez, para backups/ ao lado do banco (guarda as 7
+            mais novas), e também o banco de arquivo, se existir. Em WAL a
+            cópia só lê, então o app segue gravando.
+estatisticas PRAGMA optimize (ANALYZE só onde as estatísticas envelheceram).
+vacuum      VACUUM quando mais de 10% das páginas estão livres; trava as
+            gravações enquanto roda, por isso não é feito pelo app.
+arquivar    move encomendas Entregue/Cancelado com mais de N meses (padrão
+            12) para o banco de arquivo (marcenaria_arquivo.db), anexado
+            como "archive". Os relatórios podem incluí-lo e os totais do
+            painel continuam contando essas encomendas.
+
+Cada tarefa tem um intervalo (TASK_INTERVALS) e a última execução fica em
+maintenance_runs; `run_due` roda só as vencidas. O app roda backup e
+estatísticas numa thread própria ao abrir; as demais ficam para o agendador do
+sistema (cron, Agendador de Tarefas), fora do horário de uso:
+
+    python maintenance.py rotina
+    python maintenance.py backup --destino /mnt/pendrive
+    python maintenance.py arquivar --meses 18
+    python maintenance.py vacuum --forcar
+    python maintenance.py estatisticas
+"""
+import argparse
+import calendar
+import datetime
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+ARCHIVED_STATUSES = ('Entregue', 'Cancelado')
+ARCHIVE_MONTHS = 12
+BACKUP_KEEP = 7
+BACKUP_PAGES = 256          # páginas copiadas por passo; entre passos o banco fica livre
+BACKUP_MAX_RESTARTS = 5     # gravações durante a cópia a fazem recomeçar; depois disso, um passo só
+STALE_PARTIAL = 60 * 60     # uma cópia ".parcial" parada há mais que isso foi interrompida (app fechado no meio)
+VACUUM_MIN_FREE = 0.10
+DAY = 24 * 60 * 60
+TASK_INTERVALS = {'backup': DAY, 'optimize': DAY, 'archive': 30 * DAY, 'vacuum': 7 * DAY}
+IN_APP_TASKS = ('backup', 'optimize')
+CLI_TASKS = {'backup': 'backup', 'estatisticas': 'optimize', 'arquivar': 'archive', 'vacuum': 'vacuum'}
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS maintenance_runs (
+           task TEXT PRIMARY KEY, last_run TEXT NOT NULL, seconds REAL NOT NULL, result TEXT)''',
+]
+
+# O arquivo guarda o nome do produto junto do item: o produto pode sair do catálogo depois.
+ARCHIVE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS archive.orders (
+           id INTEGER PRIMARY KEY, client_name TEXT NOT NULL, order_date TEXT NOT NULL,
+           status TEXT NOT NULL, total_cents INTEGER NOT NULL, archived_at TEXT NOT NULL)''',
+    '''CREATE TABLE IF NOT EXISTS archive.order_items (
+           item_id INTEGER PRIMARY KEY, order_id INTEGER NOT NULL, product_id INTEGER,
+           product_name TEXT, quantity INTEGER NOT NULL, unit_price_cents INTEGER)''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_archive_items_order_id ON order_items(order_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_archive_orders_date ON orders(order_date)',
+]
+
+
+def archive_name_for(db_name):
+    """Banco de arquivo de `db_name`: marcenaria.db -> marcenaria_arquivo.db, na mesma pasta."""
+    stem, extension = os.path.splitext(db_name)
+    return f"{stem}_arquivo{extension or '.db'}"
+
+
+def attach_archive(conn, path, create=False):
+    """Anexa o banco de arquivo como "archive" à conexão; devolve False se ele não existe.
+
+    Com `create`, cria o arquivo e as tabelas se preciso. Precisa ser chamada
+    fora de transação.
+    """
+    if conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'").fetchone():
+        return True
+    if not create and not os.path.exists(path):
+        return False
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    if create:
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+    elif not conn.execute("SELECT 1 FROM archive.sqlite_master WHERE name = 'orders'").fetchone():
+        conn.execute('DETACH DATABASE archive')
+        return False
+    return True
+
+
+def months_ago(today, months):
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return datetime.date(year, month + 1, min(today.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def archive_orders(conn, archive_path, months=ARCHIVE_MONTHS, batch_size=1000, today=None):
+    """Move para o arquivo as encomendas encerradas com data anterior a `months` meses; devolve quantas.
+
+    Um lote por transação. Em WAL a transação não é atômica entre os dois
+    arquivos, por isso o lote é copiado (INSERT OR IGNORE) antes de ser
+    apagado: se algo falhar no meio, rodar de novo termina o serviço.
+    """
+    cutoff = months_ago(today or datetime.date.today(), months).isoformat()
+    attach_archive(conn, archive_path, create=True)
+    archived_at = datetime.datetime.now().isoformat(timespec='seconds')
+    count = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM orders WHERE status IN ({', '.join('?' * len(ARCHIVED_STATUSES))}) "
+                "AND order_date < ? ORDER BY id LIMIT ?", (*ARCHIVED_STATUSES, cutoff, batch_size))]
+            if not ids:
+                conn.rollback()
+                break
+            marks = ', '.join('?' * len(ids))
+            conn.execute(f'''INSERT OR IGNORE INTO archive.orders
+                                 (id, client_name, order_date, status, total_cents, archived_at)
+                             SELECT id, client_name, order_date, status, total_cents, ?
+                             FROM orders WHERE id IN ({marks})''', (archived_at, *ids))
+            conn.execute(f'''INSERT OR IGNORE INTO archive.order_items
+                                 (item_id, order_id, product_id, product_name, quantity, unit_price_cents)
+                             SELECT oi.item_id, oi.order_id, oi.product_id, p.name, oi.quantity, oi.unit_price_cents
+                             FROM order_items oi LEFT JOIN products p ON p.id = oi.product_id
+                             WHERE oi.order_id IN ({marks})''', ids)
+            conn.execute(f'DELETE FROM order_items WHERE order_id IN ({marks})', ids)
+            conn.execute(f'DELETE FROM orders WHERE id IN ({marks})', ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        count += len(ids)
+    return count
+
+
+def backup(db_name, dest_path, pages=BACKUP_PAGES, sleep=0.005):
+    """Copia o banco `db_name` para `dest_path` sem parar quem o está usando; devolve o tamanho.
+
+    A cópia vai para um arquivo ".parcial" e só toma o nome final no fim. Se
+    gravações de outras conexões fizerem a cópia recomeçar mais de
+    BACKUP_MAX_RESTARTS vezes, ela é refeita num passo só (uma leitura, que em
+    WAL não bloqueia as gravações).
+    """
+    partial = dest_path + '.parcial'
+    restarts, last_remaining = 0, None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise InterruptedError
+        last_remaining = remaining
+
+    source = sqlite3.connect(db_name, timeout=30)
+    try:
+        for step_pages in (pages, -1):
+            target = sqlite3.connect(partial)
+            try:
+                source.backup(target, pages=step_pages, progress=progress, sleep=sleep)
+                break
+            except InterruptedError:
+                continue
+            finally:
+                target.close()
+    finally:
+        source.close()
+    os.replace(partial, dest_path)
+    return os.path.getsize(dest_path)
+
+
+def backup_rotated(db_name, directory=None, keep=BACKUP_KEEP):
+    """Cópia com data e hora no nome em `directory` (padrão: backups/ ao lado do banco); apaga as mais antigas.
+
+    Também apaga as cópias ".parcial" deixadas por um backup interrompido.
+    """
+    directory = directory or os.path.join(os.path.dirname(os.path.abspath(db_name)), 'backups')
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_name))[0]
+    for partial in glob.glob(os.path.join(directory, f"{stem}-*.db.parcial")):
+        try:
+            if time.time() - os.path.getmtime(partial) > STALE_PARTIAL:  # as recentes podem estar em andamento
+                os.remove(partial)
+        except OSError:
+            pass
+    path = os.path.join(directory, f"{stem}-{datetime.datetime.now():%Y%m%d-%H%M%S}.db")
+    backup(db_name, path)
+    for old in sorted(glob.glob(os.path.join(directory, f"{stem}-*.db")))[:-keep]:
+        os.remove(old)
+    return path
+
+
+def optimize(conn, full=False):
+    """Atualiza as estatísticas do planejador: todas (ANALYZE) ou só as vencidas, com amostragem."""
+    if full:
+        conn.execute('ANALYZE')
+    else:
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('PRAGMA optimize')
+    conn.commit()
+
+
+def vacuum(conn, force=False):
+    """VACUUM se houver páginas livres suficientes (ou `force`); devolve os bytes recuperados."""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if not force and free < pages * VACUUM_MIN_FREE:
+        return 0
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return (pages - conn.execute('PRAGMA page_count').fetchone()[0]) * page_size
+
+
+def run_task(db, task, backup_dir=None, months=ARCHIVE_MONTHS, force=False):
+    """Roda uma tarefa sobre o DatabaseManager `db` e devolve um resumo em texto."""
+    if task == 'backup':
+        paths = [backup_rotated(db.db_name, backup_dir)]
+        if db.archive_name and os.path.exists(db.archive_name):
+            paths.append(backup_rotated(db.archive_name, backup_dir))
+        return ', '.join(paths)
+    if task == 'optimize':
+        optimize(db.conn, full=force)
+        return "estatísticas atualizadas"
+    if task == 'vacuum':
+        return f"{vacuum(db.conn, force) // 1024} KiB recuperados"
+    if task == 'archive':
+        return f"{archive_orders(db.conn, db.archive_name, months)} encomendas arquivadas"
+    raise ValueError(f"tarefa desconhecida: {task}")
+
+
+def run_due(db_name, tasks=tuple(TASK_INTERVALS), due_only=True, force=False, backup_dir=None,
+            months=ARCHIVE_MONTHS):
+    """Roda as tarefas de `tasks` cujo intervalo venceu (todas, sem `due_only`); devolve {tarefa: resumo}.
+
+    `force` faz ANALYZE completo e VACUUM mesmo com pouco espaço livre. Usa
+    uma conexão só sua; um erro numa tarefa é registrado e não impede as outras.
+    """
+    from database import DatabaseManager
+    db = DatabaseManager(db_name, max_idle_connections=1)
+    results = {}
+    try:
+        last_runs = dict(db.conn.execute('SELECT task, last_run FROM maintenance_runs'))
+        now = datetime.datetime.now()
+        for task in tasks:
+            last = last_runs.get(task)
+            if due_only and last and (now - datetime.datetime.fromisoformat(last)).total_seconds() < TASK_INTERVALS[task]:
+                continue
+            start = time.perf_counter()
+            try:
+                result = run_task(db, task, backup_dir, months, force)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Erro na manutenção ({task}): {e}")
+                results[task] = None
+                continue
+            with db.conn:
+                db.conn.execute('INSERT OR REPLACE INTO maintenance_runs (task, last_run, seconds, result) '
+                                'VALUES (?, ?, ?, ?)', (task, now.isoformat(timespec='seconds'),
+                                                        time.perf_counter() - start, str(result)))
+            results[task] = result
+    finally:
+        db.close()
+    return results
+
+
+def start_background(db_name, tasks=IN_APP_TASKS):
+    """Roda `run_due(db_name, tasks)` numa thread daemon e devolve a thread."""
+    thread = threading.Thread(target=run_due, args=(db_name, tasks), name="maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados.")
+    parser.add_argument('task', choices=['rotina', *CLI_TASKS], help="rotina = todas as tarefas vencidas")
+    parser.add_argument('--db', default='marcenaria.db')
+    parser.add_argument('--destino', help="pasta dos backups (padrão: backups/ ao lado do banco)")
+    parser.add_argument('--meses', type=int, default=ARCHIVE_MONTHS, help="idade mínima para arquivar")
+    parser.add_argument('--forcar', action='store_true', help="ANALYZE completo e VACUUM mesmo com pouco espaço livre")
+    args = parser.parse_args()
+
+    # Uma tarefa pedida pelo nome roda agora; a rotina respeita os intervalos.
+    tasks = tuple(TASK_INTERVALS) if args.task == 'rotina' else (CLI_TASKS[args.task],)
+    results = run_due(args.db, tasks, due_only=args.task == 'rotina', force=args.forcar,
+                      backup_dir=args.destino, months=args.meses)
+    names = {task: name for name, task in CLI_TASKS.items()}
+    for task, result in results.items():
+        print(f"{names[task]}: {result if result is not None else 'falhou'}")
+    if not results:
+        print("Nenhuma tarefa vencida.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# money.py
+"""Valores em dinheiro como inteiros de centavos.
+
+Preços e totais ficam no banco em colunas INTEGER (price_cents, total_cents,
+unit_price_cents) e circulam pelo programa como int: somar e multiplicar
+centavos é exato, ao contrário de float (0.1 + 0.2 != 0.3). Reais digitados
+ou lidos de arquivos passam por `to_cents` na entrada e `format_money` volta
+ao texto só na hora de mostrar.
+
+OrderLines guarda as linhas de uma encomenda em arrays de inteiros em vez de
+um dict por item, e calcula subtotais, desconto e imposto da encomenda toda
+de uma vez, arredondando uma única vez por encomenda.
+"""
+import operator
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+BASIS_POINTS = 10000  # 1 ponto-base = 0,01%
+
+
+def to_cents(value):
+    """Converte um valor em reais (texto, int, float ou Decimal) em centavos, arredondando meio para cima.
+
+    Aceita vírgula decimal e separador de milhar ("1.234,50"). Levanta ValueError para valores inválidos.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"valor inválido: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        value = repr(value)  # 0.1 vira Decimal('0.1'), não 0.1000000000000000055...
+    if isinstance(value, str):
+        value = value.strip().replace(' ', '')
+        if ',' in value and '.' in value:
+            # O separador que vem por último é o decimal: "1.234,50" ou "1,234.50".
+            thousands = '.' if value.rfind(',') > value.rfind('.') else ','
+            value = value.replace(thousands, '')
+        value = value.replace(',', '.')
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"valor inválido: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"valor inválido: {value!r}")
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def check_cents(value):
+    """Devolve `value` se for um int de centavos; senão levanta ValueError (evita gravar reais por engano)."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"esperado um int de centavos, veio {value!r}")
+    return value
+
+
+def format_money(cents):
+    """Centavos como texto com duas casas ("1234.56"), sem passar por float."""
+    sign = '-' if cents < 0 else ''
+    reais, rest = divmod(abs(cents), 100)
+    return f"{sign}{reais}.{rest:02d}"
+
+
+def apply_basis_points(cents, basis_points):
+    """`cents` vezes basis_points/10000, arredondado meio para cima (também para negativos)."""
+    product = cents * basis_points
+    half = BASIS_POINTS // 2
+    return (product + half) // BASIS_POINTS if product >= 0 else -((-product + half) // BASIS_POINTS)
+
+
+class OrderLines:
+    """Linhas de uma encomenda: arrays paralelos de ids, quantidades e preços unitários em centavos."""
+
+    __slots__ = ('product_ids', 'quantities', 'unit_cents', 'names')
+
+    def __init__(self):
+        self.product_ids = array('q')
+        self.quantities = array('q')
+        self.unit_cents = array('q')
+        self.names = []
+
+    def add(self, product_id, name, unit_cents, quantity):
+        if quantity <= 0:
+            raise ValueError("A quantidade deve ser maior que zero.")
+        self.product_ids.append(product_id)
+        self.names.append(name)
+        self.unit_cents.append(check_cents(unit_cents))
+        self.quantities.append(quantity)
+
+    def clear(self):
+        del self.product_ids[:], self.quantities[:], self.unit_cents[:], self.names[:]
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def __iter__(self):
+        """Gera (product_id, name, unit_cents, quantity, line_cents) por linha."""
+        return zip(self.product_ids, self.names, self.unit_cents, self.quantities, self.line_totals())
+
+    def line_totals(self):
+        return map(operator.mul, self.unit_cents, self.quantities)
+
+    def subtotal_cents(self):
+        return sum(self.line_totals())
+
+    def totals(self, discount_bp=0, tax_bp=0):
+        """Subtotal, desconto, imposto (sobre o valor já com desconto) e total, em centavos.
+
+        Desconto e imposto são dados em pontos-base (1000 = 10%) e arredondados
+        uma vez sobre a encomenda inteira, não linha a linha.
+        """
+        subtotal = self.subtotal_cents()
+        discount = apply_basis_points(subtotal, discount_bp)
+        tax = apply_basis_points(subtotal - discount, tax_bp)
+        return {'subtotal': subtotal, 'discount': discount, 'tax': tax, 'total': subtotal - discount + tax}
+
+    def as_items(self):
+        """Itens no formato de DatabaseManager.create_order ([{'id', 'quantity', 'unit_price_cents'}]).
+
+        Os preços vão junto para o banco gravar os mesmos usados no total.
+        """
+        return [{'id': product_id, 'quantity': quantity, 'unit_price_cents': unit_cents}
+                for product_id, quantity, unit_cents in zip(self.product_ids, self.quantities, self.unit_cents)]
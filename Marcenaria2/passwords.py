@@ -0,0 +1,153 @@
+# passwords.py
+"""Hash de senhas (scrypt, com sal) e cache de sessões em memória.
+
+As senhas ficam gravadas como "scrypt$n$r$p$sal$hash" (sal e hash em
+base64). O custo padrão é n=2**14, r=8, p=1 e pode ser trocado com a
+variável de ambiente MARCENARIA_SCRYPT_N; `python -m benchmarks.password_cost`
+mede quanto cada n demora nesta máquina e sugere um valor. Hashes antigos em
+PBKDF2 ("pbkdf2_sha256$iterações$sal$hash") continuam sendo aceitos, e um
+hash com custo diferente do atual é refeito no próximo login (needs_rehash).
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+DEFAULT_SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+SESSION_TTL = 15 * 60  # segundos
+
+
+def _scrypt_n_from_environment():
+    """MARCENARIA_SCRYPT_N, se for uma potência de 2 maior que 1; senão o custo padrão."""
+    value = os.environ.get('MARCENARIA_SCRYPT_N', '').strip()
+    if not value:
+        return DEFAULT_SCRYPT_N
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 2 or n & (n - 1):
+        print(f"Aviso: MARCENARIA_SCRYPT_N={value!r} não é uma potência de 2 maior que 1; usando {DEFAULT_SCRYPT_N}.")
+        return DEFAULT_SCRYPT_N
+    return n
+
+
+SCRYPT_N = _scrypt_n_from_environment()
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=HASH_BYTES)
+
+
+def hash_password(password, n=None):
+    n = n or SCRYPT_N
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(_scrypt(password, salt, n, SCRYPT_R, SCRYPT_P))}"
+
+
+def is_hashed(stored):
+    return stored.startswith(('scrypt$', 'pbkdf2_sha256$'))
+
+
+def verify_password(password, stored):
+    """Compara `password` com o hash gravado, em tempo constante."""
+    try:
+        scheme, *fields = stored.split('$')
+        if scheme == 'scrypt':
+            n, r, p, salt, expected = fields
+            actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        elif scheme == 'pbkdf2_sha256':
+            iterations, salt, expected = fields
+            actual = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), base64.b64decode(salt), int(iterations))
+        else:
+            return False
+        return hmac.compare_digest(actual, base64.b64decode(expected))
+    except ValueError:  # inclui binascii.Error de um base64 estragado
+        return False
+
+
+def needs_rehash(stored, n=None):
+    """True se o hash não é scrypt com o custo atual."""
+    return not stored.startswith(f"scrypt${n or SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+class SessionCache:
+    """Sessões de usuários já verificados neste processo.
+
+    Guarda, por usuário, um HMAC da senha com uma chave aleatória do processo:
+    um novo login com a mesma senha até `ttl` segundos depois da última
+    conferência no banco não repete o scrypt. Esse prazo não se renova, então
+    uma senha trocada ou um usuário removido (por outro processo, por exemplo)
+    deixa de valer aqui em no máximo `ttl`.
+
+    Cada login devolve um token que identifica a sessão (`user`) até ficar
+    `ttl` segundos sem uso ou ser encerrado (`end`).
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._key = secrets.token_bytes(32)
+        self._lock = threading.Lock()
+        self._sessions = {}  # token -> (usuário, expira em)
+        self._verified = {}  # usuário -> (HMAC da senha, expira em)
+
+    def _digest(self, username, password):
+        return hmac.new(self._key, f"{username}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+
+    def _purge(self, now):
+        for table in (self._sessions, self._verified):
+            for key in [key for key, (_, expires) in table.items() if expires <= now]:
+                del table[key]
+
+    def _new_session(self, username, now):
+        token = secrets.token_urlsafe(24)
+        self._sessions[token] = (username, now + self.ttl)
+        return token
+
+    def remember(self, username, password):
+        """Registra um login conferido no banco e devolve o token da nova sessão."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._verified[username] = (self._digest(username, password), now + self.ttl)
+            return self._new_session(username, now)
+
+    def recall(self, username, password):
+        """Token de uma nova sessão se o usuário entrou com esta senha há pouco; senão None.
+
+        Não renova o prazo da senha lembrada: passado `ttl` da última
+        conferência, o próximo login volta a consultar o banco.
+        """
+        digest = self._digest(username, password)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._verified.get(username)
+            if entry is None or entry[1] <= now or not hmac.compare_digest(entry[0], digest):
+                return None
+            return self._new_session(username, now)
+
+    def user(self, token):
+        """Usuário da sessão `token`, ou None; cada consulta renova o prazo da sessão."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None or entry[1] <= now:
+                return None
+            self._sessions[token] = (entry[0], now + self.ttl)
+            return entry[0]
+
+    def end(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
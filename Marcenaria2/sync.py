@@ -0,0 +1,396 @@
+# sync.py
+"""Registro de alterações (change_log) e sincronização incremental entre filiais.
+
+Cada banco é uma filial com um id próprio (sync_state.branch_id). Triggers
+gravam em change_log, só acrescentando, cada produto criado, alterado ou
+removido, cada encomenda criada com os seus itens e cada troca de status. Uma
+entrada é identificada por (origin, origin_seq): a filial onde a alteração
+nasceu e a posição dela no registro dessa filial. Linhas são referidas por um
+id global "filial:id"; linhas vindas de outra filial ganham um id local e o
+par fica em sync_ids.
+
+Para sincronizar, o banco de destino diz até onde já tem o registro de cada
+filial (`version_vector`), o de origem exporta só as entradas depois disso
+(JSON Lines compactado com gzip, um lote por linha) e o destino as aplica. A
+aplicação é idempotente: uma entrada já vista é ignorada pela chave
+(origin, origin_seq), então repetir um pacote ou sincronizar duas vezes não
+duplica nada. O custo é proporcional às alterações novas, não ao tamanho dos
+bancos. Em conflitos vale a última entrada aplicada.
+
+    python sync.py sincronizar filial_centro.db filial_bairro.db
+    python sync.py vetor filial_bairro.db > vetor.json
+    python sync.py exportar filial_centro.db pacote.jsonl.gz --vetor vetor.json
+    python sync.py aplicar filial_bairro.db pacote.jsonl.gz
+
+Um banco copiado de outra filial começa com o mesmo id: rode `nova-filial`
+nele antes da primeira sincronização. Dados gravados antes deste registro
+existir só vão para a outra filial depois de `registrar-existentes`.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+SYNC_FORMAT = 'marcenaria-sync'
+BATCH_SIZE = 500
+
+BRANCH = "(SELECT value FROM sync_state WHERE name = 'branch_id')"
+LOGGING = "(SELECT value FROM sync_state WHERE name = 'applying') = '0'"
+NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
+
+def _gid(table, local_id):
+    # Id global de uma linha: o de origem, se veio de outra filial, ou "filial:id".
+    return (f"COALESCE((SELECT origin || ':' || origin_id FROM sync_ids "
+            f"WHERE table_name = '{table}' AND local_id = {local_id}), {BRANCH} || ':' || {local_id})")
+
+
+def _log(table, op, gid, data):
+    return f'''INSERT INTO change_log (origin, origin_seq, table_name, op, row_gid, data, changed_at)
+               VALUES ({BRANCH}, COALESCE((SELECT MAX(origin_seq) FROM change_log WHERE origin = {BRANCH}), 0) + 1,
+                       '{table}', '{op}', {gid}, {data}, {NOW});'''
+
+
+PRODUCT_DATA = "json_object('name', {0}.name, 'description', {0}.description, 'price_cents', {0}.price_cents)"
+ORDER_DATA = ("json_object('client_name', {0}.client_name, 'order_date', {0}.order_date, "
+              "'status', {0}.status, 'total_cents', {0}.total_cents)")
+ITEM_DATA = ("json_object('order', {order}, 'product', {product}, 'quantity', {0}.quantity, "
+             "'unit_price_cents', {0}.unit_price_cents)")
+
+TRIGGERS = ['changelog_products_insert', 'changelog_products_update', 'changelog_products_delete',
+            'changelog_orders_insert', 'changelog_orders_status', 'changelog_order_items_insert']
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    '''CREATE TABLE IF NOT EXISTS change_log (
+           seq INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, origin_seq INTEGER NOT NULL,
+           table_name TEXT NOT NULL, op TEXT NOT NULL, row_gid TEXT NOT NULL, data TEXT,
+           changed_at TEXT NOT NULL, UNIQUE (origin, origin_seq))''',
+    # Filiais que já apareceram no registro; o vetor de versões lê só estas.
+    'CREATE TABLE IF NOT EXISTS sync_branches (branch TEXT PRIMARY KEY) WITHOUT ROWID',
+    '''CREATE TABLE IF NOT EXISTS sync_ids (
+           table_name TEXT NOT NULL, origin TEXT NOT NULL, origin_id INTEGER NOT NULL, local_id INTEGER NOT NULL,
+           PRIMARY KEY (table_name, origin, origin_id)) WITHOUT ROWID''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_ids_local ON sync_ids(table_name, local_id)',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_products_insert AFTER INSERT ON products WHEN {LOGGING} BEGIN
+            {_log('products', 'insert', f"{BRANCH} || ':' || new.id", PRODUCT_DATA.format('new'))}
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_products_update AFTER UPDATE ON products WHEN {LOGGING} BEGIN
+            {_log('products', 'update', _gid('products', 'new.id'), PRODUCT_DATA.format('new'))}
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_products_delete AFTER DELETE ON products WHEN {LOGGING} BEGIN
+            {_log('products', 'delete', _gid('products', 'old.id'), 'NULL')}
+            DELETE FROM sync_ids WHERE table_name = 'products' AND local_id = old.id;
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_orders_insert AFTER INSERT ON orders WHEN {LOGGING} BEGIN
+            {_log('orders', 'insert', f"{BRANCH} || ':' || new.id", ORDER_DATA.format('new'))}
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_orders_status AFTER UPDATE OF status ON orders
+        WHEN {LOGGING} AND old.status IS NOT new.status BEGIN
+            {_log('orders', 'status', _gid('orders', 'new.id'), "json_object('status', new.status)")}
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS changelog_order_items_insert AFTER INSERT ON order_items WHEN {LOGGING} BEGIN
+            {_log('order_items', 'insert', f"{BRANCH} || ':' || new.item_id",
+                  ITEM_DATA.format('new', order=_gid('orders', 'new.order_id'),
+                                   product=_gid('products', 'new.product_id')))}
+        END''',
+]
+
+
+def init_branch(conn):
+    """Dá ao banco um id de filial novo (usado pela migração)."""
+    branch = os.urandom(6).hex()
+    conn.execute("INSERT OR IGNORE INTO sync_state (name, value) VALUES ('branch_id', ?)", (branch,))
+    conn.execute("INSERT OR IGNORE INTO sync_state (name, value) VALUES ('applying', '0')")
+    conn.execute('INSERT OR IGNORE INTO sync_branches (branch) VALUES (?)', (branch_id(conn),))
+
+
+def branch_id(conn):
+    return conn.execute("SELECT value FROM sync_state WHERE name = 'branch_id'").fetchone()[0]
+
+
+def version_vector(conn):
+    """{filial: maior origin_seq já registrado daquela filial}."""
+    branches = [row[0] for row in conn.execute('SELECT branch FROM sync_branches')]
+    return {branch: conn.execute('SELECT COALESCE(MAX(origin_seq), 0) FROM change_log WHERE origin = ?',
+                                 (branch,)).fetchone()[0]
+            for branch in branches}
+
+
+def iter_missing(conn, vector, batch_size=BATCH_SIZE):
+    """Gera, em lotes e na ordem do registro local, as entradas que faltam a quem tem `vector`.
+
+    O ponto de partida é a primeira entrada que falta de cada filial, achado
+    pelo índice (origin, origin_seq); daí em diante a leitura segue o seq.
+    """
+    starts = []
+    for branch in (row[0] for row in conn.execute('SELECT branch FROM sync_branches')):
+        row = conn.execute('SELECT MIN(seq) FROM change_log WHERE origin = ? AND origin_seq > ?',
+                           (branch, vector.get(branch, 0))).fetchone()
+        if row[0] is not None:
+            starts.append(row[0])
+    if not starts:
+        return
+    cursor = conn.cursor()
+    cursor.execute('''SELECT origin, origin_seq, table_name, op, row_gid, data, changed_at
+                      FROM change_log WHERE seq >= ? ORDER BY seq''', (min(starts),))
+    try:
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            batch = [row for row in rows if row[1] > vector.get(row[0], 0)]
+            if batch:
+                yield batch
+    finally:
+        cursor.close()
+
+
+def export_changes(conn, path, vector, batch_size=BATCH_SIZE):
+    """Grava em `path` (gzip) as entradas que faltam a quem tem `vector`; devolve quantas."""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'format': SYNC_FORMAT, 'version': 1, 'branch': branch_id(conn)}) + '\n')
+        for batch in iter_missing(conn, vector, batch_size):
+            f.write(json.dumps(batch, ensure_ascii=False, separators=(',', ':')) + '\n')
+            count += len(batch)
+    return count
+
+
+def iter_package(path):
+    """Lê um pacote de `export_changes` e gera os lotes de entradas."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or 'null')
+        if not header or header.get('format') != SYNC_FORMAT:
+            raise ValueError(f"{path} não é um pacote {SYNC_FORMAT}")
+        for line in f:
+            yield json.loads(line)
+
+
+# --- APLICAÇÃO ---
+def _local_id(conn, table, gid, branch):
+    origin, origin_id = gid.rsplit(':', 1)
+    if origin == branch:
+        return int(origin_id)
+    row = conn.execute('SELECT local_id FROM sync_ids WHERE table_name = ? AND origin = ? AND origin_id = ?',
+                       (table, origin, int(origin_id))).fetchone()
+    return row[0] if row else None
+
+
+def _map_id(conn, table, gid, local_id):
+    origin, origin_id = gid.rsplit(':', 1)
+    conn.execute('INSERT OR REPLACE INTO sync_ids (table_name, origin, origin_id, local_id) VALUES (?, ?, ?, ?)',
+                 (table, origin, int(origin_id), local_id))
+
+
+def _apply_product_insert(conn, gid, data, branch):
+    cursor = conn.execute('INSERT INTO products (name, description, price_cents) VALUES (?, ?, ?)',
+                          (data['name'], data['description'], data['price_cents']))
+    _map_id(conn, 'products', gid, cursor.lastrowid)
+
+
+def _apply_product_update(conn, gid, data, branch):
+    prod_id = _local_id(conn, 'products', gid, branch)
+    if prod_id is not None:
+        conn.execute('UPDATE products SET name = ?, description = ?, price_cents = ? WHERE id = ?',
+                     (data['name'], data['description'], data['price_cents'], prod_id))
+
+
+def _apply_product_delete(conn, gid, data, branch):
+    prod_id = _local_id(conn, 'products', gid, branch)
+    if prod_id is not None:
+        conn.execute('DELETE FROM products WHERE id = ?', (prod_id,))
+        conn.execute("DELETE FROM sync_ids WHERE table_name = 'products' AND local_id = ?", (prod_id,))
+
+
+def _apply_order_insert(conn, gid, data, branch):
+    cursor = conn.execute('INSERT INTO orders (client_name, order_date, status, total_cents) VALUES (?, ?, ?, ?)',
+                          (data['client_name'], data['order_date'], data['status'], data['total_cents']))
+    _map_id(conn, 'orders', gid, cursor.lastrowid)
+
+
+def _apply_order_status(conn, gid, data, branch):
+    order_id = _local_id(conn, 'orders', gid, branch)
+    if order_id is not None:
+        conn.execute('UPDATE orders SET status = ? WHERE id = ?', (data['status'], order_id))
+
+
+def _apply_item_insert(conn, gid, data, branch):
+    order_id = _local_id(conn, 'orders', data['order'], branch)
+    if order_id is not None:
+        conn.execute('INSERT INTO order_items (order_id, product_id, quantity, unit_price_cents) VALUES (?, ?, ?, ?)',
+                     (order_id, _local_id(conn, 'products', data['product'], branch), data['quantity'],
+                      data['unit_price_cents']))
+
+
+APPLY = {
+    ('products', 'insert'): _apply_product_insert,
+    ('products', 'update'): _apply_product_update,
+    ('products', 'delete'): _apply_product_delete,
+    ('orders', 'insert'): _apply_order_insert,
+    ('orders', 'status'): _apply_order_status,
+    ('order_items', 'insert'): _apply_item_insert,
+}
+
+
+def apply_batches(conn, batches):
+    """Aplica lotes de entradas, cada lote numa transação; devolve (aplicadas, já vistas).
+
+    Enquanto aplica, os triggers de change_log ficam desligados (sync_state.applying)
+    e as entradas entram no registro com a origem e o número que trouxeram.
+    """
+    branch = branch_id(conn)
+    applied = skipped = 0
+    for batch in batches:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("UPDATE sync_state SET value = '1' WHERE name = 'applying'")
+            conn.executemany('INSERT OR IGNORE INTO sync_branches (branch) VALUES (?)',
+                             [(origin,) for origin in {entry[0] for entry in batch}])
+            for origin, origin_seq, table, op, gid, data, changed_at in batch:
+                cursor = conn.execute('''INSERT OR IGNORE INTO change_log
+                                             (origin, origin_seq, table_name, op, row_gid, data, changed_at)
+                                         VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                      (origin, origin_seq, table, op, gid, data, changed_at))
+                if cursor.rowcount == 0:
+                    skipped += 1
+                    continue
+                APPLY[table, op](conn, gid, json.loads(data) if data else None, branch)
+                applied += 1
+            conn.execute("UPDATE sync_state SET value = '0' WHERE name = 'applying'")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied, skipped
+
+
+def apply_package(conn, path):
+    return apply_batches(conn, iter_package(path))
+
+
+def sync_pair(conn_a, conn_b, workdir=None):
+    """Leva as alterações novas de A para B e de B para A, passando por pacotes gzip.
+
+    Devolve {'a_to_b': (entradas, bytes, aplicadas, já vistas), 'b_to_a': ...}.
+    """
+    if branch_id(conn_a) == branch_id(conn_b):
+        raise ValueError("Os dois bancos têm o mesmo id de filial; rode `python sync.py nova-filial` num deles.")
+    result = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for name, source, target in (('a_to_b', conn_a, conn_b), ('b_to_a', conn_b, conn_a)):
+            path = os.path.join(tmp, f"{name}.jsonl.gz")
+            exported = export_changes(source, path, version_vector(target))
+            applied, skipped = apply_package(target, path)
+            result[name] = (exported, os.path.getsize(path), applied, skipped)
+    return result
+
+
+# --- MANUTENÇÃO DO REGISTRO ---
+def new_branch_id(conn):
+    """Troca o id de filial de um banco copiado de outro; devolve o novo id.
+
+    As linhas que já existiam continuam conhecidas pelo id global antigo
+    (ficam mapeadas em sync_ids), para que alterações nelas cheguem à filial
+    de onde a cópia saiu.
+    """
+    old = branch_id(conn)
+    new = os.urandom(6).hex()
+    with conn:
+        for table in ('products', 'orders'):
+            conn.execute(f'''INSERT OR IGNORE INTO sync_ids (table_name, origin, origin_id, local_id)
+                             SELECT '{table}', ?, id, id FROM {table}
+                             WHERE id NOT IN (SELECT local_id FROM sync_ids WHERE table_name = '{table}')''', (old,))
+        conn.execute("UPDATE sync_state SET value = ? WHERE name = 'branch_id'", (new,))
+        conn.execute('INSERT OR IGNORE INTO sync_branches (branch) VALUES (?)', (new,))
+    return new
+
+
+def log_existing_rows(conn):
+    """Registra como criados agora os produtos e encomendas que ainda não estão no registro.
+
+    Para dois bancos que cresceram separados antes deste registro existir;
+    depois disso a sincronização junta os dois. Devolve quantas entradas gravou.
+    """
+    branch = branch_id(conn)
+    count = 0
+    with conn:
+        # (tabela, chave, coluna e tabela que dizem se a linha veio de outra filial, dados)
+        for table, key, origin_column, origin_table, data in (
+                ('products', 'id', 'id', 'products', PRODUCT_DATA.format('t')),
+                ('orders', 'id', 'id', 'orders', ORDER_DATA.format('t')),
+                ('order_items', 'item_id', 'order_id', 'orders',
+                 ITEM_DATA.format('t', order=_gid('orders', 't.order_id'), product=_gid('products', 't.product_id')))):
+            cursor = conn.execute(f'''
+                INSERT INTO change_log (origin, origin_seq, table_name, op, row_gid, data, changed_at)
+                SELECT ?1, (SELECT COALESCE(MAX(origin_seq), 0) FROM change_log WHERE origin = ?1)
+                           + ROW_NUMBER() OVER (ORDER BY t.{key}),
+                       '{table}', 'insert', ?1 || ':' || t.{key}, {data}, {NOW}
+                FROM {table} t
+                WHERE t.{origin_column} NOT IN (SELECT local_id FROM sync_ids WHERE table_name = '{origin_table}')
+                  AND ?1 || ':' || t.{key} NOT IN (SELECT row_gid FROM change_log
+                                                   WHERE origin = ?1 AND table_name = '{table}' AND op = 'insert')
+            ''', (branch,))
+            count += cursor.rowcount
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincronização incremental entre filiais.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('sincronizar', help="troca as alterações novas entre dois bancos")
+    command.add_argument('db_a')
+    command.add_argument('db_b')
+    command = commands.add_parser('vetor', help="mostra até onde o banco tem o registro de cada filial")
+    command.add_argument('db')
+    command = commands.add_parser('exportar', help="grava um pacote com as alterações que faltam ao destino")
+    command.add_argument('db')
+    command.add_argument('pacote')
+    command.add_argument('--vetor', help="JSON de `vetor` do banco de destino (padrão: tudo)")
+    command = commands.add_parser('aplicar', help="aplica um pacote de `exportar`")
+    command.add_argument('db')
+    command.add_argument('pacote')
+    command = commands.add_parser('nova-filial', help="troca o id de filial de um banco copiado")
+    command.add_argument('db')
+    command = commands.add_parser('registrar-existentes', help="põe no registro os dados anteriores a ele")
+    command.add_argument('db')
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    start = time.perf_counter()
+    databases = [DatabaseManager(path) for path in ((args.db_a, args.db_b) if args.command == 'sincronizar'
+                                                    else (args.db,))]
+    try:
+        conn = databases[0].conn
+        if args.command == 'sincronizar':
+            for name, (exported, size, applied, skipped) in sync_pair(conn, databases[1].conn).items():
+                source, target = (args.db_a, args.db_b) if name == 'a_to_b' else (args.db_b, args.db_a)
+                print(f"{source} -> {target}: {exported} alterações ({size} bytes), "
+                      f"{applied} aplicadas, {skipped} já existiam.")
+        elif args.command == 'vetor':
+            json.dump({'branch': branch_id(conn), 'vector': version_vector(conn)}, sys.stdout, indent=2)
+            print()
+        elif args.command == 'exportar':
+            vector = {}
+            if args.vetor:
+                with open(args.vetor, encoding='utf-8') as f:
+                    vector = json.load(f)['vector']
+            print(f"{export_changes(conn, args.pacote, vector)} alterações gravadas em {args.pacote}.")
+        elif args.command == 'aplicar':
+            applied, skipped = apply_package(conn, args.pacote)
+            print(f"{applied} alterações aplicadas, {skipped} já existiam.")
+        elif args.command == 'nova-filial':
+            print(f"Novo id de filial: {new_branch_id(conn)}")
+        else:
+            print(f"{log_existing_rows(conn)} registros incluídos no registro de alterações.")
+    except (ValueError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        for db in databases:
+            db.close()
+    print(f"Concluído em {time.perf_counter() - start:.1f} s.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""Os módulos do app são importados como no programa (rodando de dentro de Marcenaria2)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
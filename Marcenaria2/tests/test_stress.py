@@ -0,0 +1,78 @@
+# tests/test_stress.py
+"""Versão curta de benchmarks/stress.py: alguns segundos de carga e as invariantes conferidas.
+
+    python -m pytest tests
+"""
+import sqlite3
+
+import pytest
+
+from benchmarks.stress import (DEFAULT_MIX, _ErrorCounter, check_invariants, parse_mix, run_stress,
+                               run_terminal)
+from benchmarks.synthetic import generate_shop
+from database import DatabaseManager
+
+MIX = parse_mix(DEFAULT_MIX)
+
+
+@pytest.fixture
+def shop(tmp_path):
+    path = str(tmp_path / 'marcenaria.db')
+    generate_shop(path, products=50, orders=300).close()
+    return path
+
+
+def _state(path):
+    db = DatabaseManager(path)
+    try:
+        products = db.get_all_products()
+        return {'product_ids': [p[0] for p in products], 'prices': {p[0]: p[3] for p in products},
+                'material_ids': [m[0] for m in db.get_materials()],
+                'max_id': db.conn.execute('SELECT MAX(id) FROM orders').fetchone()[0]}
+    finally:
+        db.close()
+
+
+def test_threads_keep_invariants(shop):
+    summary = run_stress(shop, processes=0, threads=4, duration=1.5, mix=MIX, seed=1, busy_timeout=5000)
+    assert summary['problems'] == []
+    assert summary['orders_created'] > 0
+    assert summary['db_errors'] == summary['locked']
+
+
+def test_processes_keep_invariants(shop):
+    summary = run_stress(shop, processes=2, threads=2, duration=1.5, mix=MIX, seed=2, busy_timeout=5000)
+    assert summary['problems'] == []
+    assert summary['orders_created'] > 0
+
+
+def test_check_invariants_reports_broken_orders(shop):
+    state = _state(shop)
+    terminal = run_terminal(shop, 0, 2, 0.5, parse_mix('order:1'), 3, state, 5000)
+    assert check_invariants(shop, terminal['created'], state['max_id'], [terminal]) == []
+
+    order_id = terminal['created'][0][0]
+    conn = sqlite3.connect(shop)
+    with conn:
+        conn.execute('DELETE FROM order_items WHERE order_id = ? AND rowid = '
+                     '(SELECT MIN(rowid) FROM order_items WHERE order_id = ?)', (order_id, order_id))
+    conn.close()
+    problems = check_invariants(shop, terminal['created'], state['max_id'], [terminal])
+    assert any("itens diferentes" in problem for problem in problems)
+    assert any("total diferente" in problem for problem in problems)
+
+
+def test_error_counter_separates_lock_errors(shop):
+    counter = _ErrorCounter()
+    db = DatabaseManager(shop, pragmas={'busy_timeout': 0}, on_error=counter)
+    blocker = sqlite3.connect(shop)
+    try:
+        assert db.create_order("Cliente", 10.5, [{'id': 1, 'quantity': 1}]) is None  # total em reais
+        assert (counter.errors, counter.locked) == (1, 0)
+        blocker.execute('BEGIN IMMEDIATE')
+        assert db.add_product("Banco", "", 1000) is False
+        assert (counter.errors, counter.locked) == (2, 1)
+    finally:
+        blocker.rollback()
+        blocker.close()
+        db.close()
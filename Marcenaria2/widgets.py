@@ -0,0 +1,269 @@
+# widgets.py
+import tkinter
+from collections import deque
+from tkinter import ttk
+import customtkinter as ctk
+
+
+class PagedListView(ctk.CTkFrame):
+    """Lista rolável que mantém só uma janela de páginas na tela.
+
+    As páginas vêm de `load_page(cursor, limit, on_page)`, que busca até `limit`
+    registros a partir de `cursor` (None = início) e chama
+    `on_page(entries, next_cursor)`, com `next_cursor` None quando não há mais
+    registros. Ao rolar perto do fim a próxima página é carregada; passando de
+    `max_pages`, a página do topo sai do widget e volta a ser buscada se o
+    usuário rolar para cima.
+    """
+
+    def __init__(self, master, load_page, header="", empty_text="", page_size=50, max_pages=4, **kwargs):
+        super().__init__(master, **kwargs)
+        self.load_page = load_page
+        self.empty_text = empty_text
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pack_propagate(False)
+        if header:
+            ctk.CTkLabel(self, text=header, font="TkFixedFont", justify="left", anchor="w").pack(fill="x", padx=5)
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True)
+        self.text = tkinter.Text(body, wrap="none", borderwidth=0, highlightthickness=0, font="TkFixedFont",
+                                 bg="#1d1e1e", fg="#dce4ee", padx=5, pady=5, state="disabled")
+        self.scrollbar = ctk.CTkScrollbar(body, command=self.text.yview)
+        self.text.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+        self._pages = deque()  # [cursor inicial, próximo cursor, nº de linhas]
+        self._dropped = []     # cursores iniciais das páginas que saíram pelo topo
+        self._loading = False
+        self._generation = 0
+
+    def reset(self):
+        """Descarta o que está na tela e carrega a primeira página de novo."""
+        self._generation += 1
+        self._pages.clear()
+        self._dropped.clear()
+        self._set_text("")
+        self._request(None, self._append_page)
+
+    def _request(self, cursor, handler):
+        self._loading = True
+        generation = self._generation
+        def on_page(entries, next_cursor):
+            if generation == self._generation and self.winfo_exists():
+                self._loading = False
+                handler(cursor, entries, next_cursor)
+        self.load_page(cursor, self.page_size, on_page)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading or not self._pages:
+            return
+        if float(last) >= 0.95 and self._pages[-1][1] is not None:
+            self._request(self._pages[-1][1], self._append_page)
+        elif float(first) <= 0.05 and self._dropped:
+            self._request(self._dropped.pop(), self._prepend_page)
+
+    def _append_page(self, cursor, entries, next_cursor):
+        if not entries and not self._pages:
+            self._set_text(self.empty_text)
+            return
+        chunk = "".join(entries)
+        self._pages.append([cursor, next_cursor, chunk.count("\n")])
+        self.text.configure(state="normal")
+        self.text.insert("end-1c", chunk)
+        if len(self._pages) > self.max_pages:
+            _, _, lines = self._pages[0]
+            self._dropped.append(self._pages.popleft()[0])
+            top = self._top_line()
+            self.text.delete("1.0", f"{lines + 1}.0")
+            self.text.yview(f"{max(top - lines, 1)}.0")
+        self.text.configure(state="disabled")
+
+    def _prepend_page(self, cursor, entries, next_cursor):
+        chunk = "".join(entries)
+        lines = chunk.count("\n")
+        top = self._top_line()
+        self._pages.appendleft([cursor, next_cursor, lines])
+        self.text.configure(state="normal")
+        self.text.insert("1.0", chunk)
+        if len(self._pages) > self.max_pages:
+            _, _, last_lines = self._pages.pop()
+            total = int(self.text.index("end-1c").split(".")[0]) - 1
+            self.text.delete(f"{total - last_lines + 1}.0", "end-1c")
+        self.text.configure(state="disabled")
+        self.text.yview(f"{top + lines}.0")
+
+    def _top_line(self):
+        return int(self.text.index("@0,0").split(".")[0])
+
+    def _set_text(self, content):
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", content)
+        self.text.configure(state="disabled")
+
+
+class SearchPicker(ctk.CTkFrame):
+    """Campo de busca com lista dos melhores resultados, atualizada enquanto se digita.
+
+    `search(text, limit, on_results)` faz a busca (em geral uma consulta ao
+    índice FTS no worker) e chama `on_results(items)`. As teclas são agrupadas:
+    só se busca depois de `delay_ms` sem digitar, e respostas de buscas antigas
+    são ignoradas. `on_choose(item)` é chamado com duplo clique ou Enter.
+    """
+
+    def __init__(self, master, search, format_item, on_choose=None, limit=10, delay_ms=200,
+                 placeholder_text="Buscar...", **kwargs):
+        super().__init__(master, **kwargs)
+        self.search = search
+        self.format_item = format_item
+        self.on_choose = on_choose
+        self.limit = limit
+        self.delay_ms = delay_ms
+        self._items = []
+        self._after_id = None
+        self._sequence = 0
+        self.entry = ctk.CTkEntry(self, placeholder_text=placeholder_text)
+        self.entry.pack(fill="x", pady=(0, 5))
+        self.listbox = tkinter.Listbox(self, height=limit, width=50, activestyle="none", exportselection=False,
+                                       borderwidth=0, highlightthickness=0, font="TkFixedFont",
+                                       bg="#1d1e1e", fg="#dce4ee", selectbackground="#1f6aa5")
+        self.listbox.pack(fill="both", expand=True)
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Return>", lambda event: self._choose())
+        self.entry.bind("<Down>", lambda event: self._move(1))
+        self.entry.bind("<Up>", lambda event: self._move(-1))
+        self.listbox.bind("<Double-Button-1>", lambda event: self._choose())
+        self.listbox.bind("<Return>", lambda event: self._choose())
+
+    def show_results(self, items):
+        self._items = list(items)
+        self.listbox.delete(0, "end")
+        self.listbox.insert("end", *(self.format_item(item) for item in self._items))
+        if self._items:
+            self.listbox.selection_set(0)
+
+    def selected(self):
+        selection = self.listbox.curselection()
+        return self._items[selection[0]] if selection else None
+
+    def _on_key(self, event):
+        if event.keysym in ("Return", "Up", "Down"):
+            return
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.delay_ms, self._run_search)
+
+    def _run_search(self):
+        self._after_id = None
+        self._sequence += 1
+        sequence = self._sequence
+        def on_results(items):
+            if sequence == self._sequence and self.winfo_exists():
+                self.show_results(items)
+        self.search(self.entry.get(), self.limit, on_results)
+
+    def _move(self, step):
+        if not self._items:
+            return
+        selection = self.listbox.curselection()
+        index = min(max((selection[0] if selection else -1) + step, 0), len(self._items) - 1)
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+
+    def _choose(self):
+        item = self.selected()
+        if item is not None and self.on_choose:
+            self.on_choose(item)
+
+    def destroy(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        super().destroy()
+
+
+class SortableTable(ctk.CTkFrame):
+    """Tabela (ttk.Treeview) com ordenação no servidor e páginas carregadas ao rolar.
+
+    `columns` é uma lista de (chave, título, largura, alinhamento). As linhas vêm
+    de `load_page(sort, descending, cursor, limit, on_page)`, que chama
+    `on_page(rows, next_cursor)`; cada linha é uma tupla na ordem das colunas
+    e a primeira coluna identifica a linha. Clicar num título ordena por ela
+    (de novo, inverte a ordem) e recarrega do início; as colunas em
+    `descending_first` (padrão: todas) começam em ordem decrescente. Várias
+    linhas podem ser selecionadas com Ctrl/Shift.
+    """
+
+    def __init__(self, master, columns, load_page, sort=None, descending=True, page_size=100,
+                 format_value=None, descending_first=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = columns
+        self.load_page = load_page
+        self.sort = sort or columns[0][0]
+        self.descending = descending
+        self.page_size = page_size
+        self.format_value = format_value or (lambda key, value: "" if value is None else value)
+        self.descending_first = {key for key, *_ in columns} if descending_first is None else set(descending_first)
+        self._rows = {}
+        self._next_cursor = None
+        self._loading = False
+        self._generation = 0
+        style = ttk.Style(self)
+        style.configure("Marcenaria.Treeview", background="#1d1e1e", fieldbackground="#1d1e1e",
+                        foreground="#dce4ee", borderwidth=0, rowheight=22)
+        style.map("Marcenaria.Treeview", background=[("selected", "#1f6aa5")])
+        self.tree = ttk.Treeview(self, columns=[key for key, *_ in columns], show="headings",
+                                 selectmode="extended", style="Marcenaria.Treeview")
+        for key, title, width, anchor in columns:
+            self.tree.heading(key, command=lambda key=key: self.sort_by(key))
+            self.tree.column(key, width=width, anchor=anchor, stretch=False)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self._update_headings()
+
+    def reset(self):
+        """Limpa a tabela e carrega a primeira página com a ordenação atual."""
+        self._generation += 1
+        self._rows.clear()
+        self.tree.delete(*self.tree.get_children())
+        self._next_cursor = None
+        self._request(None)
+
+    def sort_by(self, key):
+        self.descending = not self.descending if key == self.sort else key in self.descending_first
+        self.sort = key
+        self._update_headings()
+        self.reset()
+
+    def selected_rows(self):
+        return [self._rows[item] for item in self.tree.selection()]
+
+    def _update_headings(self):
+        for key, title, *_ in self.columns:
+            arrow = (" ▼" if self.descending else " ▲") if key == self.sort else ""
+            self.tree.heading(key, text=title + arrow)
+
+    def _request(self, cursor):
+        self._loading = True
+        generation = self._generation
+        def on_page(rows, next_cursor):
+            if generation == self._generation and self.winfo_exists():
+                self._loading = False
+                self._append(rows, next_cursor)
+        self.load_page(self.sort, self.descending, cursor, self.page_size, on_page)
+
+    def _append(self, rows, next_cursor):
+        keys = [key for key, *_ in self.columns]
+        for row in rows:
+            item = self.tree.insert("", "end", values=[self.format_value(key, value) for key, value in zip(keys, row)])
+            self._rows[item] = row
+        self._next_cursor = next_cursor
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self._loading and self._next_cursor is not None and float(last) >= 0.95:
+            self._request(self._next_cursor)